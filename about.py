@@ -39,7 +39,7 @@ def app():
 
         - **Curate Your Content:** Create a YouTube playlist to store interesting videos you want to review in LanguageBuddy. This saves time searching for new content each session, allowing you to focus on learning.
 
-        - **Leverage All Features:** By choosing videos between 2 and 5 minutes, you'll access a transcript with translation tooltips, and your new vocabulary will be saved to the cloud. Review these words on the "Study Vocabulary" page, or download your vocabulary to an excel spreadsheet. Finally, don't forget track your learning journey by checking how many new words you've encountered and how your fluency has improved on the "Your Progress" page.
+        - **Leverage All Features:** By choosing videos with captions in your target language (long ones are split into parts of a few minutes), you'll access a transcript with translation tooltips, and your new vocabulary will be saved to the cloud. Review these words on the "Study Vocabulary" page, or download your vocabulary to an excel spreadsheet. Finally, don't forget track your learning journey by checking how many new words you've encountered and how your fluency has improved on the "Your Progress" page.
 
         - **Set Goals:** Define clear language learning goals. Think about how you want to use the language - whether for travel, work, or personal interest. Decide on the subjects you want to be able to talk about or understand, like discussing travel experiences, ordering food, or following the news, to guide your learning path and keep you motivated.
 
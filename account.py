@@ -1,26 +1,7 @@
 import streamlit as st
-import firebase_admin
-from firebase_admin import credentials
-from firebase_admin import firestore
 import json
-import requests
-import os
-
-firebase_credentials_json = st.secrets['FIREBASE_CREDENTIALS_PATH']
-
-try:
-    firebase_credentials_dict = json.loads(firebase_credentials_json)
-    cred = credentials.Certificate(firebase_credentials_dict)
-    firebase_admin.initialize_app(cred)
-except json.JSONDecodeError:
-    raise EnvironmentError("Invalid JSON format for Firebase credentials.")
-except KeyError:
-    raise EnvironmentError("Firebase credentials not set in Streamlit secrets.")
-except Exception as e:
-    raise EnvironmentError(f"Error initializing Firebase: {str(e)}")
-
-# Initialize Firestore client
-db = firestore.client()
+from resources import get_db, get_http_session
+from telemetry import span
 
 def app():
     st.title('Welcome to :orange[LanguageBuddy] :sunglasses:')
@@ -32,7 +13,8 @@ def app():
 
     def check_username_uniqueness(username):
         # Check if the username already exists as a document ID in the 'users' collection
-        user_doc = db.collection('users').document(username).get()
+        with span('firestore.get'):
+            user_doc = get_db().collection('users').document(username).get()
         return not user_doc.exists
 
     def sign_up_with_email_and_password(email, password, username=None, return_secure_token=True):
@@ -53,11 +35,12 @@ def app():
             if username:
                 payload["displayName"] = username 
             payload = json.dumps(payload)
-            r = requests.post(rest_api_url, params={"key": st.secrets['FIREBASE_API_KEY']}, data=payload)
+            with span('auth.sign_up'):
+                r = get_http_session().post(rest_api_url, params={"key": st.secrets['FIREBASE_API_KEY']}, data=payload)
             if r.status_code == 200:
                 # Store user in Firestore with username as document ID
                 user_data = r.json()
-                db.collection('users').document(username).set({
+                get_db().collection('users').document(username).set({
                     'email': email
                     # Create 'vocabulary' collection here if needed, but remember it won't actually exist until documents are added
                 })
@@ -80,7 +63,8 @@ def app():
                 payload["password"] = password
             payload = json.dumps(payload)
             print('payload sigin',payload)
-            r = requests.post(rest_api_url, params={"key": st.secrets['FIREBASE_API_KEY']}, data=payload)
+            with span('auth.sign_in'):
+                r = get_http_session().post(rest_api_url, params={"key": st.secrets['FIREBASE_API_KEY']}, data=payload)
             try:
                 data = r.json()
                 user_info = {
@@ -101,7 +85,8 @@ def app():
                 "requestType": "PASSWORD_RESET"
             }
             payload = json.dumps(payload)
-            r = requests.post(rest_api_url, params={"key": st.secrets['FIREBASE_API_KEY']}, data=payload)
+            with span('auth.reset_password'):
+                r = get_http_session().post(rest_api_url, params={"key": st.secrets['FIREBASE_API_KEY']}, data=payload)
             if r.status_code == 200:
                 return True, "Reset email Sent"
             else:
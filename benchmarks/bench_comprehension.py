@@ -0,0 +1,66 @@
+"""
+Latency of the video comprehension score and of ranking candidate videos by it.
+
+Scores transcripts of 1k to 1M tokens against a 50k-word vocabulary (word counting
+and the join separately), then ranks batches of 2000-token videos, as when
+recommending the most comprehensible of many candidates.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_comprehension
+"""
+import random
+import time
+from collections import Counter
+
+import pandas as pd
+
+from benchmarks.fakes import make_transcript
+
+from comprehension import level_series, rank_videos, score, word_frequencies
+from tokenizer import tokenize_transcript
+from vocabulary import FLUENCY_LEVELS
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+VIDEO_COUNTS = [10, 100, 1_000]
+VOCABULARY_SIZE = 50_000
+
+
+def make_vocabulary(size, seed=0):
+    """Every other word of the fakes' vocabulary, at random fluency levels."""
+    rng = random.Random(seed)
+    return pd.Series({f'mot{i}': rng.choice(FLUENCY_LEVELS) for i in range(0, 2 * size, 2)})
+
+
+def best_of(func, *args, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    vocabulary = make_vocabulary(VOCABULARY_SIZE)
+    levels = level_series(vocabulary)
+    print(f"{'tokens':>10} {'token stream (ms)':>18} {'count_words (ms)':>17} {'speedup':>8} {'score (ms)':>11} {'known tokens':>13}")
+    for size in SIZES:
+        transcript = make_transcript(size, vocabulary_size=max(2000, size // 20))
+        stream = best_of(lambda: Counter(token.normalized for token in tokenize_transcript(transcript)), repeat=3)
+        counting = best_of(word_frequencies, transcript, repeat=3)
+        frequencies = word_frequencies(transcript)
+        joining = best_of(score, frequencies, levels)
+        result = score(frequencies, levels)
+        print(f"{size:>10} {stream * 1000:>18.1f} {counting * 1000:>17.1f} {stream / counting:>7.1f}x {joining * 1000:>11.2f} {result.known_tokens:>13.1%}")
+
+    print()
+    print(f"{'videos':>10} {'rank (ms)':>10} {'per video (ms)':>15}")
+    for count in VIDEO_COUNTS:
+        candidates = {f'video{i}': word_frequencies(make_transcript(2000, seed=i)) for i in range(count)}
+        seconds = best_of(rank_videos, candidates, vocabulary, repeat=3)
+        print(f"{count:>10} {seconds * 1000:>10.1f} {seconds * 1000 / count:>15.2f}")
+
+
+if __name__ == '__main__':
+    main()
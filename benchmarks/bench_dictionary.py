@@ -0,0 +1,122 @@
+"""
+Lookups per second and resident memory of the memory-mapped local dictionary.
+
+For dictionaries of 10k to 1M words, compares the compiled file (`local_dictionary`)
+with loading the same word list into a Python dict. Memory is the private resident
+memory a worker process gains after 20k lookups, measured in a fresh interpreter per
+case; the mapped file's pages are shared page cache and not counted. The last table
+shows how much Reverso traffic the dictionary tier saves for a transcript whose
+words are mostly in the dictionary.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_dictionary
+"""
+import json
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+
+from benchmarks import fakes
+
+import translation
+from local_dictionary import LocalDictionary, build
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIZES = [10_000, 100_000, 1_000_000]
+LOOKUPS = 200_000
+
+
+def make_entries(size, seed=0):
+    rng = random.Random(seed)
+    entries = {}
+    while len(entries) < size:
+        word = ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 12)))
+        entries[word] = [f'{word}-en', f'{word}-en-2']
+    return entries
+
+
+def resident_memory(setup, lookup_words_path):
+    """Run `setup` (which binds `lookup`) in a fresh interpreter and return its private resident memory growth in bytes."""
+    script = textwrap.dedent(f'''
+        import json, sys
+        sys.path.insert(0, {REPO!r})
+        def rss():
+            with open('/proc/self/status') as status:
+                return next(int(line.split()[1]) * 1024 for line in status if line.startswith('RssAnon'))
+        with open({lookup_words_path!r}) as words_file:
+            words = json.load(words_file)
+        before = rss()
+    ''') + textwrap.dedent(setup) + textwrap.dedent('''
+        for word in words:
+            lookup(word)
+        print(rss() - before)
+    ''')
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+    return int(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'words':>9} {'build (s)':>10} {'file (MiB)':>11} {'hits/s':>11} {'misses/s':>11} "
+              f"{'mmap private (MiB)':>19} {'dict private (MiB)':>19}")
+        for size in SIZES:
+            entries = make_entries(size)
+            path = os.path.join(directory, f'{size}.dict')
+            source = os.path.join(directory, f'{size}.json')
+            start = time.perf_counter()
+            build(entries, path)
+            build_seconds = time.perf_counter() - start
+            with open(source, 'w') as source_file:
+                json.dump(entries, source_file)
+
+            dictionary = LocalDictionary(path)
+            rng = random.Random(1)
+            hits = rng.choices(list(entries), k=LOOKUPS)
+            misses = [word + '#' for word in hits]
+            start = time.perf_counter()
+            for word in hits:
+                dictionary.lookup(word)
+            hit_rate = LOOKUPS / (time.perf_counter() - start)
+            start = time.perf_counter()
+            for word in misses:
+                dictionary.lookup(word)
+            miss_rate = LOOKUPS / (time.perf_counter() - start)
+
+            words_path = os.path.join(directory, f'{size}-lookups.json')
+            with open(words_path, 'w') as words_file:
+                json.dump(hits[:20_000], words_file)
+            mapped = resident_memory(f'''
+                from local_dictionary import LocalDictionary
+                lookup = LocalDictionary({path!r}).lookup
+            ''', words_path)
+            loaded = resident_memory(f'''
+                with open({source!r}) as source_file:
+                    lookup = json.load(source_file).get
+            ''', words_path)
+            print(f"{size:>9} {build_seconds:>10.2f} {os.path.getsize(path) / 2 ** 20:>11.1f} {hit_rate:>11,.0f} "
+                  f"{miss_rate:>11,.0f} {mapped / 2 ** 20:>19.1f} {loaded / 2 ** 20:>19.1f}")
+
+        # Translation engine with and without the dictionary tier, 90% of the words covered.
+        entries = make_entries(10_000)
+        path = os.path.join(directory, 'engine.dict')
+        build(entries, path)
+        words = list(entries)[:900] + [f'unknown{i}' for i in range(100)]
+        print()
+        print(f"{'engine':<18} {'1000 words (s)':>15} {'Reverso calls':>14}")
+        for name, dictionary in [('Reverso only', None), ('dictionary first', LocalDictionary(path))]:
+            client = fakes.make_reverso_client(latency=0.02)
+            with fakes.patched(translation, 'Client', client):
+                engine = translation.TranslationEngine('en', 'fr', requests_per_second=0, dictionary=dictionary)
+                start = time.perf_counter()
+                engine.translate_many(words)
+                print(f"{name:<18} {time.perf_counter() - start:>15.2f} {client.calls:>14}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Cost of one fluency radio click in a flashcard session, with and without a fragment per card.
+
+Each card is an `st.fragment`, so a click only reruns that card. Without the
+fragment, a click reruns the whole Study Vocabulary page: the vocabulary table
+plus all ten cards. Both scopes are timed on the current page with Streamlit's
+AppTest against in-process fakes, for several vocabulary sizes. The whole-page
+column is today's page, not the page as it was before fragments.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_flashcards
+"""
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks import fakes
+
+import study_vocabulary
+import translation
+import tts_cache
+import vocabulary
+import write_queue
+from streamlit.logger import set_log_level
+from streamlit.testing.v1 import AppTest
+
+set_log_level('error')
+
+SIZES = [1_000, 10_000, 100_000]
+CLICKS = 5
+USER = 'bench-user'
+LANG_PAIR = 'en-fr'
+
+# Shared with the AppTest scripts, which run in this process.
+STATE = {}
+
+
+def full_page():
+    """What a radio click would rerun without the fragment: the whole current page."""
+    import streamlit as st
+    from benchmarks import bench_flashcards as bench
+    import study_vocabulary
+
+    st.session_state.username = bench.USER
+    st.session_state.native_language = 'en'
+    st.session_state.target_language = 'fr'
+    st.session_state.db = bench.STATE['db']
+    st.session_state.setdefault('flashcards', bench.STATE['cards'])
+    study_vocabulary.app()
+
+
+def single_card():
+    """What a radio click reruns: one flashcard fragment."""
+    from benchmarks import bench_flashcards as bench
+    import study_vocabulary
+
+    card = bench.STATE['cards'][3]
+    study_vocabulary.flashcard(3, card, bench.STATE['translations'].get(card['Word']),
+                               bench.STATE['audio'].get(card['Word']), 'en', 'fr')
+
+
+def click_timings(script, radio_key):
+    app_test = AppTest.from_function(script, default_timeout=120).run()
+    timings = []
+    for click in range(CLICKS):
+        radio = app_test.radio(key=radio_key)
+        radio.set_value(vocabulary.FLUENCY_LEVELS[(click % 4) + 1])
+        start = time.perf_counter()
+        app_test.run()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    with fakes.patched(translation, 'Client', fakes.make_reverso_client()), \
+            fakes.patched(tts_cache, 'synthesize', fakes.make_synthesizer()):
+        print(f"{'vocabulary':>10} {'whole page (ms)':>16} {'one card (ms)':>14} {'speedup':>8}")
+        for size in SIZES:
+            db = fakes.FakeFirestore()
+            vocabulary.upsert_new_words([f'mot{i}' for i in range(size)], USER, db, LANG_PAIR)
+            cards = [{'Word': f'mot{i}', 'Fluency': '1-new'} for i in range(10)]
+            words = [card['Word'] for card in cards]
+            STATE.update(
+                db=db,
+                cards=cards,
+                translations=study_vocabulary.get_translations(words, 'en', 'fr'),
+                audio=study_vocabulary.get_pronunciations(words, 'fr'),
+            )
+            # The page shows the write queue's status; keep it on this run's fake client.
+            queue = write_queue.WriteQueue(db, directory=tempfile.mkdtemp(prefix='languagebuddy-bench-'),
+                                           flush_interval=3600)
+            with fakes.patched(write_queue, '_queue', queue):
+                whole = click_timings(full_page, 'fluency_3')
+                card = click_timings(single_card, 'fluency_3')
+            print(f"{size:>10} {whole * 1000:>16.1f} {card * 1000:>14.1f} {whole / card:>7.1f}x")
+
+
+if __name__ == '__main__':
+    # The AppTest scripts import this module by name; make that resolve to this run's STATE.
+    sys.modules.setdefault('benchmarks.bench_flashcards', sys.modules[__name__])
+    main()
@@ -0,0 +1,67 @@
+"""
+Throughput of the headless ingestion CLI (`ingest.py`) against the service fakes.
+
+Ingests the same batch of synthetic videos with a growing number of workers, each
+from cold caches, then once more with the caches left warm by the previous run, as
+when a second language pair's students open lessons that were pre-ingested.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_ingest
+    python -m benchmarks.bench_ingest --videos 100 --tokens 5000 --user
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks import fakes
+from benchmarks.bench_pipeline import reset_caches
+
+import ingest
+import transcripts
+import translation
+import translation_store
+
+WORKERS = [1, 4, 8, 16]
+
+
+def run(args, workers, db, warm=False):
+    if not warm:
+        reset_caches()
+    # The production rate limit would dominate every timing; --rps sets it explicitly.
+    translation._engines[('en', 'fr')] = translation.TranslationEngine(
+        'en', 'fr', requests_per_second=args.rps, store=translation_store.get_store())
+    with tempfile.TemporaryDirectory() as directory:
+        journal = ingest.Journal(os.path.join(directory, 'journal.jsonl'))
+        video_ids = [f'video{i:06d}' for i in range(args.videos)]
+        start = time.perf_counter()
+        results = ingest.ingest(video_ids, 'fr', 'en', journal, workers, db, 'bench-user' if db else None,
+                                report=lambda result: None)
+        return ingest.summarize(results, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--videos', type=int, default=40, help='videos per run')
+    parser.add_argument('--tokens', type=int, default=2000, help='words per transcript')
+    parser.add_argument('--user', action='store_true', help='also upsert the words into a fake Firestore')
+    parser.add_argument('--firestore-latency', type=float, default=5, help='milliseconds per Firestore round trip')
+    parser.add_argument('--reverso-latency', type=float, default=20, help='milliseconds per Reverso lookup')
+    parser.add_argument('--youtube-latency', type=float, default=50, help='milliseconds per transcript download')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='probability that any fake call fails')
+    parser.add_argument('--rps', type=float, default=0, help='Reverso requests per second (0 disables the limit)')
+    args = parser.parse_args()
+
+    client = fakes.make_reverso_client(latency=args.reverso_latency / 1000, failure_rate=args.failure_rate)
+    api = fakes.make_transcript_api(latency=args.youtube_latency / 1000, n_tokens=args.tokens,
+                                    failure_rate=args.failure_rate)
+    with fakes.patched(translation, 'Client', client), fakes.patched(transcripts, 'YouTubeTranscriptApi', api):
+        for workers in WORKERS:
+            db = fakes.FakeFirestore(latency=args.firestore_latency / 1000, failure_rate=args.failure_rate) if args.user else None
+            print(f"{workers:>2} workers, cold: {run(args, workers, db)}")
+        print(f"{WORKERS[-1]:>2} workers, warm: {run(args, WORKERS[-1], None, warm=True)}")
+
+
+if __name__ == '__main__':
+    main()
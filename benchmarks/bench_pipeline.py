@@ -0,0 +1,318 @@
+"""
+End-to-end throughput, latency and peak memory of the LanguageBuddy hot paths.
+
+Every external service is replaced by the in-process fakes in `benchmarks.fakes`
+(Firestore, Reverso Context, gTTS and the YouTube transcript API), with a
+configurable latency and failure rate per call, so the suite runs offline and
+gives the same numbers on every machine. Each case sweeps transcript length or
+vocabulary size and starts from cold caches.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --quick --failure-rate 0.01
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+
+from benchmarks import fakes
+
+import learn
+import lesson_pipeline
+import lexicon
+import migrate_lexicon
+import progress
+import streamlit as st
+import study_vocabulary
+import tokenizer
+import transcripts
+import translation
+import translation_store
+import tts_cache
+import vocabulary
+import vocabulary_browser
+import vocabulary_cache
+import vocabulary_io
+import write_queue
+from disk_cache import DiskCache
+from streamlit.logger import set_log_level
+
+set_log_level('error')
+
+USER = 'bench-user'
+LANG_PAIR = 'en-fr'
+TRANSCRIPT_SIZES = [1_000, 10_000, 100_000]
+VOCABULARY_SIZES = [1_000, 10_000, 50_000]
+TRANSLATION_SIZES = [100, 1_000, 3_000]
+TRANSFER_SIZES = [1_000, 10_000, 100_000]
+PRONUNCIATION_SIZES = [10, 100]
+BROWSE_PAGES = 5
+QUICK_SIZES = 2
+
+
+def reset_caches():
+    """Point every process-wide store at empty caches in a fresh directory."""
+    directory = tempfile.mkdtemp(prefix='languagebuddy-bench-')
+    translation_store._store = translation_store.TranslationStore(DiskCache('translations', directory=directory))
+    transcripts._store = transcripts.TranscriptStore(
+        DiskCache('transcripts', directory=directory), DiskCache('transcripts_missing', directory=directory))
+    tts_cache._store = tts_cache.AudioStore(DiskCache('pronunciations', directory=directory))
+    translation._engines.clear()
+    vocabulary_cache._caches.clear()
+    lexicon._lexicons.clear()
+    lexicon._lexicons['fr'] = lexicon.Lexicon('fr', DiskCache('lexicon', directory=directory))
+
+
+def seed_vocabulary(db, size):
+    """
+    Fill a user's vocabulary without paying the fake latency or failures.
+
+    The words are dated over the past month, as if added in earlier sessions, so
+    delta syncs only pick up what the benchmark changes afterwards.
+    """
+    latency, failure_rate = db.latency, db.failure_rate
+    db.latency, db.failure_rate = 0.0, 0.0
+    try:
+        vocabulary.upsert_new_words([f'mot{i}' for i in range(size)], USER, db, LANG_PAIR)
+        step = timedelta(days=30) / max(size, 1)
+        for age, document in enumerate(db.documents.values(), start=1):
+            if vocabulary.UPDATED_FIELD in document:
+                document[vocabulary.UPDATED_FIELD] -= timedelta(hours=1) + age * step
+    finally:
+        db.latency, db.failure_rate = latency, failure_rate
+        db.stats.clear()
+
+
+class Pipeline:
+    """The benchmark cases, sharing the fake service settings from the command line."""
+
+    def __init__(self, args):
+        self.args = args
+
+    def firestore(self):
+        return fakes.FakeFirestore(latency=self.args.firestore_latency / 1000, failure_rate=self.args.failure_rate)
+
+    def engine(self):
+        # The production rate limit would dominate every timing; it is benchmarked separately via --rps.
+        translation._engines[('en', 'fr')] = translation.TranslationEngine(
+            'en', 'fr', requests_per_second=self.args.rps, store=translation_store.get_store())
+
+    def transcript_fetch(self, size):
+        api = fakes.make_transcript_api(latency=self.args.youtube_latency / 1000, n_tokens=size,
+                                        failure_rate=self.args.failure_rate)
+        transcripts.YouTubeTranscriptApi = api
+        return lambda: learn.get_transcription('https://youtu.be/dQw4w9WgXcQ'), size, None
+
+    def stream_transcript(self, size):
+        db = self.firestore()
+        self.engine()
+        self.write_queue(db)
+        transcript = fakes.make_transcript(size, vocabulary_size=max(200, size // 10))
+        return lambda: learn.stream_transcript(transcript, db), size, db
+
+    def import_lesson(self, size):
+        db = self.firestore()
+        self.engine()
+        queue = self.write_queue(db)
+        transcript = fakes.make_transcript(size, vocabulary_size=max(200, size // 10))
+
+        def import_and_show():
+            # What Import Lesson and the first view of the lesson run: queue every word, then stream the first window.
+            queue.add_words(USER, LANG_PAIR, tokenizer.count_words(transcript))
+            return learn.stream_transcript(lesson_pipeline.window_at(transcript, 0).lines, db, save_words=False)
+
+        return import_and_show, size, db
+
+    def upsert_words(self, size):
+        db = self.firestore()
+        # Half of the words are already in the vocabulary, as when a second video is imported.
+        seed_vocabulary(db, size // 2)
+        words = {f'mot{i}' for i in range(size // 4, size // 4 + size)}
+        return lambda: vocabulary.upsert_new_words(words, USER, db, LANG_PAIR), size, db
+
+    def write_queue(self, db):
+        # Flushed by the benchmark itself rather than the background thread.
+        queue = write_queue.WriteQueue(db, directory=tempfile.mkdtemp(prefix='languagebuddy-bench-'), flush_interval=3600)
+        write_queue._queue = queue
+        return queue
+
+    def queue_words(self, size):
+        db = self.firestore()
+        self.write_queue(db)
+        words = {f'mot{i}' for i in range(size)}
+        return lambda: learn.send_unique_words_to_firestore(words, USER, db, LANG_PAIR), size, db
+
+    def flush_words(self, size):
+        db = self.firestore()
+        seed_vocabulary(db, size // 2)
+        queue = self.write_queue(db)
+        queue.add_words(USER, LANG_PAIR, [f'mot{i}' for i in range(size // 4, size // 4 + size)])
+        # Every word's level is queued twice; only the last one is written.
+        for level in vocabulary.FLUENCY_LEVELS[1:3]:
+            queue.set_fluency(USER, LANG_PAIR, {f'mot{i}': level for i in range(size // 4, size // 4 + size)})
+        return queue.drain, size, db
+
+    def translate_words(self, size):
+        self.engine()
+        words = [f'mot{i}' for i in range(size)]
+        return lambda: learn.batch_get_translations(words, 'en', 'fr'), size, None
+
+    def vocabulary_stats(self, size):
+        db = self.firestore()
+        seed_vocabulary(db, size)
+        return lambda: progress.fetch_vocabulary_stats(USER, LANG_PAIR, db), size, db
+
+    def vocabulary_full_sync(self, size):
+        db = self.firestore()
+        seed_vocabulary(db, size)
+        return lambda: vocabulary_cache.get_cache(USER, LANG_PAIR).sync(db), size, db
+
+    def vocabulary_packed_sync(self, size):
+        db = self.firestore()
+        seed_vocabulary(db, size)
+        latency, db.latency = db.latency, 0.0
+        migrate_lexicon.migrate_vocabulary(db, USER, LANG_PAIR)
+        db.latency = latency
+        db.stats.clear()
+        return lambda: vocabulary_cache.get_cache(USER, LANG_PAIR).sync(db), size, db
+
+    def vocabulary_delta_sync(self, size):
+        db = self.firestore()
+        seed_vocabulary(db, size)
+        cache = vocabulary_cache.get_cache(USER, LANG_PAIR)
+        latency, db.latency = db.latency, 0.0
+        cache.sync(db)
+        vocabulary.change_fluency(db, USER, LANG_PAIR, {f'mot{i}': '2-recognized' for i in range(10)})
+        db.latency = latency
+        db.stats.clear()
+        return lambda: cache.sync(db, max_age=0), size, db
+
+    def browse_vocabulary(self, size):
+        db = self.firestore()
+        seed_vocabulary(db, size)
+
+        def flip_pages():
+            browser = vocabulary_browser.VocabularyBrowser(USER, LANG_PAIR)
+            for _ in range(BROWSE_PAGES):
+                browser.page(db)
+                browser.next()
+            return True
+
+        return flip_pages, size, db
+
+    def export_vocabulary(self, size):
+        db = self.firestore()
+        seed_vocabulary(db, size)
+
+        def export():
+            with open(os.devnull, 'w', newline='') as out:
+                return vocabulary_io.export_vocabulary(db, USER, LANG_PAIR, out)
+
+        return export, size, db
+
+    def import_vocabulary(self, size):
+        db = self.firestore()
+        # Half of the imported words are already in the vocabulary; every fifth one has a level past '1-new'.
+        entries = ((f'mot{i}', vocabulary.FLUENCY_LEVELS[1] if i % 5 == 0 else None) for i in range(size // 2, size // 2 + size))
+        seed_vocabulary(db, size)
+        return lambda: vocabulary_io.import_vocabulary(db, USER, LANG_PAIR, entries), size, db
+
+    def pronunciations(self, size):
+        tts_cache.synthesize = fakes.make_synthesizer(latency=self.args.tts_latency / 1000,
+                                                      failure_rate=self.args.failure_rate)
+        words = [f'mot{i}' for i in range(size)]
+        return lambda: study_vocabulary.get_pronunciations(words, 'fr'), size, None
+
+    def cases(self):
+        return [
+            ('transcript fetch', 'tokens', TRANSCRIPT_SIZES, self.transcript_fetch),
+            ('stream transcript', 'tokens', TRANSCRIPT_SIZES, self.stream_transcript),
+            ('import lesson', 'tokens', TRANSCRIPT_SIZES, self.import_lesson),
+            ('upsert words', 'words', VOCABULARY_SIZES, self.upsert_words),
+            ('queue words', 'words', VOCABULARY_SIZES, self.queue_words),
+            ('flush queued words', 'words', VOCABULARY_SIZES, self.flush_words),
+            ('translate words', 'words', TRANSLATION_SIZES, self.translate_words),
+            ('vocabulary stats', 'words', VOCABULARY_SIZES, self.vocabulary_stats),
+            ('vocabulary full sync', 'words', VOCABULARY_SIZES, self.vocabulary_full_sync),
+            ('vocabulary packed sync', 'words', VOCABULARY_SIZES, self.vocabulary_packed_sync),
+            ('vocabulary delta sync', 'words', VOCABULARY_SIZES, self.vocabulary_delta_sync),
+            ('browse 5 pages', 'words', VOCABULARY_SIZES, self.browse_vocabulary),
+            ('export vocabulary', 'words', TRANSFER_SIZES, self.export_vocabulary),
+            ('import vocabulary', 'words', TRANSFER_SIZES, self.import_vocabulary),
+            ('pronunciations', 'clips', PRONUNCIATION_SIZES, self.pronunciations),
+        ]
+
+
+def run(setup, size, repeat):
+    """
+    Time `repeat` cold runs of a case, then measure its peak memory in one more.
+
+    Memory is measured separately because tracemalloc slows the timed code down.
+
+    :return: (median seconds, peak bytes, Firestore stats of the last timed run, number of failed runs).
+    """
+    timings, failures, stats = [], 0, None
+    for _ in range(repeat):
+        reset_caches()
+        func, _, db = setup(size)
+        start = time.perf_counter()
+        try:
+            # The page functions report errors in the UI and return None.
+            failures += func() is None
+        except Exception:
+            failures += 1
+        timings.append(time.perf_counter() - start)
+        stats = db.stats if db is not None else None
+
+    reset_caches()
+    func, _, _ = setup(size)
+    tracemalloc.start()
+    try:
+        func()
+    except Exception:
+        pass
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return statistics.median(timings), peak, stats, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--firestore-latency', type=float, default=5, help='milliseconds per Firestore round trip')
+    parser.add_argument('--reverso-latency', type=float, default=20, help='milliseconds per Reverso lookup')
+    parser.add_argument('--tts-latency', type=float, default=20, help='milliseconds per gTTS synthesis')
+    parser.add_argument('--youtube-latency', type=float, default=50, help='milliseconds per transcript download')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='probability that any fake call fails')
+    parser.add_argument('--rps', type=float, default=0, help='Reverso requests per second (0 disables the limit)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case')
+    parser.add_argument('--quick', action='store_true', help='only run the smallest sizes')
+    args = parser.parse_args()
+
+    st.session_state.username = USER
+    st.session_state.native_language = 'en'
+    st.session_state.target_language = 'fr'
+
+    pipeline = Pipeline(args)
+    client = fakes.make_reverso_client(latency=args.reverso_latency / 1000, failure_rate=args.failure_rate)
+    with fakes.patched(translation, 'Client', client), \
+            fakes.patched(transcripts, 'YouTubeTranscriptApi', transcripts.YouTubeTranscriptApi), \
+            fakes.patched(tts_cache, 'synthesize', tts_cache.synthesize):
+        print(f"{'case':<22} {'size':>8} {'latency (ms)':>13} {'throughput':>18} {'peak (MiB)':>11} "
+              f"{'fs reads':>9} {'fs writes':>10} {'failed':>7}")
+        for name, unit, sizes, setup in pipeline.cases():
+            for size in sizes[:QUICK_SIZES] if args.quick else sizes:
+                seconds, peak, stats, failures = run(setup, size, args.repeat)
+                stats = stats or {}
+                print(f"{name:<22} {size:>8} {seconds * 1000:>13.1f} {size / seconds:>11,.0f} {unit + '/s':<7}"
+                      f"{peak / 2 ** 20:>11.1f} {stats.get('reads', 0):>9} {stats.get('writes', 0):>10} "
+                      f"{failures:>4}/{args.repeat}")
+
+
+if __name__ == '__main__':
+    main()
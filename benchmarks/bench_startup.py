@@ -0,0 +1,106 @@
+"""
+Cold-start cost: import time per page and time to the login screen.
+
+Each measurement runs in a fresh interpreter so nothing is already imported.
+Firebase is initialized from a throwaway service account generated here
+(initialization does not contact Google), so no real credentials are needed.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ['account', 'learn', 'study_vocabulary', 'progress', 'about']
+RUNS = 3
+
+
+def write_fake_secrets(directory):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption()).decode()
+    service_account = {
+        'type': 'service_account',
+        'project_id': 'languagebuddy-bench',
+        'private_key_id': 'bench',
+        'private_key': pem,
+        'client_email': 'bench@languagebuddy-bench.iam.gserviceaccount.com',
+        'client_id': '0',
+        'token_uri': 'https://oauth2.googleapis.com/token',
+    }
+    os.makedirs(os.path.join(directory, '.streamlit'), exist_ok=True)
+    with open(os.path.join(directory, '.streamlit', 'secrets.toml'), 'w') as secrets:
+        secrets.write(f'FIREBASE_CREDENTIALS_PATH = {json.dumps(json.dumps(service_account))}\n')
+        secrets.write('FIREBASE_API_KEY = "bench"\n')
+
+
+def measure(code, cwd):
+    """Run `code` in a fresh interpreter and return the float it prints last."""
+    script = textwrap.dedent(f'''
+        import sys, time
+        sys.path.insert(0, {REPO!r})
+        from streamlit.logger import set_log_level
+        set_log_level('error')
+    ''') + textwrap.dedent(code)
+    timings = []
+    for _ in range(RUNS):
+        result = subprocess.run([sys.executable, '-c', script], cwd=cwd, capture_output=True, text=True, check=True)
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return min(timings)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as cwd:
+        write_fake_secrets(cwd)
+
+        print(f"{'page':<18} {'import (ms)':>12}")
+        for page in PAGES:
+            # Pages other than account are imported after login, so account is already loaded.
+            preload = '' if page == 'account' else 'import account'
+            elapsed = measure(f'''
+                import streamlit
+                {preload}
+                start = time.perf_counter()
+                import {page}
+                print(time.perf_counter() - start)
+            ''', cwd)
+            print(f"{page:<18} {elapsed * 1000:>12.1f}")
+
+        lazy = measure(f'''
+            from streamlit.testing.v1 import AppTest
+            app_test = AppTest.from_file({os.path.join(REPO, 'main.py')!r}, default_timeout=60)
+            start = time.perf_counter()
+            app_test.run()
+            assert not app_test.exception, app_test.exception
+            print(time.perf_counter() - start)
+        ''', cwd)
+        # What main.py used to do: import every page before drawing the login screen.
+        eager_imports = measure(f'''
+            import streamlit
+            start = time.perf_counter()
+            import {', '.join(PAGES)}
+            print(time.perf_counter() - start)
+        ''', cwd)
+        account_import = measure('''
+            import streamlit
+            start = time.perf_counter()
+            import account
+            print(time.perf_counter() - start)
+        ''', cwd)
+
+        print()
+        print(f"time to login screen (lazy pages):       {lazy * 1000:8.1f} ms")
+        print(f"estimated with eager page imports:        {(lazy - account_import + eager_imports) * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
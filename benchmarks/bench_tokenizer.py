@@ -0,0 +1,59 @@
+"""
+Throughput of the transcript tokenizer from 1k to 1M tokens.
+
+Compares the single-pass `tokenizer.tokenize_transcript` stream against the old
+two-pass cleanup that `learn.process_transcript` used to do.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_tokenizer
+"""
+import re
+import time
+
+from benchmarks.fakes import make_transcript
+from tokenizer import tokenize_transcript
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def legacy_two_pass(transcript):
+    """The previous process_transcript tokenization: clean every line once for the word set and again to render."""
+    def remove_punctuation(input_string):
+        return re.sub(r'[^\w\s\']+', '', input_string).lower()
+
+    unique_words = set()
+    for line in transcript:
+        if line["text"] != '[Music]':
+            unique_words.update(remove_punctuation(word).lower() for word in line["text"].split() if word.strip() != '')
+    rendered = 0
+    for line in transcript:
+        if line["text"] != '[Music]':
+            for word in line["text"].split():
+                if remove_punctuation(word):
+                    rendered += 1
+    return unique_words, rendered
+
+
+def single_pass(transcript):
+    tokens = list(tokenize_transcript(transcript))
+    return {token.normalized for token in tokens}, len(tokens)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'tokens':>10} {'two-pass (s)':>13} {'single-pass (s)':>16} {'tokens/s':>12} {'speedup':>8}")
+    for size in SIZES:
+        transcript = make_transcript(size)
+        legacy = min(timed(legacy_two_pass, transcript) for _ in range(3))
+        current = min(timed(single_pass, transcript) for _ in range(3))
+        print(f"{size:>10} {legacy:>13.4f} {current:>16.4f} {size / current:>12,.0f} {legacy / current:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Behaviour checks for the write-behind queue in `write_queue`, against the in-process Firestore fake.
+
+Covers coalescing of repeated writes, the version guard that keeps a write queued
+again during a flush, lease takeover between worker processes, and that every
+claimed write gets an outcome when a flush fails. Each check uses its own queue
+file and stops at the first failed assertion.
+
+Run from the repository root:
+
+    python -m benchmarks.check_write_queue
+"""
+import tempfile
+
+from benchmarks import fakes
+
+import vocabulary
+import write_queue
+
+USER = 'check-user'
+LANG_PAIR = 'en-fr'
+
+
+def make_queue(db, directory=None):
+    """A queue flushed only by the checks; its background thread would race them."""
+    directory = directory or tempfile.mkdtemp(prefix='languagebuddy-check-')
+    queue = write_queue.WriteQueue(db, directory=directory, flush_interval=3600)
+    queue._thread = object()
+    return queue
+
+
+def fluency(db, word):
+    document = db.documents.get(vocabulary.words_collection(db, USER, LANG_PAIR).document(word).path)
+    return document and document['fluency']
+
+
+def rows(queue):
+    return queue._connection().execute(
+        'SELECT word, kind, fluency, version, attempts, error FROM writes ORDER BY word, kind').fetchall()
+
+
+def check_coalescing():
+    db = fakes.FakeFirestore()
+    queue = make_queue(db)
+    queue.add_words(USER, LANG_PAIR, ['chat', 'chien'])
+    queue.add_words(USER, LANG_PAIR, ['chat'])
+    queue.set_fluency(USER, LANG_PAIR, {'chat': '2-recognized'})
+    queue.set_fluency(USER, LANG_PAIR, {'chat': '4-learned'})
+    assert len(rows(queue)) == 3, rows(queue)
+    assert queue.status(USER).pending == 3
+
+    assert queue.drain() == 3
+    assert queue.is_flushed(USER, LANG_PAIR)
+    assert fluency(db, 'chat') == '4-learned' and fluency(db, 'chien') == '1-new'
+    counts = vocabulary.get_fluency_counts(db, USER, LANG_PAIR)
+    assert counts['1-new'] == 1 and counts['4-learned'] == 1, counts
+
+
+def check_version_guard():
+    db = fakes.FakeFirestore()
+    vocabulary.upsert_new_words(['chat'], USER, db, LANG_PAIR)
+    queue = make_queue(db)
+    queue.set_fluency(USER, LANG_PAIR, {'chat': '2-recognized'})
+    claimed = queue._claim()
+    # Queued again while the first level is being sent.
+    queue.set_fluency(USER, LANG_PAIR, {'chat': '5-known'})
+    queue._settle(claimed, {})
+    assert [(word, level, version) for word, _, level, version, _, _ in rows(queue)] == [('chat', '5-known', 1)], rows(queue)
+
+    # A failure of the replaced write doesn't count against the new one either.
+    claimed = queue._claim()
+    queue.set_fluency(USER, LANG_PAIR, {'chat': '3-familiar'})
+    queue._settle(claimed, {(USER, LANG_PAIR, 'chat', write_queue.FLUENCY): 'boom'})
+    assert [(level, attempts, error) for _, _, level, _, attempts, error in rows(queue)] == [('3-familiar', 0, None)], rows(queue)
+
+    assert queue.drain() == 1
+    assert fluency(db, 'chat') == '3-familiar'
+
+
+def check_lease_takeover():
+    db = fakes.FakeFirestore()
+    directory = tempfile.mkdtemp(prefix='languagebuddy-check-')
+    # Two worker processes sharing one queue file.
+    first, second = make_queue(db, directory), make_queue(db, directory)
+    first.add_words(USER, LANG_PAIR, ['chat'])
+
+    # The first worker claims the write and dies before settling it.
+    assert len(first._claim()) == 1
+    assert second.flush() == 0, 'a leased write was taken over early'
+    assert second.status(USER).pending == 1
+
+    with fakes.patched(write_queue, 'LEASE_SECONDS', 0):
+        first.add_words(USER, LANG_PAIR, ['chien'])
+        assert len(first._claim()) == 1
+    # Once the lease is over, another worker sends the write.
+    assert second.flush() == 1
+    assert fluency(db, 'chien') == '1-new'
+
+
+def check_failed_flush_settles():
+    db = fakes.FakeFirestore()
+    directory = tempfile.mkdtemp(prefix='languagebuddy-check-')
+    queue = make_queue(db, directory)
+    queue.add_words(USER, LANG_PAIR, ['chat'])
+
+    def missing_credentials():
+        raise EnvironmentError('Firebase credentials not set in Streamlit secrets.')
+
+    # Without a client nothing is claimed, so the write stays due rather than leased.
+    with fakes.patched(write_queue, 'get_db', missing_credentials):
+        try:
+            make_queue(None, directory).flush()
+        except EnvironmentError:
+            pass
+    assert [(attempts, error) for *_, attempts, error in rows(queue)] == [(0, None)], rows(queue)
+    assert queue.flush() == 1 and queue.is_flushed(USER)
+
+    # An error outside the per-user writes still settles every claimed write with it.
+    queue.set_fluency(USER, LANG_PAIR, {'chat': '2-recognized'})
+
+    def failing_span(*args, **kwargs):
+        raise RuntimeError('telemetry down')
+
+    def failing_flush():
+        try:
+            queue.flush()
+        except RuntimeError:
+            pass
+
+    # No backoff, so every flush retries at once.
+    with fakes.patched(write_queue, 'RETRY_BASE_DELAY', 0), fakes.patched(write_queue, 'span', failing_span):
+        failing_flush()
+        assert [(attempts, error) for *_, attempts, error in rows(queue)] == [(1, 'telemetry down')], rows(queue)
+        assert queue.status(USER).pending == 1
+
+        # Writes that keep failing end up reported as failed.
+        for _ in range(write_queue.MAX_FLUSH_ATTEMPTS):
+            failing_flush()
+    status = queue.status(USER)
+    assert status.pending == 0 and status.errors == {'chat': 'telemetry down'}, status
+    # Queuing the word again retries it.
+    queue.set_fluency(USER, LANG_PAIR, {'chat': '2-recognized'})
+    assert queue.drain() == 1 and fluency(db, 'chat') == '2-recognized'
+
+
+CHECKS = [check_coalescing, check_version_guard, check_lease_takeover, check_failed_flush_settles]
+
+
+def main():
+    for check in CHECKS:
+        check()
+        print(f"{check.__name__}: ok")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,515 @@
+"""
+In-process fakes for the services LanguageBuddy talks to, for offline benchmarks.
+
+Import this module before any app module: it points the on-disk caches at a
+throwaway directory so benchmarks never touch (or benefit from) the real ones.
+"""
+import os
+import tempfile
+
+os.environ.setdefault('LANGUAGEBUDDY_CACHE_DIR', tempfile.mkdtemp(prefix='languagebuddy-bench-'))
+
+import copy
+import heapq
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from google.api_core import exceptions
+from google.cloud.firestore_v1.transforms import Increment, Sentinel
+
+
+def _maybe_fail(rng, failure_rate, error):
+    if failure_rate and rng.random() < failure_rate:
+        raise error
+
+###################################
+# Firestore                        #
+###################################
+
+_MISSING = object()
+
+
+def _get_field(data, field_path):
+    for part in field_path.split('.'):
+        if not isinstance(data, dict) or part not in data:
+            return _MISSING
+        data = data[part]
+    return data
+
+
+def _resolve(value, current):
+    """Apply Firestore transforms (Increment, SERVER_TIMESTAMP) against the current value."""
+    if isinstance(value, Increment):
+        return (current if isinstance(current, (int, float)) else 0) + value.value
+    if isinstance(value, Sentinel):
+        return datetime.now(timezone.utc)
+    return value
+
+
+def _merge(target, updates):
+    for key, value in updates.items():
+        if isinstance(value, dict) and not isinstance(value, Sentinel):
+            node = target.setdefault(key, {})
+            _merge(node, value)
+        else:
+            target[key] = _resolve(value, target.get(key))
+
+
+def _set_field(target, field_path, value):
+    parts = field_path.split('.')
+    for part in parts[:-1]:
+        target = target.setdefault(part, {})
+    target[parts[-1]] = _resolve(value, target.get(parts[-1]))
+
+
+_OPERATORS = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+    'in': lambda a, b: a in b,
+}
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        value = _get_field(self._data or {}, field_path)
+        return None if value is _MISSING else value
+
+
+class FakeAggregationResult:
+    def __init__(self, alias, value):
+        self.alias = alias
+        self.value = value
+
+
+class FakeQuery:
+    def __init__(self, db, path, filters=(), orders=(), limit=None, cursor=None):
+        self._db = db
+        self._path = path
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._cursor = cursor
+
+    def _copy(self, **changes):
+        state = dict(filters=self._filters, orders=self._orders, limit=self._limit, cursor=self._cursor)
+        state.update(changes)
+        return FakeQuery(self._db, self._path, **state)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction='ASCENDING'):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(cursor=document_fields_or_snapshot)
+
+    def _sort_key(self, snapshot):
+        return tuple(_get_field(snapshot._data, field) for field, _ in self._orders) + (snapshot.id,)
+
+    def _matches(self, data, document_id):
+        for field_path, op_string, value in self._filters:
+            if field_path == '__name__':
+                # Document ID filters compare against a DocumentReference.
+                current, value = document_id, value.id
+            else:
+                current = _get_field(data, field_path)
+            if current is _MISSING:
+                return False
+            try:
+                if not _OPERATORS[op_string](current, value):
+                    return False
+            except TypeError:
+                return False
+        return True
+
+    def _run_by_name(self):
+        """Return one page of documents in ID order, without sorting or copying the whole collection."""
+        prefix = self._path + '/'
+        after = self._cursor.id if isinstance(self._cursor, FakeSnapshot) else None
+        with self._db._lock:
+            page = heapq.nsmallest(self._limit, (
+                (path[len(prefix):], path, data) for path, data in self._db.documents.items()
+                if path.startswith(prefix) and '/' not in path[len(prefix):]
+                and (after is None or path[len(prefix):] > after) and self._matches(data, path[len(prefix):])))
+        return [FakeSnapshot(FakeDocumentReference(self._db, path), copy.deepcopy(data)) for _, path, data in page]
+
+    def _run(self):
+        if self._limit is not None and self._orders in ((), (('__name__', 'ASCENDING'),)):
+            return self._run_by_name()
+        # Only the documents that survive the cursor and limit are copied, as a page query would transfer.
+        snapshots = self._db._children(self._path, self._matches, detached=False)
+        orders = self._orders or (('__name__', 'ASCENDING'),)
+        # Firestore leaves out documents without the fields a query is ordered by.
+        snapshots = [snapshot for snapshot in snapshots
+                     if all(field == '__name__' or _get_field(snapshot._data, field) is not _MISSING for field, _ in orders)]
+        for field_path, direction in reversed(orders):
+            key = (lambda s: s.id) if field_path == '__name__' else (lambda s, f=field_path: _get_field(s._data, f))
+            snapshots.sort(key=key, reverse=direction == 'DESCENDING')
+        if self._cursor is not None:
+            cursor_id = self._cursor.id if isinstance(self._cursor, FakeSnapshot) else None
+            ids = [snapshot.id for snapshot in snapshots]
+            snapshots = snapshots[ids.index(cursor_id) + 1:] if cursor_id in ids else []
+        if self._limit is not None:
+            snapshots = snapshots[:self._limit]
+        return [FakeSnapshot(snapshot.reference, copy.deepcopy(snapshot._data)) for snapshot in snapshots]
+
+    def stream(self):
+        self._db._call('queries')
+        snapshots = self._run()
+        self._db._count('reads', max(1, len(snapshots)))
+        self._db._sleep(self._db.per_document_latency * len(snapshots))
+        return iter(snapshots)
+
+    def get(self):
+        return list(self.stream())
+
+    def count(self, alias=None):
+        query = self
+
+        class _Aggregation:
+            def get(self_inner):
+                query._db._call('aggregations')
+                return [[FakeAggregationResult(alias, len(query._run()))]]
+
+        return _Aggregation()
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db, path):
+        super().__init__(db, path)
+        self.id = path.rsplit('/', 1)[-1]
+
+    def document(self, document_id=None):
+        return FakeDocumentReference(self._db, f'{self._path}/{document_id or uuid.uuid4().hex}')
+
+    def list_documents(self):
+        prefix = self._path + '/'
+        ids = {path[len(prefix):].split('/', 1)[0] for path in self._db.documents if path.startswith(prefix)}
+        return [self.document(document_id) for document_id in sorted(ids)]
+
+
+class FakeDocumentReference:
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit('/', 1)[-1]
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def __eq__(self, other):
+        return isinstance(other, FakeDocumentReference) and other.path == self.path
+
+    def collection(self, name):
+        return FakeCollection(self._db, f'{self.path}/{name}')
+
+    def get(self, field_paths=None):
+        self._db._call('gets')
+        self._db._count('reads')
+        return self._db._snapshot(self)
+
+    def set(self, data, merge=False):
+        self._db._call('writes')
+        self._db._apply([('set', self, data, merge)])
+
+    def update(self, data):
+        self._db._call('writes')
+        self._db._apply([('update', self, data, False)])
+
+    def delete(self):
+        self._db._call('writes')
+        self._db._apply([('delete', self, None, False)])
+
+
+class FakeWriteBatch:
+    def __init__(self, db):
+        self._db = db
+        self._writes = []
+
+    def set(self, reference, data, merge=False):
+        self._writes.append(('set', reference, data, merge))
+
+    def update(self, reference, data):
+        self._writes.append(('update', reference, data, False))
+
+    def delete(self, reference):
+        self._writes.append(('delete', reference, None, False))
+
+    def commit(self):
+        if len(self._writes) > 500:
+            raise ValueError('Firestore batches are limited to 500 writes')
+        self._db._call('commits')
+        self._db._apply(self._writes)
+        self._writes = []
+
+
+class FakeTransaction(FakeWriteBatch):
+    """Implements the parts of Transaction that `firestore.transactional` drives."""
+
+    _read_only = False
+    _max_attempts = 5
+
+    def __init__(self, db):
+        super().__init__(db)
+        self._id = None
+
+    @property
+    def in_progress(self):
+        return self._id is not None
+
+    def _clean_up(self):
+        self._writes = []
+        self._id = None
+
+    def _begin(self, retry_id=None):
+        self._id = uuid.uuid4().bytes
+
+    def _rollback(self):
+        self._clean_up()
+
+    def _commit(self):
+        self.commit()
+        self._clean_up()
+        return []
+
+    def get_all(self, references):
+        return self._db.get_all(references)
+
+
+class FakeFirestore:
+    """
+    An in-memory Firestore with the subset of the client API used by the app.
+
+    Every call that would be a network round trip sleeps for `latency` seconds
+    (plus `per_document_latency` per document streamed) and fails with a transient
+    `ServiceUnavailable` error with probability `failure_rate`. `stats` counts calls
+    and document reads so benchmarks can report Firestore cost.
+    """
+
+    def __init__(self, latency=0.0, per_document_latency=0.0, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.per_document_latency = per_document_latency
+        self.failure_rate = failure_rate
+        self.documents = {}
+        self.stats = Counter()
+        self._lock = threading.RLock()
+        self._rng = random.Random(seed)
+
+    def _sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def _call(self, kind):
+        self._count(kind)
+        self._sleep(self.latency)
+        with self._lock:
+            _maybe_fail(self._rng, self.failure_rate, exceptions.ServiceUnavailable(f'Injected {kind} failure'))
+
+    def _count(self, kind, amount=1):
+        with self._lock:
+            self.stats[kind] += amount
+
+    def _snapshot(self, reference):
+        with self._lock:
+            data = self.documents.get(reference.path)
+            return FakeSnapshot(reference, copy.deepcopy(data) if data is not None else None)
+
+    def _children(self, collection_path, predicate=None, detached=True):
+        # Writes replace documents instead of mutating them, so undetached snapshots stay consistent.
+        prefix = collection_path + '/'
+        with self._lock:
+            return [
+                FakeSnapshot(FakeDocumentReference(self, path), copy.deepcopy(data) if detached else data)
+                for path, data in self.documents.items()
+                if path.startswith(prefix) and '/' not in path[len(prefix):] and (predicate is None or predicate(data, path[len(prefix):]))
+            ]
+
+    def _apply(self, writes):
+        with self._lock:
+            staged = {}
+            for kind, reference, data, merge in writes:
+                current = staged.get(reference.path, self.documents.get(reference.path))
+                if kind == 'delete':
+                    staged[reference.path] = None
+                    continue
+                if kind == 'update' and current is None:
+                    raise KeyError(f'No document to update: {reference.path}')
+                document = copy.deepcopy(current) if (merge or kind == 'update') and current is not None else {}
+                if kind == 'update':
+                    for field_path, value in data.items():
+                        _set_field(document, field_path, value)
+                else:
+                    _merge(document, data)
+                staged[reference.path] = document
+            self._count('writes', len(writes))
+            for path, document in staged.items():
+                if document is None:
+                    self.documents.pop(path, None)
+                else:
+                    self.documents[path] = document
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def transaction(self, **kwargs):
+        return FakeTransaction(self)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        references = list(references)
+        self._call('get_alls')
+        self._count('reads', len(references))
+        return [self._snapshot(reference) for reference in references]
+
+
+###################################
+# Reverso, gTTS and YouTube       #
+###################################
+
+
+def make_reverso_client(latency=0.0, failure_rate=0.0, seed=0):
+    """
+    Return a drop-in replacement for `reverso_context_api.Client` that answers locally.
+
+    :param latency: Seconds each `get_translations` call takes.
+    :param failure_rate: Probability that a call raises `ConnectionError`.
+    :param seed: Seed for the injected failures.
+    """
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    class FakeReversoClient:
+        calls = 0
+
+        def __init__(self, source_lang, target_lang):
+            self.source_lang = source_lang
+            self.target_lang = target_lang
+
+        def get_translations(self, text, source_text=None, target_text=None):
+            with lock:
+                FakeReversoClient.calls += 1
+                _maybe_fail(rng, failure_rate, ConnectionError(f'Injected Reverso failure for {text!r}'))
+            if latency:
+                time.sleep(latency)
+            return iter([f'{text}-{self.target_lang}', f'{text}-{self.target_lang}-2', f'{text}-{self.target_lang}-3'])
+
+    return FakeReversoClient
+
+
+def make_synthesizer(latency=0.0, clip_bytes=4096, failure_rate=0.0, seed=0):
+    """
+    Return a drop-in replacement for `tts_cache.synthesize`.
+
+    :param latency: Seconds each synthesis takes.
+    :param clip_bytes: Size of the returned fake MP3 clip.
+    :param failure_rate: Probability that a synthesis raises `ConnectionError`.
+    :param seed: Seed for the injected failures.
+    """
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def synthesize(text, language):
+        with lock:
+            _maybe_fail(rng, failure_rate, ConnectionError(f'Injected gTTS failure for {text!r}'))
+        if latency:
+            time.sleep(latency)
+        return (f'{language}:{text}'.encode('utf-8') * clip_bytes)[:clip_bytes]
+
+    return synthesize
+
+
+def make_transcript(n_tokens, vocabulary_size=2000, words_per_line=8, seed=0):
+    """
+    Generate a synthetic transcript whose word frequencies follow Zipf's law, like speech.
+
+    :param n_tokens: Number of words in the transcript.
+    :param vocabulary_size: Number of distinct words to draw from.
+    :param words_per_line: Number of words per transcript line.
+    :param seed: Seed for the word draws.
+    :return: A list of dictionaries with 'text', 'start', and 'duration' keys.
+    """
+    rng = random.Random(seed)
+    punctuation = ['', '', '', '', ',', '.', '!', '?']
+    words = [f"mot{rank}" if rank % 7 else f"l'mot{rank}" for rank in range(vocabulary_size)]
+    weights = [1.0 / (rank + 1) for rank in range(vocabulary_size)]
+    transcript = []
+    for start in range(0, n_tokens, words_per_line):
+        count = min(words_per_line, n_tokens - start)
+        line = [word + rng.choice(punctuation) for word in rng.choices(words, weights, k=count)]
+        line[0] = line[0].capitalize()
+        transcript.append({"text": " ".join(line), "start": start / 3.0, "duration": 2.5})
+    return transcript
+
+
+def make_transcript_api(latency=0.0, n_tokens=1000, missing_languages=(), failure_rate=0.0, seed=0):
+    """
+    Return a drop-in replacement for `YouTubeTranscriptApi` serving synthetic transcripts.
+
+    Each video ID always gets the same transcript.
+
+    :param latency: Seconds each `get_transcript` call takes.
+    :param n_tokens: Number of words in every transcript.
+    :param missing_languages: Language codes for which no transcript exists.
+    :param failure_rate: Probability that a call raises `TooManyRequests` (a transient error).
+    :param seed: Seed for the injected failures.
+    """
+    from youtube_transcript_api import NoTranscriptFound, TooManyRequests
+
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    class FakeTranscriptApi:
+        calls = 0
+
+        @staticmethod
+        def get_transcript(video_id, languages=('en',)):
+            with lock:
+                FakeTranscriptApi.calls += 1
+                _maybe_fail(rng, failure_rate, TooManyRequests(video_id))
+            if latency:
+                time.sleep(latency)
+            if languages[0] in missing_languages:
+                raise NoTranscriptFound(video_id, list(languages), [])
+            return make_transcript(n_tokens, seed=hash(video_id) & 0xFFFF)
+
+    return FakeTranscriptApi
+
+
+@contextmanager
+def patched(module, name, value):
+    """Temporarily replace `module.name` with `value`."""
+    original = getattr(module, name)
+    setattr(module, name, value)
+    try:
+        yield value
+    finally:
+        setattr(module, name, original)
@@ -0,0 +1,119 @@
+"""
+Compile open bilingual word lists into the memory-mapped dictionaries of `local_dictionary`.
+
+Accepts the MUSE ground-truth dictionaries (https://github.com/facebookresearch/MUSE,
+one "word translation" pair per line, e.g. `fr-en.txt`) and tab-separated lists
+("word<TAB>translation; translation", e.g. exported from Wiktionary or FreeDict).
+Lists in the opposite direction can be used with --reverse.
+
+    python build_dictionary.py fr en fr-en.txt                  # French words, English translations
+    python build_dictionary.py en fr fr-en.txt --reverse        # the same list, the other way
+    python build_dictionary.py --all muse/                      # every pair found in a directory
+
+Compiled files are written to LANGUAGEBUDDY_DICTIONARY_DIR (default `dictionaries/`).
+Running workers pick up a rebuilt dictionary when they restart.
+"""
+import argparse
+import itertools
+import os
+from collections import defaultdict
+
+from local_dictionary import DICTIONARY_DIR, LANGUAGES, build, dictionary_path
+
+# Translations kept per word, in the order the word list gives them.
+MAX_TRANSLATIONS = 5
+
+
+def read_word_list(path, fmt='muse', reverse=False):
+    """
+    Read a bilingual word list.
+
+    :param path: Path of the word list file.
+    :param fmt: 'muse' for whitespace-separated pairs, 'tsv' for tab-separated lists with ';'-separated translations.
+    :param reverse: Swap the columns, for a list in the opposite direction.
+    :return: A dictionary mapping words to lists of translations.
+    """
+    entries = defaultdict(list)
+    with open(path, encoding='utf-8') as word_list:
+        for line in word_list:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if fmt == 'tsv':
+                word, _, translations = line.partition('\t')
+                pairs = [(word, translation) for translation in translations.split(';')]
+            else:
+                parts = line.split()
+                if len(parts) != 2:
+                    continue
+                pairs = [tuple(parts)]
+            for word, translation in pairs:
+                if reverse:
+                    word, translation = translation, word
+                word, translation = word.strip(), translation.strip()
+                if word and translation and translation not in entries[word]:
+                    entries[word].append(translation)
+    return entries
+
+
+def compile_pair(source, target, paths, fmt='muse', reverse=False, directory=DICTIONARY_DIR):
+    """
+    Compile one or more word lists into the dictionary for a language pair.
+
+    :return: The number of words in the compiled dictionary.
+    """
+    entries = defaultdict(list)
+    for path in paths:
+        for word, translations in read_word_list(path, fmt, reverse).items():
+            for translation in translations:
+                if translation not in entries[word]:
+                    entries[word].append(translation)
+    entries = {word: translations[:MAX_TRANSLATIONS] for word, translations in entries.items()}
+    return build(entries, dictionary_path(source, target, directory))
+
+
+def compile_directory(source_directory, fmt='muse', directory=DICTIONARY_DIR):
+    """
+    Compile every supported pair that has a `{source}-{target}.txt` list in `source_directory`,
+    or a `{target}-{source}.txt` list to reverse.
+
+    :return: A dictionary mapping each compiled pair to its number of words.
+    """
+    compiled = {}
+    for source, target in itertools.permutations(LANGUAGES, 2):
+        forward = os.path.join(source_directory, f'{source}-{target}.txt')
+        backward = os.path.join(source_directory, f'{target}-{source}.txt')
+        if os.path.exists(forward):
+            compiled[f'{source}-{target}'] = compile_pair(source, target, [forward], fmt, directory=directory)
+        elif os.path.exists(backward):
+            compiled[f'{source}-{target}'] = compile_pair(source, target, [backward], fmt, reverse=True, directory=directory)
+    return compiled
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', nargs='?', choices=LANGUAGES, help='Language of the words')
+    parser.add_argument('target', nargs='?', choices=LANGUAGES, help='Language of the translations')
+    parser.add_argument('paths', nargs='*', help='Word list files')
+    parser.add_argument('--all', metavar='DIR', help='Compile every pair with a word list in DIR')
+    parser.add_argument('--format', choices=['muse', 'tsv'], default='muse', help='Word list format (default: muse)')
+    parser.add_argument('--reverse', action='store_true', help='The lists translate from target to source')
+    parser.add_argument('--output', default=DICTIONARY_DIR, help='Directory for the compiled dictionaries')
+    args = parser.parse_args()
+
+    if args.all:
+        compiled = compile_directory(args.all, args.format, args.output)
+        if not compiled:
+            parser.error(f'No word lists named like fr-en.txt in {args.all}')
+    elif args.source and args.target and args.paths:
+        compiled = {f'{args.source}-{args.target}': compile_pair(args.source, args.target, args.paths,
+                                                                 args.format, args.reverse, args.output)}
+    else:
+        parser.error('Give a source language, a target language and word lists, or --all DIR')
+
+    for pair, words in compiled.items():
+        print(f"{pair}: {words} words -> {dictionary_path(*pair.split('-'), args.output)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from tokenizer import count_words
+from vocabulary import FLUENCY_LEVELS
+
+########################################
+#     Video comprehension score        #
+########################################
+
+NOT_IN_VOCABULARY = 'not in vocabulary'
+LEVELS = FLUENCY_LEVELS + [NOT_IN_VOCABULARY]
+# Words at this fluency level or above count as understood.
+KNOWN_LEVEL = '3-familiar'
+# Number of most frequent unknown words reported.
+TOP_UNKNOWN = 20
+
+Comprehension = namedtuple('Comprehension', ['tokens', 'words', 'known_tokens', 'known_words', 'levels', 'unknown'])
+
+
+def word_frequencies(transcript):
+    """
+    Return how often each normalized word occurs in a transcript, most frequent first.
+
+    :param transcript: A list of dictionaries with a 'text' key.
+    :return: A Series of token counts indexed by word.
+    """
+    return pd.Series(count_words(transcript), dtype='int64').sort_values(ascending=False, kind='stable')
+
+
+def _level_codes(frequencies, vocabulary):
+    """Return the index in `LEVELS` of each word's fluency level, in the order of `frequencies`."""
+    levels = vocabulary.reindex(frequencies.index)
+    if isinstance(levels.dtype, pd.CategoricalDtype) and list(levels.dtype.categories) == FLUENCY_LEVELS:
+        codes = levels.cat.codes.to_numpy()
+    else:
+        codes = pd.Categorical(levels, categories=FLUENCY_LEVELS).codes
+    # Words missing from the vocabulary have code -1 and go to the last level.
+    return np.where(codes < 0, len(FLUENCY_LEVELS), codes)
+
+
+def score(frequencies, vocabulary, known_level=KNOWN_LEVEL, top=TOP_UNKNOWN):
+    """
+    Measure how much of a video a user already knows, with one join of its word counts against their vocabulary.
+
+    :param frequencies: A Series of token counts indexed by word, from `word_frequencies`.
+    :param vocabulary: A Series of fluency levels indexed by word, e.g. `VocabularyCache.to_series()`.
+                       Converting it with `level_series` first makes repeated calls faster.
+    :param known_level: The lowest fluency level that counts as known.
+    :param top: Number of most frequent unknown words to return.
+    :return: A `Comprehension` with the number of tokens and unique words, the shares of both
+             that are known, a DataFrame with the 'Tokens', 'Token share', 'Words' and 'Word share'
+             at each of `LEVELS`, and a Series of the `top` most frequent unknown words and their counts.
+    """
+    codes = _level_codes(frequencies, vocabulary)
+    counts = frequencies.to_numpy()
+    tokens_by_level = np.bincount(codes, weights=counts, minlength=len(LEVELS)).astype('int64')
+    words_by_level = np.bincount(codes, minlength=len(LEVELS))
+    tokens, words = int(tokens_by_level.sum()), len(frequencies)
+    table = pd.DataFrame({
+        'Tokens': tokens_by_level,
+        'Token share': tokens_by_level / max(tokens, 1),
+        'Words': words_by_level,
+        'Word share': words_by_level / max(words, 1),
+    }, index=LEVELS)
+
+    known = (codes >= FLUENCY_LEVELS.index(known_level)) & (codes < len(FLUENCY_LEVELS))
+    return Comprehension(
+        tokens=tokens,
+        words=words,
+        known_tokens=float(counts[known].sum() / tokens) if tokens else 0.0,
+        known_words=float(known.sum() / words) if words else 0.0,
+        levels=table,
+        # frequencies is sorted, so the first unknown words are the most frequent ones.
+        unknown=frequencies[~known].head(top),
+    )
+
+
+def level_series(vocabulary):
+    """
+    Convert a Series of fluency levels to a categorical one, which `score` joins against faster.
+    """
+    return vocabulary.astype(pd.CategoricalDtype(FLUENCY_LEVELS))
+
+
+def rank_videos(frequencies_by_video, vocabulary, known_level=KNOWN_LEVEL):
+    """
+    Rank candidate videos from the most to the least comprehensible for a user.
+
+    :param frequencies_by_video: A dictionary mapping video IDs to Series from `word_frequencies`.
+    :param vocabulary: A Series of fluency levels indexed by word.
+    :param known_level: The lowest fluency level that counts as known.
+    :return: A DataFrame indexed by video ID with 'Tokens', 'Words', 'Known tokens' and 'Known words' columns.
+    """
+    vocabulary = level_series(vocabulary)
+    rows = {}
+    for video_id, frequencies in frequencies_by_video.items():
+        result = score(frequencies, vocabulary, known_level, top=0)
+        rows[video_id] = {'Tokens': result.tokens, 'Words': result.words,
+                          'Known tokens': result.known_tokens, 'Known words': result.known_words}
+    ranking = pd.DataFrame.from_dict(rows, orient='index', columns=['Tokens', 'Words', 'Known tokens', 'Known words'])
+    return ranking.sort_values(['Known tokens', 'Known words'], ascending=False)
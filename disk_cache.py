@@ -0,0 +1,152 @@
+import os
+import sqlite3
+import threading
+import time
+
+########################################
+#     Shared on-disk key-value cache   #
+########################################
+
+CACHE_DIR = os.getenv('LANGUAGEBUDDY_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+
+# Eviction runs after this many entries were written, or this many seconds after the last one.
+EVICT_EVERY = 100
+EVICT_INTERVAL = 60
+# SQLite limits the number of bound parameters per statement.
+MAX_PARAMS = 500
+
+
+class DiskCache:
+    """
+    A small key-value store backed by SQLite, shared by every session and worker process.
+
+    Entries older than `ttl` seconds are ignored and removed. When the store grows
+    past `max_entries` rows or `max_bytes` of values, the least recently used
+    entries are evicted first.
+
+    :param name: File name (without extension) of the database inside `directory`.
+    :param ttl: Seconds an entry stays valid, or None to keep entries until evicted.
+    :param max_entries: Maximum number of entries, or None for no limit.
+    :param max_bytes: Maximum total size of the stored values, or None for no limit.
+    :param directory: Directory holding the database file.
+    """
+
+    def __init__(self, name, ttl=None, max_entries=None, max_bytes=None, directory=CACHE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f'{name}.sqlite3')
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        self._evicted = time.monotonic()
+        self._evict_lock = threading.Lock()
+        with self._connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, '
+                'created REAL NOT NULL, accessed REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_created ON entries (created)')
+
+    def _connection(self):
+        # sqlite3 connections can't be shared between threads, so each thread opens its own.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _is_fresh(self, created, now):
+        return self.ttl is None or now - created < self.ttl
+
+    def get(self, key):
+        """
+        Return the value stored under `key`, or None if it is missing or expired.
+        """
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """
+        Return a dictionary of the fresh entries found for `keys`.
+        """
+        keys = list(dict.fromkeys(keys))
+        now = time.time()
+        found = {}
+        conn = self._connection()
+        for start in range(0, len(keys), MAX_PARAMS):
+            chunk = keys[start:start + MAX_PARAMS]
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(
+                f'SELECT key, value, created FROM entries WHERE key IN ({placeholders})', chunk
+            ).fetchall()
+            found.update((key, value) for key, value, created in rows if self._is_fresh(created, now))
+        if found:
+            with conn:
+                conn.executemany('UPDATE entries SET accessed = ? WHERE key = ?', [(now, key) for key in found])
+        return found
+
+    def set(self, key, value):
+        """
+        Store `value` (bytes or str) under `key`.
+        """
+        self.set_many([(key, value)])
+
+    def set_many(self, items):
+        """
+        Store every (key, value) pair of a dictionary or iterable of pairs.
+        """
+        items = list(items.items() if isinstance(items, dict) else items)
+        if items:
+            self._write(items)
+            self._maybe_evict(len(items))
+
+    def _write(self, items):
+        now = time.time()
+        rows = [(key, value, len(value), now, now) for key, value in items]
+        with self._connection() as conn:
+            conn.executemany('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)', rows)
+
+    def _maybe_evict(self, written):
+        # Eviction scans the whole store, so it runs on a budget rather than after every write.
+        with self._evict_lock:
+            self._writes += written
+            due = self._writes >= EVICT_EVERY or time.monotonic() - self._evicted >= EVICT_INTERVAL
+            if due:
+                self._writes = 0
+                self._evicted = time.monotonic()
+        if due:
+            self.evict()
+
+    def delete(self, key):
+        with self._connection() as conn:
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def evict(self):
+        """
+        Remove expired entries, then the least recently used ones until the store fits its limits.
+        """
+        with self._connection() as conn:
+            if self.ttl is not None:
+                conn.execute('DELETE FROM entries WHERE created < ?', (time.time() - self.ttl,))
+            # Counting is much cheaper than the ordered scans, which only run when a limit is exceeded.
+            if self.max_entries is not None and conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0] > self.max_entries:
+                conn.execute(
+                    'DELETE FROM entries WHERE key IN ('
+                    'SELECT key FROM entries ORDER BY accessed DESC, rowid DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,),
+                )
+            if self.max_bytes is not None and conn.execute('SELECT TOTAL(size) FROM entries').fetchone()[0] > self.max_bytes:
+                conn.execute(
+                    'DELETE FROM entries WHERE key IN ('
+                    'SELECT key FROM (SELECT key, SUM(size) OVER ('
+                    'ORDER BY accessed DESC, rowid DESC ROWS UNBOUNDED PRECEDING) AS total FROM entries) '
+                    'WHERE total > ?)',
+                    (self.max_bytes,),
+                )
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
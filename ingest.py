@@ -0,0 +1,261 @@
+"""
+Pre-ingest YouTube videos without the web app, so their lessons are warm before students open them.
+
+For every video this fetches the transcript into the shared transcript cache, tokenizes
+it, and looks up every word so the translation cache is filled. With --user, the
+words are also added to that user's vocabulary in Firestore (using the Firebase
+credentials from `.streamlit/secrets.toml`, like the app). Videos are processed
+concurrently, one transcript window at a time.
+
+Finished videos are recorded in a journal file, so an interrupted run picks up where
+it stopped; videos whose translations timed out or failed are retried. The summary
+line doubles as a throughput benchmark.
+
+    python ingest.py dQw4w9WgXcQ https://youtu.be/9bZkp7q19f0 --target fr
+    python ingest.py --file videos.txt --target es --native en --workers 8
+    python ingest.py --playlist 'https://www.youtube.com/playlist?list=PL...' --target de --user alice
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from disk_cache import CACHE_DIR
+from lesson_pipeline import iter_windows
+from local_dictionary import LANGUAGES
+from resources import get_http_session
+from telemetry import in_context, span
+from tokenizer import tokenize_transcript
+from transcripts import TranscriptUnavailable, extract_video_id, get_store as get_transcript_store
+from translation import get_engine
+from vocabulary import upsert_new_words
+
+MAX_WORKERS = int(os.getenv('INGEST_MAX_WORKERS', 4))
+# Statuses of videos that are not retried when a run resumes.
+FINISHED = ('done', 'missing')
+
+IngestResult = namedtuple('IngestResult', ['video_id', 'status', 'tokens', 'words', 'translated', 'new_words', 'seconds', 'error'])
+
+_VIDEO_ID = re.compile(r'^[\w-]{11}$')
+_PLAYLIST_VIDEO_ID = re.compile(r'"videoId":"([\w-]{11})"')
+
+
+class Journal:
+    """
+    An append-only JSON-lines record of the videos a run has processed.
+
+    :param path: The journal file; it is created on the first record.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.finished = set()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as journal:
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A run killed mid-write leaves a truncated last line.
+                        continue
+                    if entry.get('status') in FINISHED:
+                        self.finished.add(entry['video_id'])
+                    else:
+                        self.finished.discard(entry['video_id'])
+
+    def record(self, result):
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as journal:
+                journal.write(json.dumps(result._asdict()) + '\n')
+            if result.status in FINISHED:
+                self.finished.add(result.video_id)
+
+
+def playlist_video_ids(playlist_url):
+    """
+    Return the IDs of the videos listed on a public playlist page, in order.
+
+    YouTube renders the first 100 videos of a playlist into the page, so longer
+    playlists should be exported to a file and passed with --file instead.
+
+    :param playlist_url: A `youtube.com/playlist?list=...` URL.
+    :return: A list of video IDs.
+    """
+    response = get_http_session().get(playlist_url, headers={'Accept-Language': 'en'})
+    response.raise_for_status()
+    return list(dict.fromkeys(_PLAYLIST_VIDEO_ID.findall(response.text)))
+
+
+def parse_video(value):
+    """
+    Return the video ID of a video ID or URL, or None if it is neither.
+    """
+    value = value.strip()
+    if _VIDEO_ID.match(value):
+        return value
+    return extract_video_id(value) if value else None
+
+
+def lookup_timeout(engine, words, workers=1):
+    """
+    Return how long to wait for one window's lookups.
+
+    The engine's timeout is sized for one page; a bulk run also waits for every lookup
+    to get through the rate limiter, which the other videos in flight share.
+
+    :param engine: The `translation.TranslationEngine` doing the lookups.
+    :param words: Number of words looked up.
+    :param workers: Number of videos processed at the same time.
+    :return: A timeout in seconds.
+    """
+    return engine.timeout + words * workers * engine.rate_limiter.interval
+
+
+def ingest_video(video_id, target_language, native_language, db=None, user_id=None, workers=1):
+    """
+    Fetch, tokenize and translate one video, and optionally save its words for a user.
+
+    :param video_id: The canonical YouTube video ID.
+    :param target_language: The language code of the transcript.
+    :param native_language: The language code translations are returned in.
+    :param db: A Firestore client instance, or None to only warm the caches.
+    :param user_id: The user whose vocabulary gets the video's words.
+    :param workers: Number of videos processed at the same time, sharing the translation rate limit.
+    :return: An `IngestResult`.
+    """
+    start = time.perf_counter()
+    tokens = translated = new_words = 0
+    seen = set()
+    try:
+        with span('ingest.fetch_transcript'):
+            transcript = get_transcript_store().get(video_id, target_language)
+        engine = get_engine(native_language, target_language)
+        lang_pair = f"{native_language}-{target_language}"
+        for window in iter_windows(transcript):
+            window_tokens = list(tokenize_transcript(window.lines))
+            tokens += len(window_tokens)
+            words = list(dict.fromkeys(token.normalized for token in window_tokens if token.normalized not in seen))
+            if not words:
+                continue
+            seen.update(words)
+            with span('ingest.translate', words=len(words)):
+                translated += len(engine.translate_many(words, lookup_timeout(engine, len(words), workers)))
+            if db is not None:
+                with span('ingest.upsert', words=len(words)):
+                    new_words += upsert_new_words(words, user_id, db, lang_pair).new
+    except TranscriptUnavailable as e:
+        return IngestResult(video_id, 'missing', 0, 0, 0, 0, time.perf_counter() - start, str(e))
+    except Exception as e:
+        return IngestResult(video_id, 'failed', tokens, len(seen), translated, new_words, time.perf_counter() - start,
+                            f'{type(e).__name__}: {e}')
+    status = 'done' if translated == len(seen) else 'partial'
+    return IngestResult(video_id, status, tokens, len(seen), translated, new_words, time.perf_counter() - start, None)
+
+
+def journal_name(target_language, native_language, user_id=None):
+    """
+    Return the default journal file name for a run.
+
+    Runs for different users keep separate journals: a video finished for one user
+    still has to add its words to the next user's vocabulary.
+    """
+    if user_id is None:
+        return f'ingest-{target_language}-{native_language}.jsonl'
+    safe_user = re.sub(r'[^\w.-]', '_', user_id)
+    return f'ingest-{target_language}-{native_language}-{safe_user}.jsonl'
+
+
+def ingest(video_ids, target_language, native_language, journal, workers=MAX_WORKERS, db=None, user_id=None, report=print):
+    """
+    Ingest many videos concurrently, skipping those the journal has already finished.
+
+    :param video_ids: An iterable of video IDs.
+    :param journal: The `Journal` recording progress.
+    :param workers: Number of videos processed at the same time.
+    :param report: Called with each `IngestResult` as it finishes.
+    :return: The list of `IngestResult`s of this run.
+    """
+    pending = [video_id for video_id in dict.fromkeys(video_ids) if video_id not in journal.finished]
+    results = []
+    if not pending:
+        return results
+    workers = min(workers, len(pending))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        run = in_context(ingest_video)
+        futures = [executor.submit(run, video_id, target_language, native_language, db, user_id, workers) for video_id in pending]
+        for future in as_completed(futures):
+            result = future.result()
+            journal.record(result)
+            results.append(result)
+            report(result)
+    return results
+
+
+def summarize(results, seconds):
+    """
+    Return a one-line summary of a run, with its throughput.
+    """
+    statuses = {status: sum(result.status == status for result in results) for status in ('done', 'partial', 'missing', 'failed')}
+    tokens = sum(result.tokens for result in results)
+    words = sum(result.words for result in results)
+    seconds = max(seconds, 1e-9)
+    return (f"{len(results)} videos in {seconds:.1f}s ({', '.join(f'{count} {status}' for status, count in statuses.items())}); "
+            f"{len(results) / seconds:.2f} videos/s, {tokens / seconds:,.0f} tokens/s, {words / seconds:,.0f} words/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('videos', nargs='*', help='Video IDs or URLs')
+    parser.add_argument('--file', help='File with one video ID or URL per line')
+    parser.add_argument('--playlist', help='URL of a public YouTube playlist')
+    parser.add_argument('--target', choices=LANGUAGES, required=True, help='Language of the transcripts')
+    parser.add_argument('--native', choices=LANGUAGES, default='en', help='Language of the translations (default: en)')
+    parser.add_argument('--user', help='Also add the words to this user\'s vocabulary')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help=f'Videos processed at once (default: {MAX_WORKERS})')
+    parser.add_argument('--journal', help='Progress file (default: one per language pair and user in the cache directory)')
+    parser.add_argument('--restart', action='store_true', help='Ignore the progress recorded by earlier runs')
+    args = parser.parse_args()
+
+    inputs = list(args.videos)
+    if args.file:
+        with open(args.file, encoding='utf-8') as video_list:
+            inputs.extend(line for line in video_list if line.strip() and not line.startswith('#'))
+    if args.playlist:
+        inputs.extend(playlist_video_ids(args.playlist))
+    video_ids = [parse_video(value) for value in inputs]
+    invalid = [value.strip() for value, video_id in zip(inputs, video_ids) if video_id is None]
+    if invalid:
+        parser.error(f"Not video IDs or URLs: {', '.join(invalid)}")
+    if not video_ids:
+        parser.error('Give video IDs or URLs, --file or --playlist')
+
+    journal_path = args.journal or os.path.join(CACHE_DIR, journal_name(args.target, args.native, args.user))
+    if args.restart and os.path.exists(journal_path):
+        os.remove(journal_path)
+    journal = Journal(journal_path)
+
+    db = None
+    if args.user:
+        from resources import get_db
+        db = get_db()
+
+    def report(result):
+        detail = result.error or f'{result.tokens} tokens, {result.translated}/{result.words} words translated, {result.new_words} new'
+        print(f"{result.video_id} {result.status:<8} {result.seconds:6.1f}s  {detail}", flush=True)
+
+    skipped = len(set(video_ids) & journal.finished)
+    if skipped:
+        print(f"Skipping {skipped} videos finished by an earlier run ({journal_path})")
+    start = time.perf_counter()
+    results = ingest(video_ids, args.target, args.native, journal, args.workers, db, args.user, report)
+    print(summarize(results, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
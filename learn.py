@@ -1,18 +1,25 @@
 import streamlit as st
-from firebase_admin import firestore
 
 ########################################
 #     Importing libraries              #
 ########################################
 
 from streamlit_player import st_player
-from youtube_transcript_api import YouTubeTranscriptApi
+from transcripts import TranscriptUnavailable, extract_video_id, get_store as get_transcript_store
 import streamlit as st
-import requests
-from reverso_context_api import Client
-from collections import namedtuple
-import re
+from resources import get_db, get_http_session
+from translation import get_engine
+import time
+from itertools import groupby
+from operator import attrgetter
 import streamlit as st
+from telemetry import span
+from lesson_html import LESSON_CSS, glossary_ids, glossary_rule, render_lesson, render_line
+from lesson_pipeline import WINDOW_SECONDS, window_at, window_indexes
+from comprehension import KNOWN_LEVEL, score, word_frequencies
+from tokenizer import count_words, normalize, tokenize_transcript
+from vocabulary_cache import get_cache
+from write_queue import get_write_queue
 
 ###################################
 # Functions                 #
@@ -24,32 +31,23 @@ def get_transcription(youtube_url: str):
     """
     Extracts the transcription of a YouTube video in the specified target language.
 
-    This function retrieves the video ID from the URL, fetches the transcript, 
-    and does not check for existing transcripts in session state as previously 
-    described in comments. 
+    This function retrieves the canonical video ID from the URL and fetches the 
+    transcript through the shared on-disk transcript store, so the same video is 
+    only downloaded once per language no matter which URL form or user imports it.
 
     :param youtube_url: A string representing the URL of the YouTube video.
-    :param target_language: The language code for which to fetch the transcript, defaults to 'fr' for French.
+    :raises TranscriptUnavailable: If the video has no transcript in the target language.
     :return: A list of dictionaries, each containing 'text', 'start', and 'duration' keys for the video's transcript.
     """
     #defining target_language here
-    target_language = target_language = st.session_state.get("target_language")
+    target_language = st.session_state.get("target_language")
 
-    youtube_id = youtube_url[youtube_url.find("watch?v=")+len("watch?v="):]
-    transcript = YouTubeTranscriptApi.get_transcript(youtube_id,languages=[target_language])
-    return transcript
-
-def remove_punctuation(input_string):
-    """
-    Remove punctuation from the input string, converting it to lowercase.
-
-    :param input_string: A string from which to remove punctuation.
-    :return: A string with punctuation removed and converted to lowercase.
-    """
-    return re.sub(r'\W+', '', input_string).lower()
+    youtube_id = extract_video_id(youtube_url)
+    if youtube_id is None:
+        raise TranscriptUnavailable(f"Could not find a video ID in '{youtube_url}'.")
+    return get_transcript_store().get(youtube_id, target_language)
 
 #Function to get translations from reverso context (think about replacing/modifying this as it doesnt provide for prronouns and other words)
-@st.cache_data
 def get_translation(text, native_language=st.session_state.get("native_language","en"), target_language=st.session_state.get("target_language")):
     """
     Retrieve translations for a given text using the Reverso Context API.
@@ -62,18 +60,17 @@ def get_translation(text, native_language=st.session_state.get("native_language"
     :param target_language: The target language code for translation (default is 'fr' for French).
     :return: A list of translation strings for the input text.
     """
-    client = Client(target_language, native_language)
-    return list(client.get_translations(text))
+    return get_engine(native_language, target_language).translate(text)
 
 
-@st.cache_data 
 def import_lesson(youtube_url: str):
     """
     Extracts the transcription from a YouTube video URL and returns it.
 
     This function fetches the transcript for educational purposes but does not 
-    update any vocabulary base as previously noted. The caching decorator is used 
-    to potentially improve performance by storing results of expensive operations.
+    update any vocabulary base as previously noted. Transcripts are cached on disk 
+    by video ID and language (see `transcripts.TranscriptStore`) rather than by the 
+    raw URL, so different URL forms and target languages are cached correctly.
 
     :param youtube_url: A string representing the URL of the YouTube video.
     :return: The transcript of the video as returned by `get_transcription`.
@@ -91,7 +88,8 @@ def try_site(url):
     :param url: A string representing the URL to check, typically for a YouTube video.
     :return: Boolean, True if the URL returns a 200 status code, False otherwise.
     """
-    request = requests.get(url, allow_redirects=False)
+    with span('http.get', url='youtube'):
+        request = get_http_session().get(url, allow_redirects=False)
     return request.status_code == 200
 
 def send_unique_words_to_firestore(unique_words, user_id, db, lang_pair):
@@ -99,28 +97,21 @@ def send_unique_words_to_firestore(unique_words, user_id, db, lang_pair):
     Send unique words to Firestore, adding new words with a fluency of '1-new' 
     but leaving existing words' fluency unchanged.
 
+    The words are queued on disk and written by the worker's background flusher
+    (see `write_queue.WriteQueue`), so the page doesn't wait on Firestore;
+    `show_write_status` tells the user once they are saved.
+
     :param unique_words: An iterable of unique words to add to Firestore.
     :param user_id: The ID of the user whose vocabulary is being updated.
-    :param db: A Firestore client instance.
+    :param db: A Firestore client instance; the flusher uses the worker's shared client.
     :param lang_pair: String representing the language pair, e.g., "en-fr".
-    :return: None. Updates Firestore in-place.
+    :return: The number of words queued, or None if they could not be queued.
     """
-    words_collection = db.collection('users').document(user_id).collection('vocabulary').document(lang_pair).collection('words')
-    batch = db.batch()
-    
     try:
-        for word in unique_words:
-            if isinstance(word, str) and word.strip():
-                doc_ref = words_collection.document(word)
-                existing_doc = doc_ref.get()
-                if not existing_doc.exists:  # Check if the word does not exist
-                    # Add new word with fluency set to '1-new'
-                    batch.set(doc_ref, {"fluency": "1-new"})
-                # If the document exists, we do nothing, preserving its current fluency.
-
-        batch.commit()
+        return get_write_queue().add_words(user_id, lang_pair, unique_words)
     except Exception as e:
         st.text(f"An error occurred while updating Firestore: {str(e)}")
+        return None
 
 
 def update_word_fluency(user_id, word, new_fluency, db):
@@ -146,24 +137,22 @@ def update_word_fluency(user_id, word, new_fluency, db):
     })
 
 
-@st.cache_data
 # def batch_get_translations(words, native_language="en", target_language="fr"):
 #replacing above with new functionality to select languages from drop down
 def batch_get_translations(words, native_language=st.session_state.get("native_language"), target_language=st.session_state.get("target_language")):
     """
     Batch translate a set of words from one language to another using Reverso Context API.
 
-    This function creates translations for each word in the input list, 
-    caching the results to potentially speed up subsequent calls with the 
-    same input.
+    Lookups run concurrently through the shared, rate-limited translation engine.
+    Results are cached per word on disk, so other videos sharing the same words 
+    reuse them across sessions and restarts. Words that time out are left out of the result.
 
     :param words: An iterable of words to translate.
     :param native_language: The source language code (default is 'en' for English).
     :param target_language: The target language code for translation (default is 'fr' for French).
     :return: A dictionary where keys are the words from the input and values are lists of translations.
     """
-    client = Client(target_language, native_language)
-    return {word: list(client.get_translations(word)) for word in words}
+    return get_engine(native_language, target_language).translate_many(words)
 
 
 def remove_punctuation(input_string):
@@ -173,49 +162,134 @@ def remove_punctuation(input_string):
     :param input_string: A string from which to remove punctuation.
     :return: A string with most punctuation removed but apostrophes kept, converted to lowercase.
     """
-    return re.sub(r'[^\w\s\']+', '', input_string).lower()
+    return normalize(input_string)
 
 def process_transcript(transcript, db):
     try:
-        unique_words = set()
-        for line in transcript:
-            if line["text"] != '[Music]':
-                # Keep words with apostrophes intact
-                cleaned_words = [remove_punctuation(word).lower() for word in line["text"].split() 
-                                 if isinstance(word, str) and word.strip() != '']
-                unique_words.update(cleaned_words)
+        # Tokenize once; both the vocabulary upsert and the renderer read the same stream
+        with span('learn.tokenize'):
+            tokens = list(tokenize_transcript(transcript))
+            unique_words = {token.normalized for token in tokens}
         
         native_language = st.session_state.get("native_language")
         target_language = st.session_state.get("target_language")
         
         if st.session_state.get('username'):
             lang_pair = f"{native_language}-{target_language}"
-            send_unique_words_to_firestore(unique_words, st.session_state.username, db, lang_pair)
+            with span('learn.upsert', words=len(unique_words)):
+                queued = send_unique_words_to_firestore(unique_words, st.session_state.username, db, lang_pair)
+            if queued:
+                st.caption(f"{queued} words are being saved to your vocabulary.")
         
-        translations = batch_get_translations([word for word in unique_words if isinstance(word, str) and word], 
-                                              native_language, target_language)
+        with span('learn.translate', words=len(unique_words)):
+            translations = batch_get_translations(unique_words, native_language, target_language)
         
-        html_output = []
-        for line in transcript:
-            if line["text"] != '[Music]':
-                words_with_tooltips = []
-                for word in line["text"].split():
-                    # Clean the word for translation but keep the original for display
-                    cleaned_word = remove_punctuation(word)
-                    if cleaned_word and isinstance(cleaned_word, str):
-                        # Use the cleaned word for translation lookup but display the original word
-                        translation = translations.get(cleaned_word, [])[:3]
-                        words_with_tooltips.append(f'<div class="tooltip">{word}<span class="tooltiptext">{", ".join(translation)}</span></div>')
-                html_output.append(' '.join(words_with_tooltips))
-
-        return '\n'.join(html_output)
+        with span('learn.render', tokens=len(tokens)):
+            return render_lesson(tokens, translations)
 
     except Exception as e:
         st.error(f'Error processing script, in process_transcript(): {str(e)}')
         return None
 
 
-def st_player(youtube_url):
+# Minimum number of seconds between two redraws of the streamed transcript
+STREAM_REFRESH_INTERVAL = 0.25
+
+def show_write_status(lang_pair):
+    """
+    Tell the user whether the words they saved have reached their vocabulary yet.
+
+    :param lang_pair: String representing the language pair, e.g., "en-fr".
+    :return: None. This function displays the status directly in the Streamlit app.
+    """
+    status = get_write_queue().status(st.session_state.username, lang_pair)
+    if status.pending:
+        st.caption(f"{status.pending} words are still being saved to your vocabulary.")
+    if status.failed:
+        st.text("Could not save to your vocabulary: " + ', '.join(f"{word} ({error})" for word, error in status.errors.items()))
+
+def stream_transcript(transcript, db, save_words=True):
+    """
+    Render the transcript line by line while its translations are still being fetched.
+
+    Every line is drawn immediately in the compact lesson format (see `lesson_html`), 
+    with words still waiting on a translation shown in a loading state. Each word's 
+    glossary entry is added to the line where it first appears as soon as its 
+    translation arrives, which updates all of its occurrences in place. 
+    New words are queued to be saved to Firestore in the background (see `write_queue`).
+
+    :param transcript: The transcript as returned by `get_transcription`, or the lines of one window of it.
+    :param db: A Firestore client instance.
+    :param save_words: Whether to save the transcript's new words to Firestore.
+    :return: True if the transcript was rendered, False otherwise.
+    """
+    try:
+        with span('learn.tokenize'):
+            tokens = list(tokenize_transcript(transcript))
+            lines = [list(line_tokens) for _, line_tokens in groupby(tokens, key=attrgetter('line'))]
+            # Words in order of first appearance, so the first lines are translated first
+            first_line = {}
+            for line_number, line_tokens in enumerate(lines):
+                for token in line_tokens:
+                    first_line.setdefault(token.normalized, line_number)
+            unique_words = list(first_line)
+            ids = glossary_ids(unique_words)
+        if not tokens:
+            return False
+
+        native_language = st.session_state.get("native_language")
+        target_language = st.session_state.get("target_language")
+
+        lang_pair = f"{native_language}-{target_language}"
+        if save_words and st.session_state.get('username'):
+            with span('learn.upsert', words=len(unique_words)):
+                get_write_queue().add_words(st.session_state.username, lang_pair, unique_words)
+
+        line_rules = [[] for _ in lines]
+
+        def draw(line_numbers):
+            for line_number in sorted(line_numbers):
+                style = f'<style>{"".join(line_rules[line_number])}</style>' if line_rules[line_number] else ''
+                placeholders[line_number].markdown(
+                    f'{style}<div class="transcript">{line_html[line_number]}</div>', unsafe_allow_html=True
+                )
+
+        def resolve(words_translations):
+            for word, translations in words_translations.items():
+                line_rules[first_line[word]].append(glossary_rule(ids[word], translations))
+                dirty.add(first_line[word])
+
+        with span('learn.render', tokens=len(tokens)):
+            line_html = [render_line(line_tokens, ids) for line_tokens in lines]
+            placeholders = [st.empty() for _ in lines]
+            draw(range(len(lines)))
+
+        pending = set(unique_words)
+        dirty = set()
+        last_draw = time.monotonic()
+        with span('learn.translate', words=len(unique_words)):
+            for resolved in get_engine(native_language, target_language).translate_stream(unique_words):
+                pending.difference_update(resolved)
+                resolve(resolved)
+                if time.monotonic() - last_draw >= STREAM_REFRESH_INTERVAL:
+                    draw(dirty)
+                    dirty.clear()
+                    last_draw = time.monotonic()
+
+        # Words that timed out stop loading and are shown without a translation
+        resolve(dict.fromkeys(pending, []))
+        draw(dirty)
+
+        if save_words and st.session_state.get('username'):
+            show_write_status(lang_pair)
+        return True
+
+    except Exception as e:
+        st.error(f'Error processing script, in stream_transcript(): {str(e)}')
+        return False
+
+
+def st_player(youtube_url, start_time=0):
     """
     Display a YouTube video using Streamlit's video component.
 
@@ -223,9 +297,125 @@ def st_player(youtube_url):
     in a Streamlit application by encapsulating Streamlit's video function.
 
     :param youtube_url: A string containing the URL of the YouTube video to be displayed.
+    :param start_time: The second the video starts playing from.
     :return: None. This function displays the video directly in the Streamlit app.
     """
-    st.video(youtube_url)
+    st.video(youtube_url, start_time=start_time)
+
+
+def format_clock(seconds):
+    """
+    Format a number of seconds as "m:ss", or "h:mm:ss" from one hour on.
+    """
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02d}:{seconds:02d}' if hours else f'{minutes}:{seconds:02d}'
+
+
+def show_plain_text(lines):
+    """
+    Show transcript lines as plain text, without tooltips.
+    """
+    script = [line["text"] for line in lines if line["text"] != '[Music]']
+    st.text('\n\n'.join(script))  # Double newline for extra space between lines
+
+
+def get_vocabulary_levels(db):
+    # The worker's copy of the vocabulary; after the first sync only changed words are read
+    lang_pair = f"{st.session_state.get('native_language')}-{st.session_state.get('target_language')}"
+    cache = get_cache(st.session_state.username, lang_pair)
+    cache.sync(db)
+    return cache.to_series()
+
+def show_comprehension(transcript, db):
+    """
+    Show how much of a video the user already knows, by fluency level, and its most frequent unknown words.
+
+    The transcript's word counts are joined against the user's vocabulary in one
+    vectorized operation (see `comprehension.score`), without a Firestore read per word.
+
+    :param transcript: A list of dictionaries with 'text' keys.
+    :param db: A Firestore client instance.
+    :return: The `comprehension.Comprehension` shown.
+    """
+    with span('learn.comprehension'):
+        result = score(word_frequencies(transcript), get_vocabulary_levels(db))
+    show_score(result)
+    return result
+
+def show_score(result):
+    """
+    Show a `comprehension.Comprehension` computed by `show_comprehension`.
+    """
+    if not result.tokens:
+        st.warning('This video has an empty transcript.')
+        return
+    tokens_col, words_col = st.columns(2)
+    tokens_col.metric('Of all the words spoken, you know', f'{result.known_tokens:.0%}')
+    words_col.metric('Of the different words used, you know', f'{result.known_words:.0%}')
+    st.caption(f"Known words are at the '{KNOWN_LEVEL}' fluency level or above. "
+               f"The video has {result.tokens} words, {result.words} of them different.")
+    table = result.levels.assign(**{'Token share': result.levels['Token share'] * 100, 'Word share': result.levels['Word share'] * 100})
+    st.dataframe(table, use_container_width=True, column_config={
+        'Token share': st.column_config.NumberColumn(format='%.0f%%'),
+        'Word share': st.column_config.NumberColumn(format='%.0f%%'),
+    })
+    if not result.unknown.empty:
+        st.markdown('**Most frequent words you don\'t know yet:** ' +
+                    ', '.join(f'{word} ({count})' for word, count in result.unknown.items()))
+
+def show_lesson(youtube_url, db):
+    """
+    Show the imported lesson one time window at a time (see `lesson_pipeline`).
+
+    Only the selected window is tokenized, translated and rendered on each rerun,
+    so long videos such as lectures and podcasts load as quickly as short ones.
+    The video player starts at the beginning of the window.
+
+    :param youtube_url: A string representing the URL of the imported YouTube video.
+    :param db: A Firestore client instance.
+    :return: None. This function displays the lesson directly in the Streamlit app.
+    """
+    try:
+        transcript = import_lesson(youtube_url)
+    except Exception as e:
+        st.error(f'Error processing video: {str(e)}')
+        return
+
+    indexes = window_indexes(transcript)
+    if not indexes:
+        st.warning('This video has an empty transcript.')
+        return
+    with st.expander(':orange[How much of this video do you know?]'):
+        # An expander's body runs even when collapsed, so the vocabulary is only read on request
+        scored = st.session_state.get('lesson_comprehension')
+        scored = scored[1] if scored is not None and scored[0] == youtube_url else None
+        if st.button('Score again' if scored else 'Score this video against my vocabulary', key='lesson_score'):
+            st.session_state.lesson_comprehension = (youtube_url, show_comprehension(transcript, db))
+        elif scored:
+            show_score(scored)
+    index = indexes[0]
+    if len(indexes) > 1:
+        index = st.select_slider(
+            ':orange[Part of the video]',
+            options=indexes,
+            format_func=lambda i: f'{format_clock(i * WINDOW_SECONDS)} – {format_clock((i + 1) * WINDOW_SECONDS)}',
+            key='lesson_window',
+        )
+    window = window_at(transcript, index)
+    del transcript
+
+    st_player(youtube_url, start_time=int(window.start))
+
+    try:
+        # Lines appear as soon as their translations resolve; the words were saved on import
+        if not stream_transcript(window.lines, db, save_words=False):
+            show_plain_text(window.lines)
+    except Exception as e:
+        st.error(f'Error processing script, in app(): {str(e)}')
+        show_plain_text(window.lines)
+
+    show_write_status(f"{st.session_state.get('native_language')}-{st.session_state.get('target_language')}")
 
 
 def app():
@@ -246,35 +436,9 @@ def app():
 
     :return: None. This function controls the flow and display of the Streamlit app.
     """
+    st.markdown(LESSON_CSS, unsafe_allow_html=True)
     st.markdown("""
     <style>
-    .tooltip {
-      position: relative;
-      display: inline-block;
-      border-bottom: 1px dotted black; /* Optional: Indicates it's hoverable */
-    }
-
-    .tooltip .tooltiptext {
-      visibility: hidden;
-      width: 120px;
-      background-color: black;
-      color: #fff;
-      text-align: center;
-      border-radius: 6px;
-      padding: 5px 0;
-      position: absolute;
-      z-index: 1;
-      bottom: 125%; /* Tooltip above the word */
-      left: 50%; 
-      margin-left: -60px; /* Half of width to center the tooltip */
-      opacity: 0;
-      transition: opacity 0.3s;
-    }
-
-    .tooltip:hover .tooltiptext {
-      visibility: visible;
-      opacity: 1;
-    }
     /* New styles for larger text and increased line spacing */
     .transcript {
       font-size: 24px; /* Double the typical font size */
@@ -283,11 +447,10 @@ def app():
     </style>
     """, unsafe_allow_html=True)
 
+    # One Firestore client per worker process, shared by every session
     if 'db' not in st.session_state:
-        st.session_state.db = ''
-
-    db=firestore.client()
-    st.session_state.db=db
+        st.session_state.db = get_db()
+    db = st.session_state.db
 
     if st.session_state.username == '':
         st.error("Please log in with a valid username.")
@@ -297,17 +460,19 @@ def app():
             st.markdown("""
             In a separate tab of your web browser, open [YouTube](https://www.youtube.com) and find a video to watch. 
             You can use [Google Translate](https://translate.google.com/) to get the search terms that interest you 
-            in your target language from your native language. The video should be less than 5 minutes long and have 
-            captions in your target language. Use Youtube's Filters -> Duration -> Under 4 minutes.
+            in your target language from your native language. The video should have captions in your target language.
             Copy the URL for the YouTube video and paste it in the box below, then click the **Import Lesson** button. 
-            Videos longer than 5 minutes risk not properly loading the transcript and other LanguageBuddy features.
-            The shorter a video is, the easier it will be to complete the steps below.
+            To see first how many of the video's words you already know, click **Check Comprehension**; 
+            videos where you know most of the words (roughly 80 % or more) are the easiest to learn from. 
+            Longer videos such as lectures and podcasts are split into parts of a few minutes; use the 
+            **Part of the video** slider to move between them. 
+            The shorter a video (or part) is, the easier it will be to complete the steps below.
             """)
             st.subheader(":orange[For the best results]")
             
             st.markdown("""
             <ol>
-                <li>Pick a video less than 5 minutes long. (Novice learners should aim for 1 to 2 minutes)</li>
+                <li>Pick a video, or a part of one, a few minutes long. (Novice learners should aim for 1 to 2 minutes)</li>
                 <li>Watch the entire video without subtitles (or just listen to the audio)</li>
                 <li>Read the transcription and use the mouse to hover over unknown words, their translation will appear in a tooltip</li>
                 <li>Rewatch the video with subtitles, or listen to the audio while you read the transcription</li>
@@ -318,46 +483,46 @@ def app():
             """, unsafe_allow_html=True)
 
         youtube_url = st.text_area(
-            label=' :orange[Enter the YouTube URL below and click Import Lesson - (video should be less than 5 minutes)]',
+            label=' :orange[Enter the YouTube URL below and click Import Lesson]',
             placeholder='Enter YouTube URL',
             height=None, 
             max_chars=500
         )
 
-        if st.button('Import Lesson', use_container_width=True):
+        check_col, import_col = st.columns(2)
+        if check_col.button('Check Comprehension', use_container_width=True):
+            # Scores the video against the vocabulary without importing it
             if youtube_url != '':
-                if try_site(youtube_url):  
-                    try:
-                        st_player(youtube_url)
+                try:
+                    with span('learn.fetch_transcript'):
                         transcript = import_lesson(youtube_url)
+                    show_comprehension(transcript, db)
+                except Exception as e:
+                    st.error(f'Error processing video: {str(e)}')
+            else:
+                st.warning('Please enter a YouTube URL.')
 
-                        try:
-                            formatted_transcript = process_transcript(transcript, db)
-                            if formatted_transcript:
-                                # Add a class for styling to the transcript output
-                                st.markdown(f"""
-                                <div class="transcript">
-                                {formatted_transcript}
-                                </div>
-                                """, unsafe_allow_html=True)
-                            else:
-                                script = []
-                                for line in transcript:
-                                    text = line["text"]
-                                    if text != '[Music]':
-                                        script.append(text)
-                                st.text('\n\n'.join(script))  # Double newline for extra space between lines
-                        except Exception as e:
-                                st.error(f'Error processing script, in app(): {str(e)}')
-                                script = []
-                                for line in transcript:
-                                    text = line["text"]
-                                    if text != '[Music]':
-                                        script.append(text)
-                                st.text('\n\n'.join(script))  # Double newline for extra space between lines
+        if import_col.button('Import Lesson', use_container_width=True):
+            if youtube_url != '':
+                if try_site(youtube_url):  
+                    try:
+                        with span('learn.fetch_transcript'):
+                            transcript = import_lesson(youtube_url)
+                        st.session_state.lesson_url = youtube_url
+                        # A new lesson starts at its first part
+                        st.session_state.pop('lesson_window', None)
+                        # Every word of the video is queued and saved in the background
+                        lang_pair = f"{st.session_state.get('native_language')}-{st.session_state.get('target_language')}"
+                        with span('learn.upsert'):
+                            get_write_queue().add_words(st.session_state.username, lang_pair, count_words(transcript))
+                        del transcript
                     except Exception as e:
+                        st.session_state.lesson_url = None
                         st.error(f'Error processing video: {str(e)}')
                 else:
                     st.error('Invalid YouTube URL or video not accessible.')
             else:
-                st.warning('Please enter a YouTube URL.')
\ No newline at end of file
+                st.warning('Please enter a YouTube URL.')
+
+        if st.session_state.get('lesson_url'):
+            show_lesson(st.session_state.lesson_url, db)
\ No newline at end of file
@@ -0,0 +1,107 @@
+import html
+from itertools import groupby
+from operator import attrgetter
+
+########################################
+#     Compact lesson HTML format       #
+########################################
+
+# Each distinct word gets a short class name ("g0", "g1", ...) that refers to its
+# glossary entry. The glossary is a <style> block with one rule per word whose
+# ::after content is the tooltip text, so the translations of a word are sent to
+# the browser once no matter how many times the word occurs in the transcript.
+# Words are dimmed with a "…" tooltip until their glossary rule arrives.
+
+LESSON_CSS = """
+<style>
+.w {
+  position: relative;
+  display: inline-block;
+  border-bottom: 1px dashed black;
+  opacity: 0.6;
+}
+
+.w::after {
+  content: "…";
+  visibility: hidden;
+  width: 120px;
+  background-color: black;
+  color: #fff;
+  text-align: center;
+  border-radius: 6px;
+  padding: 5px 0;
+  position: absolute;
+  z-index: 1;
+  bottom: 125%; /* Tooltip above the word */
+  left: 50%;
+  margin-left: -60px; /* Half of width to center the tooltip */
+  font-size: 14px;
+  line-height: 1.4;
+  opacity: 0;
+  transition: opacity 0.3s;
+}
+
+.w:hover::after {
+  visibility: visible;
+  opacity: 1;
+}
+</style>
+"""
+
+
+def css_string(text):
+    """
+    Quote text as a CSS string literal that is safe to embed in a <style> block.
+
+    :param text: Any string.
+    :return: The double-quoted, escaped CSS string.
+    """
+    escaped = (text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\a ')
+               .replace('<', '\\3c ').replace('>', '\\3e '))
+    return f'"{escaped}"'
+
+
+def glossary_rule(glossary_id, translations):
+    """
+    Return the CSS rule that resolves every occurrence of one word.
+
+    :param glossary_id: The word's class name, e.g. "g12".
+    :param translations: The word's list of translations; only the first three are shown.
+    :return: A CSS rule string.
+    """
+    return f'.{glossary_id}{{opacity:1;border-bottom-style:dotted}}.{glossary_id}::after{{content:{css_string(", ".join(translations[:3]))}}}'
+
+
+def glossary_ids(words):
+    """
+    Assign a glossary class name to each word, in order.
+
+    :param words: An iterable of distinct normalized words.
+    :return: A dictionary mapping each word to its class name.
+    """
+    return {word: f'g{index}' for index, word in enumerate(words)}
+
+
+def render_line(line_tokens, ids):
+    """
+    Render the words of one transcript line as spans referring to their glossary entries.
+
+    :param line_tokens: The `tokenizer.Token`s of a single transcript line.
+    :param ids: A dictionary mapping normalized words to glossary class names.
+    :return: A string of HTML for the line.
+    """
+    return ' '.join(f'<span class="w {ids[token.normalized]}">{html.escape(token.surface, quote=False)}</span>' for token in line_tokens)
+
+
+def render_lesson(tokens, translations):
+    """
+    Render a token stream as a compact lesson: one glossary followed by the transcript lines.
+
+    :param tokens: A list of `tokenizer.Token`, in transcript order.
+    :param translations: A dictionary mapping normalized words to lists of translations.
+    :return: A string of HTML, one transcript line per text line.
+    """
+    ids = glossary_ids(dict.fromkeys(token.normalized for token in tokens))
+    glossary = ''.join(glossary_rule(ids[word], translations.get(word, [])) for word in ids)
+    lines = (render_line(line_tokens, ids) for _, line_tokens in groupby(tokens, key=attrgetter('line')))
+    return f'<style>{glossary}</style>' + '\n'.join(lines)
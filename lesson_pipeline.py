@@ -0,0 +1,47 @@
+import os
+from collections import namedtuple
+from itertools import groupby
+
+########################################
+#     Transcript time windows          #
+########################################
+
+# Length in seconds of the transcript windows a lesson is shown in.
+WINDOW_SECONDS = float(os.getenv('LESSON_WINDOW_SECONDS', 120))
+
+Window = namedtuple('Window', ['index', 'start', 'end', 'lines'])
+
+
+def _start(line):
+    return float(line.get('start', 0.0))
+
+
+def iter_windows(transcript, seconds=WINDOW_SECONDS):
+    """
+    Split a transcript into consecutive time windows.
+
+    Lines are assigned to the window their start time falls in; windows without
+    any line (silences longer than `seconds`) are skipped, so indexes can have gaps.
+
+    :param transcript: A list of dictionaries with 'text' and 'start' keys, in time order.
+    :param seconds: Length of each window in seconds.
+    :return: A generator of `Window(index, start, end, lines)`, where `lines` is a slice of `transcript`.
+    """
+    for index, lines in groupby(transcript, key=lambda line: int(_start(line) // seconds)):
+        yield Window(index, index * seconds, (index + 1) * seconds, list(lines))
+
+
+def window_at(transcript, index, seconds=WINDOW_SECONDS):
+    """
+    Return the window with the given index, or the first one after it if that window is empty.
+
+    :return: A `Window`, or None if the transcript ends before `index`.
+    """
+    return next((window for window in iter_windows(transcript, seconds) if window.index >= index), None)
+
+
+def window_indexes(transcript, seconds=WINDOW_SECONDS):
+    """
+    Return the indexes of the non-empty windows of a transcript, without building them.
+    """
+    return list(dict.fromkeys(int(_start(line) // seconds) for line in transcript))
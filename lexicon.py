@@ -0,0 +1,281 @@
+import json
+import os
+import threading
+from collections import defaultdict, namedtuple
+
+import numpy as np
+from firebase_admin import firestore
+
+from disk_cache import DiskCache
+from telemetry import span
+from vocabulary import FLUENCY_LEVELS, READ_CHUNK_SIZE, chunked, vocabulary_document, with_retry
+
+########################################
+#     Shared lexicon, packed levels    #
+########################################
+
+# Words per lexicon chunk document, which lists the words of consecutive IDs.
+LEXICON_CHUNK_SIZE = 10_000
+# Word IDs per packed fluency document: 24 KiB at 3 bits per word.
+PACKED_CHUNK_SIZE = 65_536
+BITS_PER_WORD = 3
+# Size of the on-disk cache of word IDs and lexicon chunks, shared by every language.
+MAX_BYTES = int(os.getenv('LEXICON_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+# Words given IDs per transaction; each costs one write, with the chunks and counter.
+MAX_ASSIGN = 400
+
+# Fields of the language pair document describing its packed copy.
+PACKED_AT_FIELD = 'packed_at'
+PACKED_CHUNKS_FIELD = 'packed_chunks'
+
+# Code of each fluency level in the packed arrays; 0 means "not in the vocabulary".
+LEVEL_CODES = {level: code for code, level in enumerate(FLUENCY_LEVELS, start=1)}
+
+PackedVocabulary = namedtuple('PackedVocabulary', ['levels', 'packed_at'])
+
+
+def lexicon_language(lang_pair):
+    """
+    Return the language of the words of a vocabulary, e.g. 'fr' for "en-fr".
+    """
+    return lang_pair.split('-')[1]
+
+
+def lexicon_document(db, language):
+    """
+    Return the Firestore document of a language's lexicon, which holds the next free word ID.
+
+    Word IDs are under `lexicons/{language}/ids/{word}` and the words of consecutive
+    IDs in `lexicons/{language}/chunks/{n}`.
+    """
+    return db.collection('lexicons').document(language)
+
+
+def packed_collection(db, user_id, lang_pair):
+    """
+    Return the collection holding a user's packed fluency levels, one document per `PACKED_CHUNK_SIZE` word IDs.
+    """
+    return vocabulary_document(db, user_id, lang_pair).collection('packed')
+
+
+def pack_levels(codes):
+    """
+    Pack an array of level codes (0-7) into `BITS_PER_WORD` bits each.
+
+    :param codes: A sequence of small integers, indexed by word ID offset.
+    :return: The packed bytes.
+    """
+    bits = np.unpackbits(np.asarray(codes, dtype=np.uint8)[:, None], axis=1)[:, -BITS_PER_WORD:]
+    return np.packbits(bits.ravel()).tobytes()
+
+
+def unpack_levels(data, size):
+    """
+    Unpack `size` level codes packed by `pack_levels`.
+
+    :return: A numpy array of level codes.
+    """
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))[:size * BITS_PER_WORD].reshape(size, BITS_PER_WORD)
+    return bits @ (1 << np.arange(BITS_PER_WORD - 1, -1, -1))
+
+
+class Lexicon:
+    """
+    The append-only mapping between the words of one language and integer IDs, shared by all users.
+
+    IDs never change once assigned, so both directions are cached on disk until
+    evicted for space; only the last, partly filled chunk of words is read from
+    Firestore again.
+
+    :param language: The language code of the words.
+    :param cache: The `DiskCache` holding IDs and full chunks.
+    """
+
+    def __init__(self, language, cache=None):
+        self.language = language
+        self.cache = cache if cache is not None else DiskCache('lexicon', max_bytes=MAX_BYTES)
+
+    def _id_key(self, word):
+        return f'{self.language}:id:{word}'
+
+    def _chunk_key(self, number):
+        return f'{self.language}:chunk:{number}'
+
+    def ids(self, db, words, create=False):
+        """
+        Return the IDs of words, optionally giving new ones to words without one.
+
+        :param db: A Firestore client instance.
+        :param words: An iterable of words.
+        :param create: Assign IDs to words that have none yet.
+        :return: A dictionary mapping words to their IDs; without `create`, unknown words are left out.
+        """
+        words = list(dict.fromkeys(words))
+        keys = {word: self._id_key(word) for word in words}
+        found = self.cache.get_many(keys.values())
+        ids = {word: int(found[key]) for word, key in keys.items() if key in found}
+
+        root = lexicon_document(db, self.language)
+        missing = [word for word in words if word not in ids]
+        for chunk in chunked(missing, READ_CHUNK_SIZE):
+            refs = [root.collection('ids').document(word) for word in chunk]
+            with span('firestore.get_all', documents=len(refs)):
+                snapshots = list(db.get_all(refs))
+            ids.update((snapshot.id, snapshot.get('id')) for snapshot in snapshots if snapshot.exists)
+        if create:
+            for chunk in chunked([word for word in missing if word not in ids], MAX_ASSIGN):
+                ids.update(self._assign(db, chunk))
+        self.cache.set_many({keys[word]: str(ids[word]) for word in missing if word in ids})
+        return ids
+
+    def _assign(self, db, words):
+        """Give IDs to words in one transaction, keeping the IDs other writers gave them meanwhile."""
+        root = lexicon_document(db, self.language)
+        refs = {word: root.collection('ids').document(word) for word in words}
+
+        @firestore.transactional
+        def assign(transaction):
+            snapshots = {snapshot.reference.path: snapshot for snapshot in transaction.get_all([root, *refs.values()])}
+            counter = snapshots.get(root.path)
+            next_id = counter.get('next_id') if counter is not None and counter.exists else 0
+            ids, new = {}, {}
+            for word, ref in refs.items():
+                snapshot = snapshots.get(ref.path)
+                if snapshot is not None and snapshot.exists:
+                    ids[word] = snapshot.get('id')
+                else:
+                    new[word] = next_id + len(new)
+            if not new:
+                return ids
+
+            chunk_refs = {number: root.collection('chunks').document(str(number))
+                          for number in sorted({word_id // LEXICON_CHUNK_SIZE for word_id in new.values()})}
+            chunks = {snapshot.reference.path: snapshot for snapshot in transaction.get_all(list(chunk_refs.values()))}
+            for number, ref in chunk_refs.items():
+                snapshot = chunks.get(ref.path)
+                chunk_words = list(snapshot.get('words')) if snapshot is not None and snapshot.exists else []
+                chunk_words.extend(word for word, word_id in new.items() if word_id // LEXICON_CHUNK_SIZE == number)
+                transaction.set(ref, {'words': chunk_words})
+            for word, word_id in new.items():
+                transaction.set(refs[word], {'id': word_id})
+            transaction.set(root, {'next_id': next_id + len(new)}, merge=True)
+            return {**ids, **new}
+
+        with span('firestore.transaction', words=len(words)):
+            return with_retry(lambda: assign(db.transaction()))
+
+    def words(self, db, ids):
+        """
+        Return the words of word IDs.
+
+        :param db: A Firestore client instance.
+        :param ids: An iterable of word IDs.
+        :return: A dictionary mapping each known ID to its word.
+        """
+        numbers = sorted({int(word_id) // LEXICON_CHUNK_SIZE for word_id in ids})
+        keys = {number: self._chunk_key(number) for number in numbers}
+        found = self.cache.get_many(keys.values())
+        chunks = {number: json.loads(found[key]) for number, key in keys.items() if key in found}
+
+        missing = [number for number in numbers if number not in chunks]
+        if missing:
+            root = lexicon_document(db, self.language)
+            refs = [root.collection('chunks').document(str(number)) for number in missing]
+            with span('firestore.get_all', documents=len(refs)):
+                snapshots = list(db.get_all(refs))
+            for snapshot in snapshots:
+                if snapshot.exists:
+                    chunks[int(snapshot.id)] = snapshot.get('words')
+            # A chunk only stops growing once it is full.
+            self.cache.set_many({keys[number]: json.dumps(chunks[number]) for number in missing
+                                 if len(chunks.get(number, ())) == LEXICON_CHUNK_SIZE})
+
+        words = {}
+        for word_id in ids:
+            number, offset = divmod(int(word_id), LEXICON_CHUNK_SIZE)
+            chunk = chunks.get(number, ())
+            if offset < len(chunk):
+                words[int(word_id)] = chunk[offset]
+        return words
+
+
+_lexicons = {}
+_lexicons_lock = threading.Lock()
+
+
+def get_lexicon(language):
+    """
+    Return the process-wide lexicon of a language.
+    """
+    with _lexicons_lock:
+        if language not in _lexicons:
+            _lexicons[language] = Lexicon(language)
+        return _lexicons[language]
+
+
+def pack_vocabulary(db, user_id, lang_pair, levels, packed_at):
+    """
+    Store a user's fluency levels as packed arrays indexed by lexicon word ID.
+
+    Words without an ID get one. The arrays and the `packed_at` watermark are
+    written in one batch, so readers see either the old or the new packed copy.
+
+    :param db: A Firestore client instance.
+    :param user_id: The ID of the user who owns the vocabulary.
+    :param lang_pair: String representing the language pair, e.g., "en-fr".
+    :param levels: A dictionary mapping every word of the vocabulary to its fluency level.
+    :param packed_at: A time before any write that `levels` may be missing, e.g. when reading it started.
+    :return: The number of packed documents written.
+    """
+    ids = get_lexicon(lexicon_language(lang_pair)).ids(db, levels, create=True)
+    chunks = defaultdict(dict)
+    for word, fluency in levels.items():
+        number, offset = divmod(ids[word], PACKED_CHUNK_SIZE)
+        chunks[number][offset] = LEVEL_CODES.get(fluency, LEVEL_CODES['1-new'])
+
+    collection = packed_collection(db, user_id, lang_pair)
+    batch = db.batch()
+    for number, codes in chunks.items():
+        array = np.zeros(max(codes) + 1, dtype=np.uint8)
+        array[list(codes)] = list(codes.values())
+        batch.set(collection.document(str(number)), {'levels': pack_levels(array), 'size': len(array)})
+    batch.set(vocabulary_document(db, user_id, lang_pair),
+              {PACKED_CHUNKS_FIELD: sorted(chunks), PACKED_AT_FIELD: packed_at}, merge=True)
+    with span('firestore.commit', writes=len(chunks) + 1):
+        with_retry(batch.commit)
+    return len(chunks)
+
+
+def load_packed(db, user_id, lang_pair):
+    """
+    Read a user's packed fluency levels with a handful of reads, whatever the vocabulary size.
+
+    :param db: A Firestore client instance.
+    :param user_id: The ID of the user who owns the vocabulary.
+    :param lang_pair: String representing the language pair, e.g., "en-fr".
+    :return: A `PackedVocabulary(levels, packed_at)`, where words written after `packed_at` may
+             be missing or outdated, or None if the vocabulary was never packed (see `migrate_lexicon.py`).
+    """
+    with span('firestore.get'):
+        snapshot = vocabulary_document(db, user_id, lang_pair).get()
+    data = snapshot.to_dict() if snapshot.exists else None
+    if not data or data.get(PACKED_AT_FIELD) is None:
+        return None
+
+    collection = packed_collection(db, user_id, lang_pair)
+    refs = [collection.document(str(number)) for number in data.get(PACKED_CHUNKS_FIELD, [])]
+    with span('firestore.get_all', documents=len(refs)):
+        snapshots = list(db.get_all(refs)) if refs else []
+    ids, codes = [], []
+    for snapshot in snapshots:
+        if snapshot.exists:
+            chunk = unpack_levels(snapshot.get('levels'), snapshot.get('size'))
+            offsets = np.flatnonzero(chunk)
+            ids.append(offsets + int(snapshot.id) * PACKED_CHUNK_SIZE)
+            codes.append(chunk[offsets])
+    ids = np.concatenate(ids).tolist() if ids else []
+    codes = np.concatenate(codes).tolist() if codes else []
+
+    words = get_lexicon(lexicon_language(lang_pair)).words(db, ids)
+    levels = {words[word_id]: FLUENCY_LEVELS[code - 1] for word_id, code in zip(ids, codes) if word_id in words}
+    return PackedVocabulary(levels, data[PACKED_AT_FIELD])
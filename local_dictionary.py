@@ -0,0 +1,171 @@
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+
+from translation_store import normalize_word
+
+########################################
+#     Memory-mapped local dictionary   #
+########################################
+
+DICTIONARY_DIR = os.getenv('LANGUAGEBUDDY_DICTIONARY_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dictionaries'))
+LANGUAGES = ('en', 'fr', 'es', 'de', 'it')
+
+# File layout (all integers little-endian uint32):
+#   MAGIC | entry count N | N + 1 entry offsets | entries
+# Entries are sorted by the UTF-8 bytes of their word. Each one is the word, a NUL,
+# then its translations separated by SEPARATOR; an entry ends where the next begins.
+MAGIC = b'LBDICT1\0'
+HEADER = struct.Struct('<8sI')
+SEPARATOR = b'\x1f'
+
+
+def dictionary_path(source_language, target_language, directory=DICTIONARY_DIR):
+    """
+    Return the path of the compiled dictionary translating `source_language` words into `target_language`.
+    """
+    return os.path.join(directory, f'{source_language}-{target_language}.dict')
+
+
+def build(entries, path):
+    """
+    Compile a word list into the dictionary file format.
+
+    The file is written next to `path` and moved into place, so worker processes
+    that have the old file mapped keep reading it until they reopen.
+
+    :param entries: A dictionary mapping words to lists of translations.
+    :param path: Where to write the compiled dictionary.
+    :return: The number of words written.
+    """
+    merged = {}
+    for word, translations in entries.items():
+        key = normalize_word(word).encode('utf-8')
+        if not key or b'\0' in key:
+            continue
+        values = merged.setdefault(key, [])
+        for translation in translations:
+            translation = translation.strip()
+            if translation and translation not in values:
+                values.append(translation)
+    merged = {key: values for key, values in merged.items() if values}
+
+    offsets = array('I')
+    body = bytearray()
+    for key in sorted(merged):
+        offsets.append(len(body))
+        body += key + b'\0' + SEPARATOR.join(value.encode('utf-8').replace(SEPARATOR, b' ') for value in merged[key])
+    start = HEADER.size + 4 * (len(offsets) + 1)
+    offsets = array('I', (start + offset for offset in offsets))
+    offsets.append(start + len(body))
+    if sys.byteorder == 'big':
+        offsets.byteswap()
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, len(merged)))
+        out.write(offsets.tobytes())
+        out.write(body)
+    os.replace(temporary, path)
+    return len(merged)
+
+
+class LocalDictionary:
+    """
+    A read-only bilingual dictionary memory-mapped from a compiled file (see `build`).
+
+    The file is mapped, not read: every worker process on a host shares the same
+    pages of the OS page cache, and only the pages that lookups touch are loaded.
+    A lookup is a binary search over the sorted entries, a few microseconds each.
+
+    :param path: Path of the compiled dictionary file.
+    :raises ValueError: If the file is not a compiled dictionary.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a compiled LanguageBuddy dictionary')
+        offsets = memoryview(self._map)[HEADER.size:HEADER.size + 4 * (self._count + 1)]
+        if sys.byteorder == 'big':
+            # The offsets are stored little-endian; swap a private copy.
+            self._offsets = array('I', offsets.tobytes())
+            self._offsets.byteswap()
+            offsets.release()
+        else:
+            self._offsets = offsets.cast('I')
+
+    def __len__(self):
+        return self._count
+
+    def _find(self, key):
+        data, offsets = self._map, self._offsets
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            start = offsets[middle]
+            found = data[start:data.find(b'\0', start)]
+            if found < key:
+                low = middle + 1
+            elif found > key:
+                high = middle
+            else:
+                return start + len(key) + 1, offsets[middle + 1]
+        return None
+
+    def lookup(self, word):
+        """
+        Return the translations of a word, or None if the dictionary does not have it.
+
+        :param word: The word to translate; it is normalized like translation store keys.
+        :return: A list of translation strings, or None.
+        """
+        found = self._find(normalize_word(word).encode('utf-8'))
+        if found is None:
+            return None
+        start, end = found
+        return self._map[start:end].decode('utf-8').split(SEPARATOR.decode('ascii'))
+
+    def lookup_many(self, words):
+        """
+        Look up several words.
+
+        :param words: An iterable of words.
+        :return: A dictionary mapping each word found (as given) to its list of translations.
+        """
+        found = {}
+        for word in words:
+            translations = self.lookup(word)
+            if translations is not None:
+                found[word] = translations
+        return found
+
+    def __contains__(self, word):
+        return self._find(normalize_word(word).encode('utf-8')) is not None
+
+
+_dictionaries = {}
+_dictionaries_lock = threading.Lock()
+
+
+def get_dictionary(source_language, target_language):
+    """
+    Return the process-wide dictionary for a language pair, mapping it on first use.
+
+    :param source_language: The language code of the words being translated.
+    :param target_language: The language code translations are returned in.
+    :return: A `LocalDictionary`, or None if no dictionary was built for the pair.
+    """
+    key = (source_language, target_language)
+    with _dictionaries_lock:
+        if key not in _dictionaries:
+            path = dictionary_path(source_language, target_language)
+            _dictionaries[key] = LocalDictionary(path) if os.path.exists(path) else None
+        return _dictionaries[key]
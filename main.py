@@ -1,11 +1,15 @@
 import streamlit as st
 
 from streamlit_option_menu import option_menu
+import importlib
 import os
 from dotenv import load_dotenv
 load_dotenv()
 
-import account, learn, progress, study_vocabulary, about
+# Only the login page is imported up front; the other pages (and their heavy
+# dependencies) are imported the first time they are selected.
+import account
+import telemetry
 st.set_page_config(
         page_title="Language Buddy",
 )
@@ -24,29 +28,72 @@ st.markdown(
     """, unsafe_allow_html=True)
 print(os.getenv('analytics_tag'))
 
+# Usernames that can see the per-rerun timing breakdown in the sidebar (needs LANGUAGEBUDDY_TRACING=1)
+ADMIN_USERS = set(filter(None, os.getenv('LANGUAGEBUDDY_ADMINS', '').split(',')))
+telemetry.serve_metrics()
+
 
 class MultiApp:
 
     def __init__(self):
         self.apps = []
 
-    def add_app(self, title, func):
+    def add_app(self, title, module, icon):
+        """
+        Register a page by the name of its module, without importing it.
+
+        :param title: The title shown in the sidebar menu.
+        :param module: The name of the module whose `app()` renders the page.
+        :param icon: The Bootstrap icon name shown next to the title.
+        """
         self.apps.append({
             "title": title,
-            "function": func
+            "module": module,
+            "icon": icon
         })
 
-    def run():
+    def load(self, title):
+        """
+        Import the page registered under `title` (once per process) and return its `app` function.
+        """
+        page = next(page for page in self.apps if page["title"] == title)
+        return importlib.import_module(page["module"]).app
+
+    def show_timings(self, spans):
+        """
+        Show admins how long each traced call and stage of this rerun took, in the sidebar.
+
+        :param spans: The spans collected by `telemetry.start_rerun`, or None when tracing is off.
+        """
+        if spans is None or st.session_state.get('username') not in ADMIN_USERS:
+            return
+        with st.sidebar:
+            if not st.toggle('Show timings'):
+                return
+            if not spans:
+                st.caption('No traced calls in this rerun.')
+                return
+            st.dataframe([{
+                'span': span.name,
+                'start (ms)': round(span.start * 1000, 1),
+                'duration (ms)': round(span.duration * 1000, 1),
+                'error': span.error or '',
+            } for span in spans], hide_index=True)
+
+    def run(self):
+        spans = telemetry.start_rerun()
+        lang_pair = f"{st.session_state.get('native_language')}-{st.session_state.get('target_language')}"
         # Check if user is logged in before showing the sidebar menu
         if 'username' not in st.session_state or st.session_state.username == '':
+            telemetry.set_tags(page='account', lang_pair=lang_pair)
             account.app()  # Directly go to account page if not logged in
             return  # This will stop the function here if not logged in
 
         with st.sidebar:        
             app = option_menu(
                 menu_title='LanguageBuddy ',
-                options=['Account','Learn','Study Vocabulary','Your Progress','about'],
-                icons=['person-circle','caret-right-square-fill','book','graph-up','info-circle-fill'], 
+                options=[page["title"] for page in self.apps],
+                icons=[page["icon"] for page in self.apps], 
                 menu_icon='people-fill', 
                 default_index=0,  # Changed to 0 to default to Account when logged in
                 styles={
@@ -57,15 +104,16 @@ class MultiApp:
                 }
             )
 
-        if app == "Account":
-            account.app()  
-        if app == "Learn":
-            learn.app()
-        if app == "Your Progress":
-            progress.app()        
-        if app == 'Study Vocabulary':
-            study_vocabulary.app()
-        if app == 'about':
-            about.app()      
-
-    run()
\ No newline at end of file
+        page = next(page for page in self.apps if page["title"] == app)
+        telemetry.set_tags(page=page["module"], user_id=st.session_state.username, lang_pair=lang_pair)
+        self.load(app)()
+        self.show_timings(spans)
+
+
+multi_app = MultiApp()
+multi_app.add_app('Account', 'account', 'person-circle')
+multi_app.add_app('Learn', 'learn', 'caret-right-square-fill')
+multi_app.add_app('Study Vocabulary', 'study_vocabulary', 'book')
+multi_app.add_app('Your Progress', 'progress', 'graph-up')
+multi_app.add_app('about', 'about', 'info-circle-fill')
+multi_app.run()
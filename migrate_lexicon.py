@@ -0,0 +1,88 @@
+"""
+Pack users' vocabularies into the shared-lexicon layout, and repack them later.
+
+Streams each `users/{id}/vocabulary/{pair}/words` collection once, gives its words
+IDs in the shared `lexicons/{language}` lexicon and writes the fluency levels as
+packed arrays under `users/{id}/vocabulary/{pair}/packed`, so the app then loads the
+vocabulary with a few reads (see `lexicon.load_packed`). The per-word documents are
+kept: they are still written by the app, and words changed after packing are read
+from them. Running it again repacks. Uses the Firebase credentials from
+`.streamlit/secrets.toml`, like the app.
+
+    python migrate_lexicon.py              # every user
+    python migrate_lexicon.py alice bob    # only these users
+    python migrate_lexicon.py --check      # compare the packed copies with the words
+"""
+import argparse
+from datetime import datetime, timezone
+
+from lexicon import load_packed, pack_vocabulary
+from resources import get_db
+from vocabulary_io import iter_vocabulary
+
+
+def read_levels(db, user_id, lang_pair):
+    """
+    Return a dictionary mapping every word of a vocabulary to its fluency level, from the per-word documents.
+    """
+    return {entry['word']: entry['fluency'] or '1-new' for entry in iter_vocabulary(db, user_id, lang_pair)}
+
+
+def migrate_vocabulary(db, user_id, lang_pair):
+    """
+    Pack one vocabulary.
+
+    :param db: A Firestore client instance.
+    :param user_id: The ID of the user who owns the vocabulary.
+    :param lang_pair: String representing the language pair, e.g., "en-fr".
+    :return: A tuple of the number of words and of packed documents written.
+    """
+    # Words written while streaming are newer than this and read again on load.
+    started = datetime.now(timezone.utc)
+    levels = read_levels(db, user_id, lang_pair)
+    return len(levels), pack_vocabulary(db, user_id, lang_pair, levels, started)
+
+
+def check_vocabulary(db, user_id, lang_pair):
+    """
+    Compare the packed copy of one vocabulary with its per-word documents.
+
+    Words changed since packing also differ; the app reads those past the copy.
+
+    :return: A tuple of the number of words and of words missing from or different in the
+             packed copy, or None if the vocabulary was never packed.
+    """
+    packed = load_packed(db, user_id, lang_pair)
+    if packed is None:
+        return None
+    levels = read_levels(db, user_id, lang_pair)
+    return len(levels), sum(packed.levels.get(word) != fluency for word, fluency in levels.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('users', nargs='*', help='User IDs to migrate (default: all users)')
+    parser.add_argument('--check', action='store_true', help='Only compare the packed copies with the per-word documents')
+    args = parser.parse_args()
+
+    db = get_db()
+
+    user_ids = args.users or [user_ref.id for user_ref in db.collection('users').list_documents()]
+    for user_id in user_ids:
+        vocabulary = db.collection('users').document(user_id).collection('vocabulary')
+        # list_documents() also returns pair documents that only exist as parents of words.
+        for pair_ref in vocabulary.list_documents():
+            lang_pair = pair_ref.id
+            if args.check:
+                result = check_vocabulary(db, user_id, lang_pair)
+                if result is None:
+                    print(f"{user_id} {lang_pair}: not packed")
+                else:
+                    print(f"{user_id} {lang_pair}: {result[0]} words, {result[1]} differ")
+            else:
+                words, documents = migrate_vocabulary(db, user_id, lang_pair)
+                print(f"{user_id} {lang_pair}: packed {words} words into {documents} documents")
+
+
+if __name__ == '__main__':
+    main()
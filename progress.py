@@ -2,14 +2,22 @@ import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.colors import ListedColormap
-from firebase_admin import firestore
+from resources import get_db
+from telemetry import span
+from vocabulary import FLUENCY_LEVELS, get_fluency_counts
+from vocabulary_cache import get_cache
+from write_queue import get_write_queue
 
 def fetch_vocabulary_stats(user_id, lang_pair, db):
-    words_collection = db.collection('users').document(user_id).collection('vocabulary').document(lang_pair).collection('words')
-    vocab = [{'Word': doc.id, 'Fluency': doc.to_dict().get('fluency', '1-new')} for doc in words_collection.stream()]
-    df = pd.DataFrame(vocab)
-    
-    stats = df['Fluency'].value_counts().reindex(['1-new', '2-recognized', '3-familiar', '4-learned', '5-known']).dropna()
+    cache = get_cache(user_id, lang_pair)
+    if cache.is_synced:
+        # This worker already holds this vocabulary; only pull what changed
+        cache.sync(db)
+        counts = cache.counts()
+    else:
+        # Read the maintained fluency counters (one document) instead of streaming every word
+        counts = get_fluency_counts(db, user_id, lang_pair)
+    stats = pd.Series(counts).reindex(FLUENCY_LEVELS)
     stats = stats[stats > 0].reset_index()
     stats.columns = ['Fluency', 'Count']
     return stats
@@ -47,8 +55,9 @@ def plot_fluency_stats(stats, title='Vocabulary by Fluency Level'):
     st.pyplot(fig)
 
 def app():
+    # One Firestore client per worker process, shared by every session
     if 'db' not in st.session_state:
-        st.session_state.db = firestore.client()
+        st.session_state.db = get_db()
     
     if 'username' not in st.session_state or not st.session_state.username:
         st.error("Please log in to view statistics.")
@@ -58,12 +67,17 @@ def app():
     target_language = st.session_state.get("target_language", "fr")
     lang_pair = f"{native_language}-{target_language}"
 
-    stats = fetch_vocabulary_stats(st.session_state.username, lang_pair, st.session_state.db)
+    with span('progress.stats'):
+        stats = fetch_vocabulary_stats(st.session_state.username, lang_pair, st.session_state.db)
+    pending = get_write_queue().status(st.session_state.username, lang_pair).pending
+    if pending:
+        st.caption(f"{pending} recent changes are still being saved and may not be counted yet.")
     
     if not stats.empty:
         # Include the target language in the title
         title = f'Vocabulary by Fluency Level for {target_language.upper()}'
-        plot_fluency_stats(stats, title)
+        with span('progress.plot'):
+            plot_fluency_stats(stats, title)
     else:
         st.write("No vocabulary data available for statistics.")
 
@@ -0,0 +1,50 @@
+"""
+One-time backfill (and periodic repair) of the per-language-pair fluency counters.
+
+Recounts every user's vocabulary with server-side aggregation queries and overwrites
+the `fluency_counts` field of each `users/{id}/vocabulary/{pair}` document.
+With --schedule, words added before flashcard scheduling existed are also made
+due for review; the app otherwise does this the first time a flashcard session
+starts for the vocabulary. Uses the Firebase credentials from `.streamlit/secrets.toml`, like the app.
+
+    python reconcile_counters.py              # every user
+    python reconcile_counters.py alice bob    # only these users
+    python reconcile_counters.py --schedule   # also backfill review schedules
+"""
+import argparse
+
+from resources import get_db
+from vocabulary import backfill_schedule, reconcile_fluency_counts
+
+
+def reconcile_user(db, user_id):
+    """
+    Reconcile the fluency counters of every language pair of one user.
+
+    :param db: A Firestore client instance.
+    :param user_id: The ID of the user to reconcile.
+    :return: A dictionary mapping each language pair to its recounted fluency counts.
+    """
+    vocabulary = db.collection('users').document(user_id).collection('vocabulary')
+    # list_documents() also returns pair documents that only exist as parents of words.
+    return {pair_ref.id: reconcile_fluency_counts(db, user_id, pair_ref.id) for pair_ref in vocabulary.list_documents()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('users', nargs='*', help='User IDs to reconcile (default: all users)')
+    parser.add_argument('--schedule', action='store_true', help='Also give unscheduled words a review schedule')
+    args = parser.parse_args()
+
+    db = get_db()
+
+    user_ids = args.users or [user_ref.id for user_ref in db.collection('users').list_documents()]
+    for user_id in user_ids:
+        for lang_pair, counts in reconcile_user(db, user_id).items():
+            print(f"{user_id} {lang_pair}: {counts}")
+            if args.schedule:
+                print(f"{user_id} {lang_pair}: scheduled {backfill_schedule(db, user_id, lang_pair)} words")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import json
+import os
+import threading
+
+import firebase_admin
+import requests
+import streamlit as st
+from firebase_admin import credentials
+from firebase_admin import firestore
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+########################################
+#     Process-wide shared resources    #
+########################################
+
+# (connect, read) timeouts in seconds for outgoing HTTP requests.
+HTTP_TIMEOUT = (float(os.getenv('HTTP_CONNECT_TIMEOUT', 5)), float(os.getenv('HTTP_READ_TIMEOUT', 15)))
+# Keep-alive connections kept open per host, shared by every session in the worker.
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 20))
+
+_lock = threading.Lock()
+_db = None
+_http = None
+
+
+class TimeoutSession(requests.Session):
+    """A requests Session that applies `HTTP_TIMEOUT` to every request that doesn't set its own."""
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', HTTP_TIMEOUT)
+        return super().request(method, url, **kwargs)
+
+
+def _initialize_firebase():
+    firebase_credentials_json = st.secrets['FIREBASE_CREDENTIALS_PATH']
+
+    try:
+        firebase_credentials_dict = json.loads(firebase_credentials_json)
+        cred = credentials.Certificate(firebase_credentials_dict)
+        firebase_admin.initialize_app(cred)
+    except json.JSONDecodeError:
+        raise EnvironmentError("Invalid JSON format for Firebase credentials.")
+    except KeyError:
+        raise EnvironmentError("Firebase credentials not set in Streamlit secrets.")
+    except Exception as e:
+        raise EnvironmentError(f"Error initializing Firebase: {str(e)}")
+
+
+def get_db():
+    """
+    Return the Firestore client shared by every session in this worker process.
+
+    Firebase is initialized from the `FIREBASE_CREDENTIALS_PATH` Streamlit secret
+    the first time this is called.
+
+    :raises EnvironmentError: If the Firebase credentials are missing or invalid.
+    :return: A Firestore client instance.
+    """
+    global _db
+    if _db is None:
+        with _lock:
+            if _db is None:
+                if not firebase_admin._apps:
+                    _initialize_firebase()
+                _db = firestore.client()
+    return _db
+
+
+def get_http_session():
+    """
+    Return the HTTP session shared by every session in this worker process.
+
+    Connections are kept alive and pooled per host (up to `HTTP_POOL_SIZE`), every
+    request gets the `HTTP_TIMEOUT` unless it sets its own, and connection errors
+    on idempotent requests are retried.
+
+    :return: A `requests.Session`.
+    """
+    global _http
+    if _http is None:
+        with _lock:
+            if _http is None:
+                session = TimeoutSession()
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_POOL_SIZE,
+                    pool_maxsize=HTTP_POOL_SIZE,
+                    max_retries=Retry(total=2, connect=2, read=0, backoff_factor=0.3, allowed_methods=['GET', 'HEAD']),
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _http = session
+    return _http
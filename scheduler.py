@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta, timezone
+
+from firebase_admin import firestore
+
+from telemetry import span
+
+########################################
+#     Spaced-repetition scheduling     #
+########################################
+
+# Word fields used by the scheduler.
+NEXT_REVIEW_FIELD = 'next_review'
+EASE_FIELD = 'ease'
+INTERVAL_FIELD = 'interval_days'
+REVIEW_ID_FIELD = 'last_review_id'
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+
+# SM-2 recall quality (0-5) for each fluency level chosen on a flashcard.
+QUALITY = {"1-new": 1, "2-recognized": 2, "3-familiar": 3, "4-learned": 4, "5-known": 5}
+# Words rated below this quality are shown again soon instead of being spaced out.
+PASSING_QUALITY = 3
+RELEARN_DELAY = timedelta(minutes=10)
+
+
+def initial_schedule():
+    """
+    Return the scheduling fields for a newly added word, which is due immediately.
+
+    :return: A dictionary of Firestore fields.
+    """
+    return {NEXT_REVIEW_FIELD: firestore.SERVER_TIMESTAMP, EASE_FIELD: DEFAULT_EASE, INTERVAL_FIELD: 0}
+
+
+def next_schedule(fluency, ease=DEFAULT_EASE, interval_days=0, now=None):
+    """
+    Compute when a word should be reviewed next after a flashcard review (SM-2).
+
+    :param fluency: The fluency level chosen for the word during the review.
+    :param ease: The word's current ease factor.
+    :param interval_days: The word's current review interval in days.
+    :param now: The time of the review (defaults to the current UTC time).
+    :return: A dictionary with the new `next_review`, `ease` and `interval_days` fields.
+    """
+    now = now or datetime.now(timezone.utc)
+    quality = QUALITY[fluency]
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+
+    if quality < PASSING_QUALITY:
+        return {NEXT_REVIEW_FIELD: now + RELEARN_DELAY, EASE_FIELD: ease, INTERVAL_FIELD: 0}
+    if interval_days < 1:
+        interval_days = 1
+    elif interval_days < 6:
+        interval_days = 6
+    else:
+        interval_days = round(interval_days * ease)
+    return {NEXT_REVIEW_FIELD: now + timedelta(days=interval_days), EASE_FIELD: ease, INTERVAL_FIELD: interval_days}
+
+
+def due_words(collection, fluency, limit=10, now=None):
+    """
+    Fetch the words at a fluency level that are due for review, most overdue first.
+
+    Runs one indexed, ordered and limited query (see `firestore.indexes.json`), so it
+    reads at most `limit` documents regardless of the vocabulary size.
+
+    :param collection: The user's words collection (see `vocabulary.words_collection`).
+    :param fluency: The fluency level to study.
+    :param limit: Maximum number of words to return.
+    :param now: Words due at or before this time are returned (defaults to the current UTC time).
+    :return: A list of dictionaries with 'Word' and 'Fluency' keys.
+    """
+    now = now or datetime.now(timezone.utc)
+    query = (collection
+             .where(filter=firestore.FieldFilter('fluency', '==', fluency))
+             .where(filter=firestore.FieldFilter(NEXT_REVIEW_FIELD, '<=', now))
+             .order_by(NEXT_REVIEW_FIELD)
+             .limit(limit))
+    with span('firestore.query', query='due_words'):
+        return [{'Word': doc.id, 'Fluency': fluency} for doc in query.stream()]
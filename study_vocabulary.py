@@ -1,15 +1,59 @@
 import streamlit as st
 import pandas as pd
-from reverso_context_api import Client
-from gtts import gTTS
 import io
-import random
-from firebase_admin import firestore  # Now needed for updates
+from translation import get_engine
+from resources import get_db
+import uuid
+from scheduler import due_words
+from telemetry import span
+from tts_cache import get_store as get_audio_store
+from vocabulary import FLUENCY_LEVELS, ensure_schedule, words_collection
+from vocabulary_browser import COLUMNS, SORTS, VocabularyBrowser
+from vocabulary_cache import get_cache
+from vocabulary_io import export_vocabulary, format_of, import_vocabulary, read_entries
+from write_queue import get_write_queue
 
-def fetch_vocabulary_once(user_id, lang_pair, db):
-    words_collection = db.collection('users').document(user_id).collection('vocabulary').document(lang_pair).collection('words')
-    vocab = [{'Word': doc.id, 'Fluency': doc.to_dict().get('fluency', '1-new')} for doc in words_collection.stream()]
-    return pd.DataFrame(vocab)
+FLASHCARDS_PER_SESSION = 10
+
+def get_browser(user_id, lang_pair):
+    # One browser per session, started over when the user or language pair changes
+    browser = st.session_state.get('vocabulary_browser')
+    if browser is None or (browser.user_id, browser.lang_pair) != (user_id, lang_pair):
+        browser = st.session_state.vocabulary_browser = VocabularyBrowser(user_id, lang_pair)
+    return browser
+
+def browse_vocabulary(browser, db):
+    """
+    Show one page of the vocabulary with fluency, search and sort controls.
+
+    Each page is one small Firestore query; the next page is prefetched while this one is shown.
+    Fluency levels still in the write queue are shown over the saved ones.
+
+    :param browser: The session's `VocabularyBrowser`.
+    :param db: A Firestore client instance.
+    """
+    fluency_col, search_col, sort_col = st.columns(3)
+    fluency = fluency_col.selectbox("Fluency", ["All"] + FLUENCY_LEVELS, key='browse_fluency')
+    prefix = search_col.text_input("Word starts with", key='browse_prefix')
+    sort = sort_col.selectbox("Sort by", list(SORTS), key='browse_sort')
+    filters = browser.set_filters(None if fluency == "All" else fluency, prefix, sort)
+    if filters[2] != sort:
+        st.caption("Search results are sorted by word.")
+
+    with span('study.fetch_vocabulary', page=browser.page_index):
+        page = browser.page(db, get_write_queue().queued_levels(browser.user_id, browser.lang_pair))
+    if not page.rows:
+        if filters[:2] == (None, ''):
+            st.write("Your vocabulary list is empty. Start learning new words!")
+        else:
+            st.write("No words match.")
+        return
+
+    st.dataframe(pd.DataFrame(page.rows, columns=COLUMNS), hide_index=True, use_container_width=True)
+    previous_col, page_col, next_col = st.columns([1, 4, 1])
+    previous_col.button("Previous", on_click=browser.previous, disabled=browser.page_index == 0, key='browse_previous')
+    page_col.caption(f"Page {browser.page_index + 1}")
+    next_col.button("Next", on_click=browser.next, disabled=not page.has_next, key='browse_next')
 
 def display_vocabulary():
     if 'username' not in st.session_state or not st.session_state.username:
@@ -20,51 +64,151 @@ def display_vocabulary():
     target_language = st.session_state.get("target_language", "fr")
     lang_pair = f"{native_language}-{target_language}"
 
-    if 'vocabulary_df' not in st.session_state:
-        st.session_state.vocabulary_df = fetch_vocabulary_once(st.session_state.username, lang_pair, st.session_state.db)
+    manage_vocabulary(st.session_state.username, lang_pair, st.session_state.db)
 
-    if st.session_state.vocabulary_df.empty:
-        st.write("Your vocabulary list is empty. Start learning new words!")
-    else:
-        with st.expander(f"View your {native_language}-{target_language} Vocabulary (downloadable as .csv by hovering over the table then clicking download icon in top right)"):
-            st.dataframe(st.session_state.vocabulary_df, use_container_width=True)
-        with st.expander("Flashcard instructions"):
-            st.text("Select the fluency level of words you would like to study. If you are just starting on LanguageBuddy, this will be '1-new'. Click Begin Flashcard Session and 10 flashcards will be generated below from randomly selected words in your vocabulary of that fluency type. You can practice your pronunciation by listening to the audio clip. When you want to see the answer, hit Show translation. To update the fluency level for the word, select one of the radio buttons. After the last flashcard, you will see an Update Fluency button. Press it to update your personal vocabulary list in the cloud. (note this will not update the dataset shown above, only your data in the cloud.)")
-            st.text("A note about missing translations - LanguageBuddy uses the Reverso Context API to get translations. However, these translations are not available for special words like pronouns, prepositions, etc. that need more explanation. We are currently working on a solution to get translations for these words.")
-
-@st.cache_data
-def get_translation(text):
-    native_language=st.session_state.get("native_language","en")
-    target_language=st.session_state.get("target_language")
-    client = Client(target_language, native_language)
-    return list(client.get_translations(text))
-
-@st.cache_data
-# def get_pronunciation(word, language=st.session_state.get("target_language", "fr")):
-def get_pronunciation(word):
-    language=st.session_state.get("target_language")
-    tts = gTTS(text=word, lang=language, slow=False)
-    audio_bytes = io.BytesIO()
-    tts.write_to_fp(audio_bytes)
-    audio_bytes.seek(0)
-    return audio_bytes
+    with st.expander(f"View your {native_language}-{target_language} Vocabulary"):
+        browse_vocabulary(get_browser(st.session_state.username, lang_pair), st.session_state.db)
+    with st.expander("Flashcard instructions"):
+        st.text("Select the fluency level of words you would like to study. If you are just starting on LanguageBuddy, this will be '1-new'. Click Begin Flashcard Session and up to 10 flashcards will be generated below from the words of that fluency type that are due for review, most overdue first. You can practice your pronunciation by listening to the audio clip. When you want to see the answer, hit Show translation. To update the fluency level for the word, select one of the radio buttons. After the last flashcard, you will see an Update Fluency button. Press it to update your personal vocabulary list in the cloud and the table above, and to schedule when each word comes up for review again.")
+        st.text("A note about missing translations - LanguageBuddy uses the Reverso Context API to get translations. However, these translations are not available for special words like pronouns, prepositions, etc. that need more explanation. We are currently working on a solution to get translations for these words.")
+
+def vocabulary_csv(user_id, lang_pair, db, progress=None):
+    # Written page by page as it is read, instead of from the whole table in session state
+    out = io.BytesIO()
+    text = io.TextIOWrapper(out, encoding='utf-8', newline='')
+    export_vocabulary(db, user_id, lang_pair, text, 'csv', progress=progress)
+    text.flush()
+    text.detach()
+    return out.getvalue()
+
+def manage_vocabulary(user_id, lang_pair, db):
+    """
+    Show the vocabulary download button and the import form.
+
+    Imports run before the vocabulary table is synced, so the table shows the imported words.
+
+    :param user_id: The ID of the user who owns the vocabulary.
+    :param lang_pair: String representing the language pair, e.g., "en-fr".
+    :param db: A Firestore client instance.
+    """
+    with st.expander("Import or export your vocabulary"):
+        # The export only runs when asked for, then stays ready for the download button
+        export = st.session_state.get('vocabulary_export')
+        if export is not None and export[0] != (user_id, lang_pair):
+            export = st.session_state.vocabulary_export = None
+        if st.button("Prepare export" if export is None else "Prepare export again", key='prepare_export'):
+            status = st.empty()
+            with span('study.export'):
+                data = vocabulary_csv(user_id, lang_pair, db, progress=lambda read: status.text(f"{read} words read..."))
+            status.empty()
+            export = st.session_state.vocabulary_export = ((user_id, lang_pair), data)
+        if export is not None:
+            st.download_button("Download vocabulary (.csv)", data=export[1],
+                               file_name=f"{user_id}-{lang_pair}-vocabulary.csv", mime='text/csv')
+        uploaded = st.file_uploader("Import words from a CSV or JSON lines file, or an Anki deck (.apkg, or .txt notes in plain text)",
+                                    type=['csv', 'jsonl', 'txt', 'apkg', 'colpkg'])
+        if st.button("Import words", disabled=uploaded is None):
+            status = st.empty()
+
+            def report(result):
+                status.text(f"{result.read} words read, {result.new} new, {result.updated} fluency levels set...")
+
+            try:
+                with span('study.import', file=uploaded.name):
+                    result = import_vocabulary(db, user_id, lang_pair, read_entries(uploaded, format_of(uploaded.name)), progress=report)
+            except Exception as e:
+                status.error(f"Import failed: {e}")
+                return
+            get_browser(user_id, lang_pair).refresh()
+            status.success(f"Imported {result.read} words: {result.new} new, {result.existing} already in your vocabulary, "
+                           f"{result.updated} fluency levels set.")
+            if result.failed:
+                st.warning(f"{result.failed} words could not be imported, e.g. " +
+                           ", ".join(f"'{word}' ({error})" for word, error in result.errors.items()))
+
+# Translations are cached per (language pair, word) on disk by the translation engine
+def get_translation(text, native_language, target_language):
+    return get_engine(native_language, target_language).translate(text)
+
+def get_translations(words, native_language, target_language):
+    # Look up every flashcard at once so the cards don't wait on each other
+    return get_engine(native_language, target_language).translate_many(words)
+
+# Clips are cached on disk per (language, word), shared by all sessions and restarts
+def get_pronunciation(word, language):
+    return get_audio_store().get(language, word)
+
+def get_pronunciations(words, language):
+    # Synthesize every missing flashcard clip at once so the cards don't wait on each other
+    return get_audio_store().get_many(language, words)
 
 def update_fluency(word, new_fluency):
     if 'fluency_changes' not in st.session_state:
         st.session_state.fluency_changes = {}
     st.session_state.fluency_changes[word] = new_fluency
 
+def save_reviews():
+    """
+    Queue the session's reviews, as the Update Fluency button's callback.
+    """
+    lang_pair = f"{st.session_state.get('native_language', 'en')}-{st.session_state.get('target_language', 'fr')}"
+    # Every card was reviewed, so every card is rescheduled, not only the changed ones
+    reviews = {card['Word']: st.session_state.fluency_changes.get(card['Word'], card['Fluency']) for card in st.session_state.flashcards}
+    with span('study.update_fluency', words=len(reviews)):
+        # Saved by the background flusher; pressing the button again only replaces the queued levels
+        get_write_queue().set_fluency(st.session_state.username, lang_pair, reviews, review_id=st.session_state.get('review_id'))
+    # The table shows the queued levels itself; progress and lesson scores read the cache
+    get_cache(st.session_state.username, lang_pair).apply(reviews)
+    changed = [card['Word'] for card in st.session_state.flashcards if reviews[card['Word']] != card['Fluency']]
+    st.session_state.fluency_update = (f"{len(reviews)} reviews scheduled; they are being saved in the background."
+                                       + (f" New fluency levels for: {', '.join(changed)}" if changed else " No fluency level changed."))
+
+@st.fragment
+def flashcard(i, word, translations, audio_bytes, native_language, target_language):
+    """
+    Render one flashcard as its own fragment, so clicking its fluency radio button
+    only reruns this card instead of the whole page.
+
+    :param i: The position of the card in the session.
+    :param word: A dictionary with the card's 'Word' and original 'Fluency'.
+    :param translations: The prefetched translations for the word, or None to look them up.
+    :param audio_bytes: The prefetched pronunciation clip, or None to synthesize it.
+    :param native_language: The language code translations are shown in.
+    :param target_language: The language code of the word.
+    """
+    # Use markdown for formatting the title with yellow color and larger font
+    st.markdown(f'<p style="color:green; font-size:24px;">Flashcard {i+1}: {word["Word"]}</p>', unsafe_allow_html=True)
+    audio_bytes = audio_bytes or get_pronunciation(word['Word'], target_language)
+    if audio_bytes:
+        st.audio(audio_bytes, format='audio/mp3')
+
+    # Use an expander for showing the translation
+    with st.expander("Show Translation"):
+        if translations is None:
+            translations = get_translation(word['Word'], native_language, target_language)
+        if translations:
+            st.write(f"Translation: {', '.join(translations[:3])}")
+        else:
+            st.write(f"No translations found for '{word['Word']}'.")
+
+    # Show radio buttons for fluency change from the start
+    new_fluency = st.radio("Fluency:", FLUENCY_LEVELS, index=FLUENCY_LEVELS.index(word['Fluency']), key=f"fluency_{i}")
+    if new_fluency != word['Fluency']:
+        update_fluency(word['Word'], new_fluency)
+    else:
+        # The radio was set back to the original level
+        st.session_state.get('fluency_changes', {}).pop(word['Word'], None)
+
 def app():
+    # One Firestore client per worker process, shared by every session
     if 'db' not in st.session_state:
-        st.session_state.db = firestore.client()
+        st.session_state.db = get_db()
     
     display_vocabulary()
     
-    fluency_levels = ["1-new", "2-recognized", "3-familiar", "4-learned", "5-known"]
-
     # Flashcard Session Start
     st.subheader(":orange[Flashcard Session]")
-    selected_fluency = st.selectbox("Select Fluency Level:", fluency_levels, index=0)
+    selected_fluency = st.selectbox("Select Fluency Level:", FLUENCY_LEVELS, index=0)
     start = st.button("Begin Flashcard Session")
 
     if 'flashcards' not in st.session_state:
@@ -74,38 +218,37 @@ def app():
         st.session_state.flashcards = []
         st.session_state.fluency_changes = {}
         
-        filtered_vocab = st.session_state.vocabulary_df[st.session_state.vocabulary_df['Fluency'] == selected_fluency]
-        if filtered_vocab.empty:
-            st.write(f"No words at the '{selected_fluency}' fluency level.")
+        # One indexed query for the (up to) 10 most overdue words at this level
+        lang_pair = f"{st.session_state.get('native_language', 'en')}-{st.session_state.get('target_language', 'fr')}"
+        # Words added before scheduling existed have no review date until this has run once
+        ensure_schedule(st.session_state.db, st.session_state.username, lang_pair)
+        due = due_words(words_collection(st.session_state.db, st.session_state.username, lang_pair), selected_fluency, limit=FLASHCARDS_PER_SESSION)
+        if not due:
+            st.write(f"No words at the '{selected_fluency}' fluency level are due for review.")
         else:
-            words_to_show = filtered_vocab.sample(min(10, len(filtered_vocab)))  # Randomly select up to 10 words
-            st.session_state.flashcards = words_to_show.to_dict('records')
+            st.session_state.flashcards = due
+            # Identifies this session's reviews so saving twice doesn't reschedule twice
+            st.session_state.review_id = uuid.uuid4().hex
 
  # Show flashcards only if they have been selected
     if st.session_state.flashcards:
+        native_language = st.session_state.get("native_language", "en")
+        target_language = st.session_state.get("target_language")
+        card_words = [word['Word'] for word in st.session_state.flashcards]
+        with span('study.translations', words=len(card_words)):
+            card_translations = get_translations(card_words, native_language, target_language)
+        with span('study.pronunciations', words=len(card_words)):
+            card_audio = get_pronunciations(card_words, target_language)
         for i, word in enumerate(st.session_state.flashcards):
-            # Use markdown for formatting the title with yellow color and larger font
-            st.markdown(f'<p style="color:green; font-size:24px;">Flashcard {i+1}: {word["Word"]}</p>', unsafe_allow_html=True)
-            audio_bytes = get_pronunciation(word['Word'])
-            st.audio(audio_bytes.getvalue())
-            
-            # Use an expander for showing the translation
-            with st.expander("Show Translation"):
-                translations = get_translation(word['Word'])
-                if translations:
-                    st.write(f"Translation: {', '.join(translations[:3])}")
-                else:
-                    st.write(f"No translations found for '{word['Word']}'.")
-            
-            # Show radio buttons for fluency change from the start
-            new_fluency = st.radio("Fluency:", fluency_levels, index=fluency_levels.index(word['Fluency']), key=f"fluency_{i}")
-            if new_fluency != word['Fluency']:
-                update_fluency(word['Word'], new_fluency)
+            flashcard(i, word, card_translations.get(word['Word']), card_audio.get(word['Word']), native_language, target_language)
 
         if st.session_state.flashcards:
-            if st.button("Update Fluency"):
-                db = st.session_state.db
-                for word, new_fluency in st.session_state.fluency_changes.items():
-                    doc_ref = db.collection('users').document(st.session_state.username).collection('vocabulary').document(f"{st.session_state.get('native_language', 'en')}-{st.session_state.get('target_language', 'fr')}").collection('words').document(word)
-                    doc_ref.update({'fluency': new_fluency})
-                st.success("Fluency levels updated successfully!")
+            # Queued before the page reruns, so the table above already shows the new levels
+            st.button("Update Fluency", on_click=save_reviews)
+            if st.session_state.get('fluency_update'):
+                st.success(st.session_state.pop('fluency_update'))
+            status = get_write_queue().status(st.session_state.username, f"{st.session_state.get('native_language', 'en')}-{st.session_state.get('target_language', 'fr')}")
+            if status.pending:
+                st.caption(f"{status.pending} changes are still being saved.")
+            if status.failed:
+                st.error("Could not update: " + ', '.join(f"{word} ({error})" for word, error in status.errors.items()))
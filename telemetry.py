@@ -0,0 +1,220 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from contextvars import ContextVar, copy_context
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+########################################
+#     Tracing spans and timing metrics #
+########################################
+
+# Spans are only recorded when tracing is switched on; otherwise `span` is a shared no-op.
+ENABLED = os.getenv('LANGUAGEBUDDY_TRACING', '').lower() in ('1', 'true', 'on')
+# Port of the Prometheus text metrics endpoint, or 0 to not serve it.
+METRICS_PORT = int(os.getenv('LANGUAGEBUDDY_METRICS_PORT', 0))
+# Upper bounds in seconds of the latency histogram buckets.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+logger = logging.getLogger('languagebuddy.trace')
+if ENABLED and not logger.handlers:
+    # One JSON object per line on stderr, ready for a log shipper.
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+Span = namedtuple('Span', ['name', 'start', 'duration', 'error', 'tags'])
+
+_tags = ContextVar('trace_tags', default={})
+_rerun = ContextVar('trace_rerun', default=None)
+
+
+def user_hash(user_id):
+    """
+    Return a short, stable pseudonym for a user, so traces never carry usernames.
+    """
+    return hashlib.sha256(user_id.encode('utf-8')).hexdigest()[:12] if user_id else ''
+
+
+def set_tags(page=None, user_id=None, lang_pair=None):
+    """
+    Tag every span recorded from now on in this thread (and in work it hands off with `in_context`).
+
+    :param page: The module name of the page being rendered.
+    :param user_id: The logged-in user; only a hash of it is recorded.
+    :param lang_pair: String representing the language pair, e.g., "en-fr".
+    """
+    if ENABLED:
+        _tags.set({'page': page or '', 'user': user_hash(user_id), 'lang_pair': lang_pair or ''})
+
+
+def start_rerun():
+    """
+    Start collecting the spans of one script rerun.
+
+    :return: The list the spans will be appended to, or None when tracing is off.
+    """
+    if not ENABLED:
+        return None
+    spans = []
+    _rerun.set((time.perf_counter(), spans))
+    return spans
+
+
+def in_context(func):
+    """
+    Wrap `func` so that, run on another thread, its spans keep the caller's tags and rerun.
+    """
+    if not ENABLED:
+        return func
+    context = copy_context()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        # A context can only be entered by one thread at a time, so each call runs in its own copy.
+        return context.copy().run(func, *args, **kwargs)
+
+    return wrapper
+
+
+class _Histograms:
+    """Per-(span, page, language pair, outcome) latency histograms, shared by every session."""
+
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, tags, duration, error):
+        key = (name, tags.get('page', ''), tags.get('lang_pair', ''), 'error' if error else 'ok')
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(BUCKETS), 0.0, 0]
+            for i, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    series[0][i] += 1
+            series[1] += duration
+            series[2] += 1
+
+    def render(self):
+        lines = [
+            '# HELP languagebuddy_span_seconds Time spent in external calls and pipeline stages.',
+            '# TYPE languagebuddy_span_seconds histogram',
+        ]
+        with self._lock:
+            series = sorted((key, ([*buckets], total, count)) for key, (buckets, total, count) in self._series.items())
+        for (name, page, lang_pair, outcome), (buckets, total, count) in series:
+            labels = f'span="{name}",page="{page}",lang_pair="{lang_pair}",outcome="{outcome}"'
+            for bound, value in zip(BUCKETS, buckets):
+                lines.append(f'languagebuddy_span_seconds_bucket{{{labels},le="{bound}"}} {value}')
+            lines.append(f'languagebuddy_span_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'languagebuddy_span_seconds_sum{{{labels}}} {total:.6f}')
+            lines.append(f'languagebuddy_span_seconds_count{{{labels}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+histograms = _Histograms()
+
+
+class _ActiveSpan:
+    __slots__ = ('name', 'tags', 'start')
+
+    def __init__(self, name, tags):
+        self.name = name
+        self.tags = tags
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        duration = time.perf_counter() - self.start
+        tags = {**_tags.get(), **self.tags}
+        error = exc_type.__name__ if exc_type is not None else None
+        histograms.observe(self.name, tags, duration, error)
+        rerun = _rerun.get()
+        if rerun is not None:
+            rerun_start, spans = rerun
+            spans.append(Span(self.name, self.start - rerun_start, duration, error, tags))
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({'span': self.name, 'duration_ms': round(duration * 1000, 3), 'error': error, **tags}))
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name, **tags):
+    """
+    Time a block as a named span: `with span('reverso.get_translations', words=10): ...`.
+
+    The span is added to the latency histograms, logged as one JSON line on the
+    `languagebuddy.trace` logger and, inside a rerun, to the rerun's timing breakdown.
+    When tracing is off this returns a shared no-op context manager.
+
+    :param name: Dotted span name, e.g. 'firestore.commit' or 'learn.render'.
+    :param tags: Extra tags recorded with the span, on top of the page, user and language pair.
+    """
+    if not ENABLED:
+        return _NOOP
+    return _ActiveSpan(name, tags)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = histograms.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_started = False
+_server_lock = threading.Lock()
+
+
+def serve_metrics(port=METRICS_PORT):
+    """
+    Serve the histograms as Prometheus text on `http://0.0.0.0:<port>/metrics`, once per process.
+
+    :param port: The port to listen on; 0 does nothing.
+    :return: The running server, or None if metrics are not served.
+    """
+    global _server, _server_started
+    if not port or not ENABLED:
+        return None
+    with _server_lock:
+        if not _server_started:
+            _server_started = True
+            try:
+                _server = ThreadingHTTPServer(('0.0.0.0', port), _MetricsHandler)
+            except OSError as e:
+                # Another worker process on this host already serves the port.
+                logger.warning('Metrics endpoint not started on port %s: %s', port, e)
+                return None
+            threading.Thread(target=_server.serve_forever, name='metrics', daemon=True).start()
+    return _server
@@ -0,0 +1,71 @@
+import re
+from collections import Counter, namedtuple
+
+########################################
+#     Transcript tokenizer             #
+########################################
+
+# Lines that are not speech and should not be shown or learned.
+SKIPPED_LINES = frozenset(['[Music]'])
+
+_TOKEN = re.compile(r'\S+')
+# Everything except word characters, whitespace and apostrophes (so "l'homme" stays intact).
+_PUNCTUATION = re.compile(r"[^\w\s']+")
+
+Token = namedtuple('Token', ['surface', 'normalized', 'line', 'offset'])
+
+
+def normalize(word):
+    """
+    Remove punctuation except apostrophes from a word and convert it to lowercase.
+
+    :param word: A word as it appears in the transcript.
+    :return: The normalized form used for vocabulary and translation lookups.
+    """
+    return _PUNCTUATION.sub('', word).lower()
+
+
+def tokenize_transcript(transcript):
+    """
+    Tokenize a transcript in a single pass.
+
+    Lines in `SKIPPED_LINES` are ignored, as are tokens that are only punctuation.
+
+    :param transcript: A list of dictionaries with a 'text' key, as returned by `get_transcription`.
+    :return: A generator of `Token(surface, normalized, line, offset)`, where `line` is the
+             index of the transcript line and `offset` the character offset of the token in it.
+    """
+    # Surface forms repeat a lot in speech, so each distinct one is only cleaned once.
+    normalized_forms = {}
+    for line_index, line in enumerate(transcript):
+        text = line["text"]
+        if text in SKIPPED_LINES:
+            continue
+        for match in _TOKEN.finditer(text):
+            surface = match.group()
+            normalized = normalized_forms.get(surface)
+            if normalized is None:
+                normalized = normalized_forms[surface] = _PUNCTUATION.sub('', surface).lower()
+            if normalized:
+                yield Token(surface, normalized, line_index, match.start())
+
+
+def count_words(transcript):
+    """
+    Count the normalized words of a transcript, as `tokenize_transcript` would yield them.
+
+    Surface forms are counted in one pass over the joined text and each distinct one
+    is normalized once, which is faster than counting the token stream
+    (see `benchmarks/bench_comprehension.py`).
+
+    :param transcript: A list of dictionaries with a 'text' key.
+    :return: A `Counter` mapping normalized words to their number of tokens.
+    """
+    # Tokens never span whitespace, so joining lines with newlines keeps them apart.
+    surfaces = Counter(_TOKEN.findall('\n'.join(line["text"] for line in transcript if line["text"] not in SKIPPED_LINES)))
+    counts = Counter()
+    for surface, count in surfaces.items():
+        normalized = _PUNCTUATION.sub('', surface).lower()
+        if normalized:
+            counts[normalized] += count
+    return counts
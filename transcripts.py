@@ -0,0 +1,120 @@
+import json
+import os
+import zlib
+from urllib.parse import parse_qs, urlparse
+
+from youtube_transcript_api import (
+    InvalidVideoId,
+    NoTranscriptAvailable,
+    NoTranscriptFound,
+    TranscriptsDisabled,
+    VideoUnavailable,
+    YouTubeTranscriptApi,
+)
+
+from disk_cache import DiskCache
+from telemetry import span
+
+########################################
+#     Shared transcript cache          #
+########################################
+
+MAX_BYTES = int(os.getenv('TRANSCRIPT_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+# Captions can be added to a video later, so "no captions" answers expire.
+MISSING_TTL = float(os.getenv('TRANSCRIPT_MISSING_TTL', 24 * 60 * 60))
+MAX_MISSING_ENTRIES = 100_000
+
+# Errors that say the transcript does not exist, as opposed to transient failures.
+MISSING_ERRORS = (InvalidVideoId, NoTranscriptAvailable, NoTranscriptFound, TranscriptsDisabled, VideoUnavailable)
+
+
+class TranscriptUnavailable(Exception):
+    """Raised when a video has no transcript in the requested language."""
+
+
+def extract_video_id(youtube_url):
+    """
+    Extract the canonical video ID from any common form of YouTube URL.
+
+    Handles `youtube.com/watch?v=`, `youtu.be/`, `/shorts/`, `/embed/` and `/live/`
+    links, with or without extra query parameters such as `&t=` or `&list=`.
+
+    :param youtube_url: A string representing the URL of the YouTube video.
+    :return: The 11-character video ID, or None if none could be found.
+    """
+    parsed = urlparse(youtube_url.strip())
+    if not parsed.netloc:
+        parsed = urlparse('https://' + youtube_url.strip())
+    host = parsed.netloc.lower()
+    path_parts = [part for part in parsed.path.split('/') if part]
+
+    if host.endswith('youtu.be'):
+        video_id = path_parts[0] if path_parts else None
+    elif path_parts and path_parts[0] in ('shorts', 'embed', 'live', 'v') and len(path_parts) > 1:
+        video_id = path_parts[1]
+    else:
+        video_id = parse_qs(parsed.query).get('v', [None])[0]
+    return video_id or None
+
+
+class TranscriptStore:
+    """
+    Transcripts cached on disk, keyed by (video ID, language code).
+
+    Transcripts are stored zlib-compressed in a size-bounded LRU store shared by
+    every worker process. Videos without captions in a language are remembered
+    for `MISSING_TTL` seconds, so they are not refetched either.
+
+    :param cache: The `DiskCache` holding transcripts.
+    :param missing: The `DiskCache` holding "no transcript" answers.
+    """
+
+    def __init__(self, cache=None, missing=None):
+        self.cache = cache if cache is not None else DiskCache('transcripts', max_bytes=MAX_BYTES)
+        self.missing = missing if missing is not None else DiskCache('transcripts_missing', ttl=MISSING_TTL, max_entries=MAX_MISSING_ENTRIES)
+
+    @staticmethod
+    def _key(video_id, language):
+        return f'{video_id}:{language}'
+
+    def get(self, video_id, language):
+        """
+        Return the transcript for a video, fetching it from YouTube only on a cache miss.
+
+        :param video_id: The canonical YouTube video ID.
+        :param language: The language code of the transcript.
+        :raises TranscriptUnavailable: If the video has no transcript in `language`.
+        :return: A list of dictionaries with 'text', 'start', and 'duration' keys.
+        """
+        key = self._key(video_id, language)
+        compressed = self.cache.get(key)
+        if compressed is not None:
+            return json.loads(zlib.decompress(compressed))
+
+        reason = self.missing.get(key)
+        if reason is not None:
+            raise TranscriptUnavailable(reason)
+
+        try:
+            with span('youtube.get_transcript'):
+                transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=[language])
+        except MISSING_ERRORS as e:
+            reason = f"No '{language}' transcript available for video {video_id} ({type(e).__name__})."
+            self.missing.set(key, reason)
+            raise TranscriptUnavailable(reason) from e
+
+        self.cache.set(key, zlib.compress(json.dumps(transcript).encode('utf-8')))
+        return transcript
+
+
+_store = None
+
+
+def get_store():
+    """
+    Return the process-wide transcript store, opening it on first use.
+    """
+    global _store
+    if _store is None:
+        _store = TranscriptStore()
+    return _store
@@ -0,0 +1,190 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from reverso_context_api import Client
+
+from local_dictionary import get_dictionary
+from telemetry import in_context, span
+from translation_store import get_store
+
+########################################
+#     Concurrent translation engine    #
+########################################
+
+MAX_WORKERS = int(os.getenv('TRANSLATION_MAX_WORKERS', 8))
+REQUESTS_PER_SECOND = float(os.getenv('TRANSLATION_REQUESTS_PER_SECOND', 10))
+TIMEOUT = float(os.getenv('TRANSLATION_TIMEOUT', 20))
+
+
+class RateLimiter:
+    """
+    Spread calls evenly so that no more than `rate` calls start per second.
+
+    A rate of 0 or less disables the limit.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class TranslationEngine:
+    """
+    Look up Reverso Context translations for many words at once.
+
+    Words found in the local dictionary (see `local_dictionary`) or the translation
+    store are answered locally. The remaining lookups run on the engine's own thread
+    pool, share one rate limit, and are bounded by an overall timeout; words that do
+    not resolve in time are left out of the result.
+
+    :param native_language: The language code translations are returned in.
+    :param target_language: The language code of the words being translated.
+    :param max_workers: Number of lookups running at the same time, across every call to the engine.
+    :param requests_per_second: Maximum number of Reverso requests started per second.
+    :param timeout: Seconds to wait for a batch of lookups before returning partial results.
+    :param store: A `TranslationStore` caching results, or None to always call Reverso.
+    :param dictionary: A `LocalDictionary` from the target to the native language, or None.
+    """
+
+    def __init__(self, native_language, target_language, max_workers=MAX_WORKERS,
+                 requests_per_second=REQUESTS_PER_SECOND, timeout=TIMEOUT, store=None, dictionary=None):
+        self.native_language = native_language
+        self.target_language = target_language
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.store = store
+        self.dictionary = dictionary
+        self._local = threading.local()
+        # Shared by every call, so the per-thread Reverso clients are reused and
+        # concurrent sessions don't start more than `max_workers` lookups.
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='reverso')
+
+    def _client(self):
+        # Reverso clients hold a requests session, so each worker thread gets its own.
+        if not hasattr(self._local, 'client'):
+            self._local.client = Client(self.target_language, self.native_language)
+        return self._local.client
+
+    def _lookup(self, word):
+        self.rate_limiter.acquire()
+        with span('reverso.get_translations'):
+            return list(self._client().get_translations(word))
+
+    def _cached(self, words):
+        found = {}
+        if self.dictionary is not None:
+            with span('dictionary.lookup_many', words=len(words)):
+                found = self.dictionary.lookup_many(words)
+        missing = [word for word in words if word not in found]
+        if self.store is not None and missing:
+            with span('translation_store.get_many', words=len(missing)):
+                found.update(self.store.get_many(self.target_language, self.native_language, missing))
+        return found
+
+    def _remember(self, translations):
+        if self.store is not None and translations:
+            self.store.set_many(self.target_language, self.native_language, translations)
+
+    def translate(self, word):
+        """
+        Translate a single word.
+
+        :param word: The word or phrase to translate.
+        :return: A list of translation strings.
+        """
+        cached = self._cached([word])
+        if word in cached:
+            return cached[word]
+        translations = self._lookup(word)
+        self._remember({word: translations})
+        return translations
+
+    def translate_many(self, words, timeout=None):
+        """
+        Translate many words concurrently.
+
+        Words whose lookup fails or does not finish within `timeout` seconds are
+        omitted, so callers should use `.get(word, [])` on the result.
+
+        :param words: An iterable of words to translate.
+        :param timeout: Seconds to wait for the lookups, or None for the engine's `timeout`.
+        :return: A dictionary mapping each resolved word to its list of translations.
+        """
+        translations = {}
+        for resolved in self.translate_stream(words, timeout):
+            translations.update(resolved)
+        return translations
+
+    def translate_stream(self, words, timeout=None):
+        """
+        Translate many words concurrently, yielding results as they arrive.
+
+        Words found in the local dictionary or the store are yielded first in a single
+        dictionary, then each looked up word as soon as its lookup finishes. Lookups
+        are started in the order of `words`, so earlier words tend to resolve first.
+        The stream ends after `timeout` seconds even if some lookups are still running.
+
+        :param words: An iterable of words to translate.
+        :param timeout: Seconds to wait for the lookups, or None for the engine's `timeout`.
+        :return: A generator of dictionaries mapping resolved words to their lists of translations.
+        """
+        words = list(dict.fromkeys(words))
+        cached = self._cached(words)
+        if cached:
+            yield cached
+        missing = [word for word in words if word not in cached]
+        if not missing:
+            return
+
+        fetched = {}
+        futures = {}
+        try:
+            lookup = in_context(self._lookup)
+            futures = {self._executor.submit(lookup, word): word for word in missing}
+            for future in as_completed(futures, timeout=self.timeout if timeout is None else timeout):
+                if future.exception() is None:
+                    word = futures[future]
+                    fetched[word] = future.result()
+                    yield {word: fetched[word]}
+        except TimeoutError:
+            return
+        finally:
+            # Do not block on lookups that are still running past the deadline,
+            # and free the shared workers from the ones that haven't started.
+            for future in futures:
+                future.cancel()
+            self._remember(fetched)
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(native_language, target_language):
+    """
+    Return the process-wide translation engine for a language pair.
+
+    :param native_language: The language code translations are returned in.
+    :param target_language: The language code of the words being translated.
+    :return: A shared `TranslationEngine`.
+    """
+    key = (native_language, target_language)
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = TranslationEngine(native_language, target_language, store=get_store(),
+                                              dictionary=get_dictionary(target_language, native_language))
+        return _engines[key]
@@ -0,0 +1,79 @@
+import json
+import os
+
+from disk_cache import DiskCache
+
+########################################
+#     Persistent translation store     #
+########################################
+
+TTL = float(os.getenv('TRANSLATION_CACHE_TTL', 30 * 24 * 60 * 60))
+MAX_ENTRIES = int(os.getenv('TRANSLATION_CACHE_MAX_ENTRIES', 500_000))
+
+
+def normalize_word(word):
+    """
+    Normalize a word for use as a translation key.
+
+    :param word: The word as it appears in a transcript or vocabulary.
+    :return: The stripped, lowercased word.
+    """
+    return word.strip().lower()
+
+
+class TranslationStore:
+    """
+    Per-word translations persisted on disk and keyed by (source, target, normalized word).
+
+    Lookups for different videos share entries for the words they have in common,
+    and the store survives restarts and is shared by every worker process.
+    Words with no translations are cached too, as empty lists.
+
+    :param cache: The `DiskCache` to store translations in.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else DiskCache('translations', ttl=TTL, max_entries=MAX_ENTRIES)
+
+    @staticmethod
+    def _key(source, target, word):
+        return f'{source}:{target}:{normalize_word(word)}'
+
+    def get_many(self, source, target, words):
+        """
+        Return the cached translations for `words`.
+
+        :param source: The language code of the words.
+        :param target: The language code of the translations.
+        :param words: An iterable of words.
+        :return: A dictionary mapping each cached word (as given) to its list of translations.
+        """
+        keys = {word: self._key(source, target, word) for word in words}
+        found = self.cache.get_many(keys.values())
+        return {word: json.loads(found[key]) for word, key in keys.items() if key in found}
+
+    def set_many(self, source, target, translations):
+        """
+        Cache translations for several words.
+
+        :param source: The language code of the words.
+        :param target: The language code of the translations.
+        :param translations: A dictionary mapping words to lists of translations.
+        """
+        self.cache.set_many({
+            self._key(source, target, word): json.dumps(list(values))
+            for word, values in translations.items()
+        })
+
+
+_store = None
+
+
+def get_store():
+    """
+    Return the process-wide translation store, opening it on first use.
+    """
+    global _store
+    if _store is None:
+        _store = TranslationStore()
+    return _store
@@ -0,0 +1,101 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from gtts import gTTS
+
+from disk_cache import DiskCache
+from telemetry import in_context, span
+
+########################################
+#     Shared pronunciation audio cache #
+########################################
+
+MAX_BYTES = int(os.getenv('TTS_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+MAX_WORKERS = int(os.getenv('TTS_MAX_WORKERS', 10))
+
+
+def synthesize(text, language):
+    """
+    Generate spoken audio for a text with Google Text-to-Speech.
+
+    :param text: The word or phrase to pronounce.
+    :param language: The language code to pronounce it in.
+    :return: The MP3 audio as bytes.
+    """
+    tts = gTTS(text=text, lang=language, slow=False)
+    audio_bytes = io.BytesIO()
+    tts.write_to_fp(audio_bytes)
+    return audio_bytes.getvalue()
+
+
+def _traced_synthesize(text, language):
+    with span('gtts.synthesize'):
+        return synthesize(text, language)
+
+
+class AudioStore:
+    """
+    Pronunciation clips cached on disk, keyed by (language, normalized text).
+
+    The store is size-bounded with LRU eviction and shared by every session and
+    worker process, so each clip is synthesized once across restarts.
+
+    :param cache: The `DiskCache` holding the MP3 clips.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else DiskCache('pronunciations', max_bytes=MAX_BYTES)
+
+    @staticmethod
+    def _key(language, text):
+        return f'{language}:{text.strip().lower()}'
+
+    def get_many(self, language, texts, max_workers=MAX_WORKERS):
+        """
+        Return the clips for several texts, synthesizing all missing ones concurrently.
+
+        Texts whose synthesis fails are left out of the result.
+
+        :param language: The language code to pronounce the texts in.
+        :param texts: An iterable of words or phrases.
+        :param max_workers: Maximum number of concurrent Text-to-Speech requests.
+        :return: A dictionary mapping each text to its MP3 audio bytes.
+        """
+        keys = {text: self._key(language, text) for text in texts}
+        found = self.cache.get_many(keys.values())
+        clips = {text: found[key] for text, key in keys.items() if key in found}
+        missing = [text for text in keys if text not in clips]
+        if not missing:
+            return clips
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+            synthesize_one = in_context(_traced_synthesize)
+            futures = {text: executor.submit(synthesize_one, text, language) for text in missing}
+        synthesized = {text: future.result() for text, future in futures.items() if future.exception() is None}
+        self.cache.set_many({keys[text]: audio for text, audio in synthesized.items()})
+        clips.update(synthesized)
+        return clips
+
+    def get(self, language, text):
+        """
+        Return the clip for one text, synthesizing it on a cache miss.
+
+        :param language: The language code to pronounce the text in.
+        :param text: The word or phrase to pronounce.
+        :return: The MP3 audio as bytes, or None if synthesis failed.
+        """
+        return self.get_many(language, [text]).get(text)
+
+
+_store = None
+
+
+def get_store():
+    """
+    Return the process-wide pronunciation store, opening it on first use.
+    """
+    global _store
+    if _store is None:
+        _store = AudioStore()
+    return _store
@@ -0,0 +1,341 @@
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from firebase_admin import firestore
+from google.api_core import exceptions
+
+from scheduler import DEFAULT_EASE, EASE_FIELD, INTERVAL_FIELD, NEXT_REVIEW_FIELD, REVIEW_ID_FIELD, initial_schedule, next_schedule
+from telemetry import in_context, span
+
+########################################
+#     Firestore vocabulary helpers     #
+########################################
+
+FLUENCY_LEVELS = ["1-new", "2-recognized", "3-familiar", "4-learned", "5-known"]
+
+# Firestore rejects batches with more than 500 writes.
+MAX_BATCH_WRITES = 500
+# Number of documents fetched per multi-document read.
+READ_CHUNK_SIZE = 300
+MAX_WORKERS = 8
+
+# Field of the language pair document holding the number of words at each fluency level.
+COUNTS_FIELD = 'fluency_counts'
+# Server timestamp of the last write to a word, used for incremental syncs.
+UPDATED_FIELD = 'updated_at'
+# Field of the language pair document set once every word has a review schedule.
+SCHEDULED_FIELD = 'schedule_backfilled'
+
+# Retries of a failed commit, with exponential backoff starting at RETRY_BASE_DELAY seconds.
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 0.5
+TRANSIENT_ERRORS = (
+    exceptions.Aborted,
+    exceptions.DeadlineExceeded,
+    exceptions.InternalServerError,
+    exceptions.ResourceExhausted,
+    exceptions.ServiceUnavailable,
+    exceptions.TooManyRequests,
+)
+
+UpsertResult = namedtuple('UpsertResult', ['new', 'existing'])
+FluencyUpdateResult = namedtuple('FluencyUpdateResult', ['applied', 'failed'])
+
+
+def words_collection(db, user_id, lang_pair):
+    """
+    Return the Firestore collection holding a user's words for a language pair.
+
+    :param db: A Firestore client instance.
+    :param user_id: The ID of the user who owns the vocabulary.
+    :param lang_pair: String representing the language pair, e.g., "en-fr".
+    :return: A CollectionReference for `users/{user_id}/vocabulary/{lang_pair}/words`.
+    """
+    return vocabulary_document(db, user_id, lang_pair).collection('words')
+
+
+def vocabulary_document(db, user_id, lang_pair):
+    """
+    Return the Firestore document for a user's language pair, which holds the fluency counters.
+
+    :param db: A Firestore client instance.
+    :param user_id: The ID of the user who owns the vocabulary.
+    :param lang_pair: String representing the language pair, e.g., "en-fr".
+    :return: A DocumentReference for `users/{user_id}/vocabulary/{lang_pair}`.
+    """
+    return db.collection('users').document(user_id).collection('vocabulary').document(lang_pair)
+
+
+def chunked(iterable, size):
+    """
+    Split an iterable into lists of at most `size` items.
+
+    :param iterable: Any iterable.
+    :param size: Maximum number of items per chunk.
+    :return: A generator of lists.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _count_changes(increments):
+    """Return a merge-set payload that adds `increments` ({level: delta}) to the fluency counters."""
+    return {COUNTS_FIELD: {level: firestore.Increment(delta) for level, delta in increments.items() if delta}}
+
+
+def _insert_new_words(db, refs, counter_ref):
+    """Create the words of at most one batch that don't exist yet in a transaction and return how many were new."""
+
+    @firestore.transactional
+    def insert(transaction):
+        # Reading inside the transaction means a word created by another writer
+        # meanwhile is neither reset (keeping its level and schedule) nor counted twice.
+        existing = {snapshot.id for snapshot in transaction.get_all(refs) if snapshot.exists}
+        new_refs = [doc_ref for doc_ref in refs if doc_ref.id not in existing]
+        for doc_ref in new_refs:
+            transaction.set(doc_ref, {"fluency": "1-new", UPDATED_FIELD: firestore.SERVER_TIMESTAMP, **initial_schedule()})
+        # The counter moves in the same transaction as the words it counts.
+        if new_refs:
+            transaction.set(counter_ref, _count_changes({"1-new": len(new_refs)}), merge=True)
+        return len(new_refs)
+
+    with span('firestore.transaction', words=len(refs)):
+        return with_retry(lambda: insert(db.transaction()))
+
+
+def upsert_new_words(unique_words, user_id, db, lang_pair, batch_size=MAX_BATCH_WRITES, max_workers=MAX_WORKERS):
+    """
+    Add words to a user's vocabulary with a fluency of '1-new', leaving existing words untouched.
+
+    Words are checked and written in transactions of bounded size, each reading
+    its words with one multi-document read and creating only the missing ones, so
+    a word added concurrently by another session or worker is never overwritten
+    and the counters stay exact. Transactions run concurrently and are retried
+    with backoff, so the latency grows with the number of batches rather than the
+    number of words.
+
+    :param unique_words: An iterable of unique words to add to Firestore.
+    :param user_id: The ID of the user whose vocabulary is being updated.
+    :param db: A Firestore client instance.
+    :param lang_pair: String representing the language pair, e.g., "en-fr".
+    :param batch_size: Maximum number of writes per transaction (capped at 500).
+    :param max_workers: Maximum number of concurrent transactions.
+    :return: An `UpsertResult` with the number of new and already existing words.
+    """
+    collection = words_collection(db, user_id, lang_pair)
+    words = sorted({word for word in unique_words if isinstance(word, str) and word.strip()})
+    if not words:
+        return UpsertResult(new=0, existing=0)
+
+    counter_ref = vocabulary_document(db, user_id, lang_pair)
+    # One write per transaction is the counter update.
+    chunks = list(chunked([collection.document(word) for word in words], min(batch_size, MAX_BATCH_WRITES) - 1))
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+        # sum() re-raises the first transaction error, if any.
+        new = sum(executor.map(in_context(lambda chunk: _insert_new_words(db, chunk, counter_ref)), chunks))
+
+    return UpsertResult(new=new, existing=len(words) - new)
+
+
+def with_retry(func, attempts=MAX_ATTEMPTS, base_delay=RETRY_BASE_DELAY):
+    """
+    Call `func`, retrying transient Firestore errors with exponential backoff and jitter.
+
+    :param func: A function taking no arguments. It must be safe to run more than once.
+    :param attempts: Maximum number of calls.
+    :param base_delay: Seconds to wait before the first retry; doubled for each later one.
+    :raises Exception: The last error, once `attempts` is exhausted or the error is not transient.
+    :return: The result of `func`.
+    """
+    for attempt in range(attempts):
+        try:
+            return func()
+        except TRANSIENT_ERRORS:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(base_delay * 2 ** attempt * (0.5 + random.random()))
+
+
+def _apply_fluency_chunk(db, collection, counter_ref, changes, review_id):
+    """Set new fluency levels for at most one batch of words in a transaction and return the words applied."""
+    refs = {word: collection.document(word) for word in changes}
+
+    @firestore.transactional
+    def apply(transaction):
+        # Reading the current levels inside the transaction makes a retry idempotent:
+        # words already at their new level (or already scheduled by this review)
+        # are neither rewritten nor counted twice.
+        current = {snapshot.id: snapshot for snapshot in transaction.get_all(list(refs.values()))}
+        increments = dict.fromkeys(FLUENCY_LEVELS, 0)
+        applied = []
+        for word, new_fluency in changes.items():
+            snapshot = current.get(word)
+            if snapshot is None or not snapshot.exists:
+                continue
+            data = snapshot.to_dict()
+            old_fluency = data.get('fluency', '1-new')
+            update = {}
+            if old_fluency != new_fluency:
+                update['fluency'] = new_fluency
+                increments[old_fluency] = increments.get(old_fluency, 0) - 1
+                increments[new_fluency] += 1
+            if review_id is not None and data.get(REVIEW_ID_FIELD) != review_id:
+                update.update(next_schedule(new_fluency, data.get(EASE_FIELD, DEFAULT_EASE), data.get(INTERVAL_FIELD, 0)))
+                update[REVIEW_ID_FIELD] = review_id
+            if update:
+                update[UPDATED_FIELD] = firestore.SERVER_TIMESTAMP
+                transaction.update(refs[word], update)
+            applied.append(word)
+        if any(increments.values()):
+            transaction.set(counter_ref, _count_changes(increments), merge=True)
+        return applied
+
+    with span('firestore.transaction', words=len(changes)):
+        return with_retry(lambda: apply(db.transaction()))
+
+
+def change_fluency(db, user_id, lang_pair, changes, review_id=None, batch_size=MAX_BATCH_WRITES, max_workers=MAX_WORKERS):
+    """
+    Set new fluency levels for words and move the fluency counters to match.
+
+    When `review_id` is given, the words were reviewed on flashcards and their next
+    review is rescheduled from the chosen level (see `scheduler.next_schedule`), once
+    per review ID even if the changes are submitted again.
+
+    Changes are committed in transactions of bounded size that run concurrently and
+    are retried with backoff on transient errors. Each transaction is all-or-nothing,
+    so every word is reported as either applied or failed.
+
+    :param db: A Firestore client instance.
+    :param user_id: The ID of the user whose vocabulary is being updated.
+    :param lang_pair: String representing the language pair, e.g., "en-fr".
+    :param changes: A dictionary mapping words to their new fluency level.
+    :param review_id: An ID for the flashcard session the levels come from, or None.
+    :param batch_size: Maximum number of writes per transaction (capped at 500).
+    :param max_workers: Maximum number of concurrent transactions.
+    :return: A `FluencyUpdateResult` with the list of applied words and a dictionary of failed words to error messages.
+    """
+    invalid = {word: f"Invalid fluency level '{fluency}'" for word, fluency in changes.items() if fluency not in FLUENCY_LEVELS}
+    valid = [(word, fluency) for word, fluency in changes.items() if word not in invalid]
+    collection = words_collection(db, user_id, lang_pair)
+    counter_ref = vocabulary_document(db, user_id, lang_pair)
+    # One write per transaction is the counter update.
+    chunks = [dict(chunk) for chunk in chunked(valid, min(batch_size, MAX_BATCH_WRITES) - 1)]
+
+    applied, failed = [], dict(invalid)
+    if chunks:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            apply_chunk = in_context(_apply_fluency_chunk)
+            futures = {executor.submit(apply_chunk, db, collection, counter_ref, chunk, review_id): chunk for chunk in chunks}
+        for future, chunk in futures.items():
+            if future.exception() is None:
+                applied_words = set(future.result())
+                applied.extend(word for word in chunk if word in applied_words)
+                failed.update((word, 'Word not found in vocabulary') for word in chunk if word not in applied_words)
+            else:
+                failed.update((word, str(future.exception())) for word in chunk)
+    return FluencyUpdateResult(applied=applied, failed=failed)
+
+
+def count_fluency_levels(db, user_id, lang_pair):
+    """
+    Count a user's words at each fluency level with server-side aggregation queries.
+
+    This costs one aggregation query per fluency level instead of streaming every word.
+
+    :param db: A Firestore client instance.
+    :param user_id: The ID of the user who owns the vocabulary.
+    :param lang_pair: String representing the language pair, e.g., "en-fr".
+    :return: A dictionary mapping each fluency level to its number of words.
+    """
+    collection = words_collection(db, user_id, lang_pair)
+    counts = {}
+    for level in FLUENCY_LEVELS:
+        query = collection.where(filter=firestore.FieldFilter('fluency', '==', level))
+        with span('firestore.aggregate'):
+            counts[level] = int(query.count(alias='count').get()[0][0].value)
+    return counts
+
+
+def reconcile_fluency_counts(db, user_id, lang_pair):
+    """
+    Recount a user's words and overwrite the stored fluency counters with the result.
+
+    Used to backfill counters for vocabularies created before they existed and to
+    repair counters that drifted, e.g. after two imports of the same words raced.
+
+    :param db: A Firestore client instance.
+    :param user_id: The ID of the user who owns the vocabulary.
+    :param lang_pair: String representing the language pair, e.g., "en-fr".
+    :return: The recounted dictionary of fluency levels to word counts.
+    """
+    counts = count_fluency_levels(db, user_id, lang_pair)
+    vocabulary_document(db, user_id, lang_pair).set({COUNTS_FIELD: counts}, merge=True)
+    return counts
+
+
+def get_fluency_counts(db, user_id, lang_pair):
+    """
+    Return the number of words at each fluency level with a single document read.
+
+    Vocabularies without counters yet are reconciled on first use.
+
+    :param db: A Firestore client instance.
+    :param user_id: The ID of the user who owns the vocabulary.
+    :param lang_pair: String representing the language pair, e.g., "en-fr".
+    :return: A dictionary mapping each fluency level to its number of words.
+    """
+    with span('firestore.get'):
+        snapshot = vocabulary_document(db, user_id, lang_pair).get()
+    counts = snapshot.to_dict().get(COUNTS_FIELD) if snapshot.exists else None
+    if counts is None:
+        return reconcile_fluency_counts(db, user_id, lang_pair)
+    return {level: int(counts.get(level, 0)) for level in FLUENCY_LEVELS}
+
+
+def backfill_schedule(db, user_id, lang_pair):
+    """
+    Make words added before scheduling existed due for review.
+
+    Streams the words collection once and gives every word without a `next_review`
+    the initial schedule, so it shows up in `scheduler.due_words`.
+
+    :param db: A Firestore client instance.
+    :param user_id: The ID of the user who owns the vocabulary.
+    :param lang_pair: String representing the language pair, e.g., "en-fr".
+    :return: The number of words scheduled.
+    """
+    unscheduled = [doc.reference for doc in words_collection(db, user_id, lang_pair).stream()
+                   if NEXT_REVIEW_FIELD not in doc.to_dict()]
+    for chunk in chunked(unscheduled, MAX_BATCH_WRITES):
+        batch = db.batch()
+        for doc_ref in chunk:
+            batch.update(doc_ref, initial_schedule())
+        with_retry(batch.commit)
+    # New words are scheduled when they are added, so this only has to run once.
+    vocabulary_document(db, user_id, lang_pair).set({SCHEDULED_FIELD: True}, merge=True)
+    return len(unscheduled)
+
+
+def ensure_schedule(db, user_id, lang_pair):
+    """
+    Backfill the review schedule of a vocabulary on first use, with a single document read afterwards.
+
+    :param db: A Firestore client instance.
+    :param user_id: The ID of the user who owns the vocabulary.
+    :param lang_pair: String representing the language pair, e.g., "en-fr".
+    :return: The number of words scheduled, 0 if the vocabulary was already backfilled.
+    """
+    with span('firestore.get'):
+        snapshot = vocabulary_document(db, user_id, lang_pair).get()
+    if snapshot.exists and snapshot.to_dict().get(SCHEDULED_FIELD):
+        return 0
+    with span('vocabulary.backfill_schedule'):
+        return backfill_schedule(db, user_id, lang_pair)
@@ -0,0 +1,222 @@
+import os
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from firebase_admin import firestore
+
+from scheduler import INTERVAL_FIELD, NEXT_REVIEW_FIELD
+from telemetry import in_context, span
+from tokenizer import normalize
+from vocabulary import UPDATED_FIELD, with_retry, words_collection
+
+########################################
+#     Paginated vocabulary browser     #
+########################################
+
+PAGE_SIZE = int(os.getenv('VOCABULARY_PAGE_SIZE', 50))
+# Seconds a fetched page is shown again without querying Firestore.
+PAGE_TTL = float(os.getenv('VOCABULARY_PAGE_TTL', 30))
+# Pages kept per session: the previous, current and next one.
+MAX_CACHED_PAGES = 3
+
+# Sort options: (field, direction). Words without the field (e.g. added before
+# scheduling existed) are left out by Firestore when sorting on it.
+SORTS = {
+    'Word (A-Z)': ('__name__', firestore.Query.ASCENDING),
+    'Word (Z-A)': ('__name__', firestore.Query.DESCENDING),
+    'Next review': (NEXT_REVIEW_FIELD, firestore.Query.ASCENDING),
+    'Recently updated': (UPDATED_FIELD, firestore.Query.DESCENDING),
+}
+DEFAULT_SORT = 'Word (A-Z)'
+COLUMNS = ['Word', 'Fluency', 'Next review', 'Interval (days)']
+
+Page = namedtuple('Page', ['rows', 'cursor', 'has_next'])
+
+# Next pages are fetched here while the current one is being looked at.
+_prefetches = ThreadPoolExecutor(max_workers=4)
+
+
+def build_query(collection, fluency=None, prefix='', sort=DEFAULT_SORT):
+    """
+    Build the query for a filtered and sorted view of a words collection.
+
+    Prefix search is a range on the document ID, which Firestore only allows when
+    the results are also sorted by document ID, so it requires a word sort.
+
+    :param collection: The user's words collection (see `vocabulary.words_collection`).
+    :param fluency: Only return words at this fluency level, or None for all.
+    :param prefix: Only return words starting with this normalized prefix.
+    :param sort: A key of `SORTS`.
+    :raises ValueError: If a prefix is combined with a sort that is not by word.
+    :return: A Firestore query, without limit or cursor.
+    """
+    field, direction = SORTS[sort]
+    query = collection
+    if fluency:
+        query = query.where(filter=firestore.FieldFilter('fluency', '==', fluency))
+    if prefix:
+        if field != '__name__':
+            raise ValueError(f"Prefix search needs a word sort, not '{sort}'")
+        query = (query
+                 .where(filter=firestore.FieldFilter('__name__', '>=', collection.document(prefix)))
+                 .where(filter=firestore.FieldFilter('__name__', '<', collection.document(prefix + '\uf8ff'))))
+    return query.order_by(field, direction=direction)
+
+
+def _row(snapshot):
+    data = snapshot.to_dict()
+    return {'Word': snapshot.id, 'Fluency': data.get('fluency', '1-new'),
+            'Next review': data.get(NEXT_REVIEW_FIELD), 'Interval (days)': data.get(INTERVAL_FIELD)}
+
+
+def fetch_page(query, cursor=None, page_size=PAGE_SIZE):
+    """
+    Fetch one page of a query with a single limited read.
+
+    One document more than `page_size` is read to tell whether there is a next page.
+
+    :param query: A query from `build_query`.
+    :param cursor: The snapshot the page starts after, or None for the first page.
+    :param page_size: Number of words per page.
+    :return: A `Page(rows, cursor, has_next)`, where `cursor` is the snapshot the next page starts after.
+    """
+    page_query = query if cursor is None else query.start_after(cursor)
+    with span('firestore.query', query='vocabulary_page'):
+        snapshots = with_retry(lambda: list(page_query.limit(page_size + 1).stream()))
+    has_next = len(snapshots) > page_size
+    return Page([_row(snapshot) for snapshot in snapshots[:page_size]], snapshots[page_size - 1] if has_next else None, has_next)
+
+
+class VocabularyBrowser:
+    """
+    One session's position in a filtered, sorted and paginated view of a user's words.
+
+    Only the last few pages (the previous, current and prefetched next one) and one
+    cursor document per page visited are held, so memory is bounded by the page size
+    rather than the vocabulary size. Showing a page starts fetching the next one in
+    the background, so flipping forward usually doesn't wait on Firestore, and
+    flipping back is served from memory.
+
+    :param user_id: The ID of the user who owns the vocabulary.
+    :param lang_pair: String representing the language pair, e.g., "en-fr".
+    :param page_size: Number of words per page.
+    """
+
+    def __init__(self, user_id, lang_pair, page_size=PAGE_SIZE):
+        self.user_id = user_id
+        self.lang_pair = lang_pair
+        self.page_size = page_size
+        self.filters = (None, '', DEFAULT_SORT)
+        # cursors[i] is the snapshot page i starts after.
+        self.cursors = [None]
+        self.page_index = 0
+        # (filters, index, cursor ID) -> (fetched at, Page or Future of the prefetch)
+        self._pages = OrderedDict()
+        # Levels shown over the fetched ones until they are written.
+        self._queued = {}
+
+    def set_filters(self, fluency=None, prefix='', sort=DEFAULT_SORT):
+        """
+        Change the view, going back to the first page if it changed.
+
+        A prefix with a sort that is not by word falls back to `DEFAULT_SORT`.
+
+        :return: The (fluency, prefix, sort) actually applied.
+        """
+        prefix = normalize(prefix) if prefix else ''
+        if prefix and SORTS[sort][0] != '__name__':
+            sort = DEFAULT_SORT
+        filters = (fluency, prefix, sort)
+        if filters != self.filters:
+            self.filters = filters
+            self.cursors = [None]
+            self.page_index = 0
+            self.refresh()
+        return filters
+
+    def refresh(self):
+        """
+        Forget the fetched pages, e.g. after the words were changed, so the next `page` call queries again.
+        """
+        self._pages.clear()
+
+    def next(self):
+        if self.page_index + 1 < len(self.cursors):
+            self.page_index += 1
+
+    def previous(self):
+        self.page_index = max(self.page_index - 1, 0)
+
+    def _key(self, index):
+        cursor = self.cursors[index]
+        return self.filters, index, cursor.id if cursor is not None else None
+
+    def _cached(self, key):
+        entry = self._pages.get(key)
+        if entry is None or time.monotonic() - entry[0] >= PAGE_TTL:
+            return None
+        self._pages.move_to_end(key)
+        return entry[1]
+
+    def _remember(self, key, page):
+        self._pages[key] = (time.monotonic(), page)
+        self._pages.move_to_end(key)
+        while len(self._pages) > MAX_CACHED_PAGES:
+            self._pages.popitem(last=False)
+
+    def _query(self, db):
+        return build_query(words_collection(db, self.user_id, self.lang_pair), *self.filters)
+
+    def page(self, db, queued=None):
+        """
+        Return the current page, from memory if it was fetched or prefetched recently.
+
+        Levels queued but not yet written replace the fetched ones, and words whose queued
+        level no longer matches the fluency filter are left out. Once a queued level is
+        written, the pages are fetched again.
+
+        :param db: A Firestore client instance.
+        :param queued: A dictionary mapping words to their queued fluency level
+                       (see `WriteQueue.queued_levels`), or None.
+        :return: A `Page`.
+        """
+        queued = queued or {}
+        if self._queued.keys() - queued.keys():
+            self.refresh()
+        self._queued = dict(queued)
+        page = self._page(db)
+        if not queued:
+            return page
+        fluency = self.filters[0]
+        rows = [dict(row, Fluency=queued.get(row['Word'], row['Fluency'])) for row in page.rows]
+        return page._replace(rows=[row for row in rows if fluency is None or row['Fluency'] == fluency])
+
+    def _page(self, db):
+        key = self._key(self.page_index)
+        cached = self._cached(key)
+        page = cached
+        if isinstance(cached, Future):
+            try:
+                page = cached.result()
+            except Exception:
+                # Fetched again below, so the error surfaces in the page if it persists.
+                page = None
+        if page is None:
+            page = fetch_page(self._query(db), self.cursors[self.page_index], self.page_size)
+        if page is not cached:
+            self._remember(key, page)
+
+        if not page.has_next:
+            del self.cursors[self.page_index + 1:]
+            return page
+        # Later pages start after this page's last word, which may have changed since they were visited.
+        following = self.cursors[self.page_index + 1] if self.page_index + 1 < len(self.cursors) else None
+        if following is None or following.id != page.cursor.id:
+            self.cursors[self.page_index + 1:] = [page.cursor]
+        next_key = self._key(self.page_index + 1)
+        if self._cached(next_key) is None:
+            self._remember(next_key, _prefetches.submit(in_context(fetch_page), self._query(db), page.cursor, self.page_size))
+            # The current page stays the most recently used.
+            self._pages.move_to_end(key)
+        return page
@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+from firebase_admin import firestore
+
+from lexicon import load_packed, pack_vocabulary
+from telemetry import span
+from vocabulary import FLUENCY_LEVELS, UPDATED_FIELD, words_collection
+
+########################################
+#     Incremental vocabulary cache     #
+########################################
+
+# Seconds before a cached vocabulary is checked for changes again.
+SYNC_INTERVAL = float(os.getenv('VOCABULARY_SYNC_INTERVAL', 30))
+# Documents written this long before the newest one seen are fetched again, to
+# catch writes whose server timestamp is older than their commit.
+SYNC_OVERLAP = timedelta(seconds=60)
+MAX_CACHED_VOCABULARIES = int(os.getenv('VOCABULARY_CACHE_SIZE', 256))
+# Words read past a packed copy's watermark after which the copy is rewritten.
+REPACK_AFTER = int(os.getenv('VOCABULARY_REPACK_AFTER', 1000))
+
+
+class VocabularyCache:
+    """
+    A local copy of one user's words for one language pair, kept in sync incrementally.
+
+    The first sync loads the packed copy of the vocabulary (see `lexicon.load_packed`)
+    and catches up on the words written since it was packed; vocabularies that were
+    never packed stream the whole words collection instead. Later syncs only query the
+    words whose `updated_at` is newer than the last one seen. Local fluency edits are
+    applied immediately so the pages don't have to wait for the next sync.
+
+    :param user_id: The ID of the user who owns the vocabulary.
+    :param lang_pair: String representing the language pair, e.g., "en-fr".
+    """
+
+    def __init__(self, user_id, lang_pair):
+        self.user_id = user_id
+        self.lang_pair = lang_pair
+        self.words = {}
+        # Levels read from Firestore of the words `apply` changed since (None if never read).
+        self._remote = {}
+        self.last_updated = None
+        self.synced_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_synced(self):
+        return self.synced_at is not None
+
+    def sync(self, db, max_age=SYNC_INTERVAL):
+        """
+        Pull the words changed since the last sync, unless the cache was synced less than `max_age` seconds ago.
+
+        :param db: A Firestore client instance.
+        :param max_age: Seconds a sync stays fresh; 0 always queries Firestore.
+        :return: The number of documents read.
+        """
+        with self._lock:
+            if self.synced_at is not None and time.monotonic() - self.synced_at < max_age:
+                return 0
+            started = datetime.now(timezone.utc)
+            packed = load_packed(db, self.user_id, self.lang_pair) if self.last_updated is None else None
+            if packed is not None:
+                self.words.update(packed.levels)
+                for word in self._remote.keys() & packed.levels.keys():
+                    self._remote[word] = packed.levels[word]
+                self.last_updated = packed.packed_at
+            query = words_collection(db, self.user_id, self.lang_pair)
+            if self.last_updated is not None:
+                query = query.where(filter=firestore.FieldFilter(UPDATED_FIELD, '>', self.last_updated - SYNC_OVERLAP))
+            read = 0
+            with span('firestore.query', query='vocabulary_sync', delta=self.last_updated is not None):
+                for doc in query.stream():
+                    data = doc.to_dict()
+                    self.words[doc.id] = data.get('fluency', '1-new')
+                    self._remote.pop(doc.id, None)
+                    updated = data.get(UPDATED_FIELD)
+                    if updated is not None and (self.last_updated is None or updated > self.last_updated):
+                        self.last_updated = updated
+                    read += 1
+            if self.last_updated is None:
+                # No word carries a timestamp yet; later writes will be newer than this sync.
+                self.last_updated = started
+            if packed is not None and read > REPACK_AFTER:
+                self._repack(db, started)
+            self.synced_at = time.monotonic()
+            return read
+
+    def _repack(self, db, started):
+        """Rewrite the packed copy from what this cache read, so the next first sync reads fewer words past it."""
+        # Local edits may not have reached Firestore yet (see `write_queue`), so they are not packed.
+        levels = {word: self._remote.get(word, fluency) for word, fluency in self.words.items()}
+        levels = {word: fluency for word, fluency in levels.items() if fluency is not None}
+        try:
+            with span('vocabulary.repack', words=len(levels)):
+                pack_vocabulary(db, self.user_id, self.lang_pair, levels, started)
+        except Exception:
+            # The per-word documents stay the source of truth; the old copy only costs a longer catch-up.
+            pass
+
+    def apply(self, changes):
+        """
+        Apply local fluency changes without waiting for a sync.
+
+        :param changes: A dictionary mapping words to their new fluency level.
+        """
+        with self._lock:
+            for word in changes:
+                self._remote.setdefault(word, self.words.get(word))
+            self.words.update(changes)
+
+    def to_frame(self):
+        """
+        Return the vocabulary as a DataFrame with 'Word' and 'Fluency' columns.
+        """
+        with self._lock:
+            return pd.DataFrame({'Word': list(self.words), 'Fluency': list(self.words.values())}, columns=['Word', 'Fluency'])
+
+    def to_series(self):
+        """
+        Return the vocabulary as a Series of fluency levels indexed by word.
+        """
+        with self._lock:
+            return pd.Series(self.words, dtype=object)
+
+    def counts(self):
+        """
+        Return a dictionary mapping each fluency level to its number of words.
+        """
+        with self._lock:
+            counts = dict.fromkeys(FLUENCY_LEVELS, 0)
+            for fluency in self.words.values():
+                counts[fluency] = counts.get(fluency, 0) + 1
+            return counts
+
+
+_caches = OrderedDict()
+_caches_lock = threading.Lock()
+
+
+def get_cache(user_id, lang_pair):
+    """
+    Return the process-wide vocabulary cache for a user and language pair.
+
+    The least recently used caches are dropped once more than
+    `MAX_CACHED_VOCABULARIES` are held.
+
+    :param user_id: The ID of the user who owns the vocabulary.
+    :param lang_pair: String representing the language pair, e.g., "en-fr".
+    :return: A shared `VocabularyCache`.
+    """
+    key = (user_id, lang_pair)
+    with _caches_lock:
+        if key in _caches:
+            _caches.move_to_end(key)
+        else:
+            _caches[key] = VocabularyCache(user_id, lang_pair)
+            while len(_caches) > MAX_CACHED_VOCABULARIES:
+                _caches.popitem(last=False)
+        return _caches[key]
@@ -0,0 +1,329 @@
+"""
+Export a user's vocabulary to CSV or JSON lines, and import word lists, CSV files and Anki decks.
+
+Exports page through the words collection with query cursors and write each page
+as it arrives; imports read their file lazily and write it in bounded chunks. Both
+therefore run in constant memory, whatever the size of the vocabulary. Uses the
+Firebase credentials from `.streamlit/secrets.toml`, like the app.
+
+    python vocabulary_io.py export alice en-fr -o alice-en-fr.csv
+    python vocabulary_io.py export alice en-fr --format jsonl > alice-en-fr.jsonl
+    python vocabulary_io.py import alice en-fr deck.apkg
+"""
+import argparse
+import csv
+import html
+import io
+import itertools
+import json
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import zipfile
+from collections import namedtuple
+
+from scheduler import EASE_FIELD, INTERVAL_FIELD, NEXT_REVIEW_FIELD
+from telemetry import span
+from tokenizer import normalize
+from vocabulary import (
+    MAX_BATCH_WRITES,
+    MAX_WORKERS,
+    UPDATED_FIELD,
+    change_fluency,
+    chunked,
+    upsert_new_words,
+    with_retry,
+    words_collection,
+)
+
+########################################
+#     Vocabulary export and import     #
+########################################
+
+# Documents read per export query.
+EXPORT_PAGE_SIZE = 1000
+EXPORT_FIELDS = ['word', 'fluency', NEXT_REVIEW_FIELD, INTERVAL_FIELD, EASE_FIELD, UPDATED_FIELD]
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.apkg': 'anki', '.colpkg': 'anki', '.txt': 'anki-text'}
+
+# Entries read and written per import round; each round is split into concurrent batches.
+IMPORT_CHUNK_SIZE = 5000
+# Failed words kept as examples in an `ImportResult`.
+MAX_ERRORS = 10
+
+# Fluency given to an imported Anki card, by the minimum review interval in days it has reached.
+ANKI_FLUENCY = [(90, "5-known"), (21, "4-learned"), (7, "3-familiar"), (1, "2-recognized"), (0, "1-new")]
+
+ImportResult = namedtuple('ImportResult', ['read', 'new', 'existing', 'updated', 'failed', 'errors'])
+
+_HTML_TAG = re.compile(r'<[^>]+>')
+
+
+def _value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def iter_vocabulary(db, user_id, lang_pair, page_size=EXPORT_PAGE_SIZE, progress=None):
+    """
+    Stream a user's words in document ID order, one query page at a time.
+
+    Each page starts after the last document of the previous one, so only one page
+    is held in memory and an interrupted page can be retried on its own.
+
+    :param db: A Firestore client instance.
+    :param user_id: The ID of the user who owns the vocabulary.
+    :param lang_pair: String representing the language pair, e.g., "en-fr".
+    :param page_size: Number of documents read per query.
+    :param progress: Called with the number of words read so far after every page.
+    :return: A generator of dictionaries with the keys of `EXPORT_FIELDS`.
+    """
+    query = words_collection(db, user_id, lang_pair).order_by('__name__').limit(page_size)
+    last, count = None, 0
+    while True:
+        page_query = query if last is None else query.start_after(last)
+        with span('firestore.query', page_size=page_size):
+            page = with_retry(lambda: list(page_query.stream()))
+        for snapshot in page:
+            data = snapshot.to_dict()
+            yield {'word': snapshot.id, **{field: _value(data.get(field)) for field in EXPORT_FIELDS[1:]}}
+        count += len(page)
+        if progress is not None:
+            progress(count)
+        if len(page) < page_size:
+            return
+        last = page[-1]
+
+
+def export_vocabulary(db, user_id, lang_pair, out, fmt='csv', page_size=EXPORT_PAGE_SIZE, progress=None):
+    """
+    Write a user's vocabulary to a text file as it is read.
+
+    :param db: A Firestore client instance.
+    :param user_id: The ID of the user who owns the vocabulary.
+    :param lang_pair: String representing the language pair, e.g., "en-fr".
+    :param out: A text file object, opened with `newline=''` for CSV.
+    :param fmt: 'csv' or 'jsonl'.
+    :param page_size: Number of documents read per query.
+    :param progress: Called with the number of words read so far after every page.
+    :return: The number of words written.
+    """
+    rows = iter_vocabulary(db, user_id, lang_pair, page_size, progress)
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    elif fmt == 'jsonl':
+        for row in rows:
+            out.write(json.dumps(row, ensure_ascii=False) + '\n')
+            count += 1
+    else:
+        raise ValueError(f"Unsupported export format '{fmt}'")
+    return count
+
+
+def read_csv(lines, delimiter=','):
+    """
+    Read (word, fluency) entries from CSV lines.
+
+    Files with a header row use its 'word' and 'fluency' columns (in any case, so the
+    app's former table downloads work too); otherwise the first column is the word
+    and the second, if any, its fluency. Lines starting with '#' are skipped.
+
+    :param lines: An iterable of text lines.
+    :param delimiter: The column separator.
+    :return: A generator of (word, fluency or None) tuples.
+    """
+    reader = csv.reader((line for line in lines if not line.startswith('#')), delimiter=delimiter)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [column.strip().lower() for column in header]
+    if 'word' in columns:
+        word_column = columns.index('word')
+        fluency_column = columns.index('fluency') if 'fluency' in columns else None
+    else:
+        word_column, fluency_column = 0, 1
+        reader = itertools.chain([header], reader)
+    for row in reader:
+        if len(row) > word_column:
+            fluency = row[fluency_column].strip() if fluency_column is not None and len(row) > fluency_column else ''
+            yield row[word_column], fluency or None
+
+
+def read_jsonl(lines):
+    """
+    Read (word, fluency) entries from JSON lines, as written by `export_vocabulary`.
+
+    :return: A generator of (word, fluency or None) tuples.
+    """
+    for line in lines:
+        if line.strip():
+            entry = json.loads(line)
+            yield entry['word'], entry.get('fluency')
+
+
+def _anki_fluency(interval):
+    # Cards still in learning have a negative interval, in seconds.
+    return next(level for days, level in ANKI_FLUENCY if max(interval or 0, 0) >= days)
+
+
+def read_anki(file):
+    """
+    Read (word, fluency) entries from an Anki deck package (.apkg or .colpkg).
+
+    The word is the first field of each note, without formatting. Its fluency comes
+    from the longest review interval of the note's cards (see `ANKI_FLUENCY`), so
+    cards already mastered in Anki are not shown again as new.
+
+    :param file: A path or binary file object of the package.
+    :raises ValueError: If the package only has the collection format of Anki 23.10+.
+    :return: A generator of (word, fluency) tuples.
+    """
+    with zipfile.ZipFile(file) as package, tempfile.TemporaryDirectory() as directory:
+        names = set(package.namelist())
+        member = next((name for name in ('collection.anki21', 'collection.anki2') if name in names), None)
+        if member is None:
+            raise ValueError("Unsupported Anki package; export it with 'Support older Anki versions' checked")
+        # SQLite needs a real file, so the collection is copied out in blocks.
+        path = os.path.join(directory, 'collection.sqlite')
+        with package.open(member) as source, open(path, 'wb') as target:
+            shutil.copyfileobj(source, target)
+        connection = sqlite3.connect(path)
+        try:
+            cursor = connection.execute(
+                'SELECT notes.flds, MAX(cards.ivl) FROM notes LEFT JOIN cards ON cards.nid = notes.id GROUP BY notes.id')
+            for fields, interval in cursor:
+                word = html.unescape(_HTML_TAG.sub('', fields.split('\x1f', 1)[0])).strip()
+                yield word, _anki_fluency(interval)
+        finally:
+            connection.close()
+
+
+def read_entries(file, fmt):
+    """
+    Read (word, fluency) entries from a binary file in any supported format.
+
+    :param file: A binary file object, e.g. an open file or a Streamlit upload.
+    :param fmt: 'csv', 'jsonl', 'anki' or 'anki-text' (Anki's tab-separated "Notes in Plain Text" export).
+    :return: A generator of (word, fluency or None) tuples.
+    """
+    if fmt == 'anki':
+        return read_anki(file)
+    lines = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        return read_csv(lines)
+    if fmt == 'anki-text':
+        return ((word, None) for word, _ in read_csv(lines, delimiter='\t'))
+    if fmt == 'jsonl':
+        return read_jsonl(lines)
+    raise ValueError(f"Unsupported import format '{fmt}'")
+
+
+def format_of(file_name):
+    """
+    Return the import/export format for a file name, or None if its extension is not supported.
+    """
+    return FORMATS.get(os.path.splitext(file_name)[1].lower())
+
+
+def import_vocabulary(db, user_id, lang_pair, entries, chunk_size=IMPORT_CHUNK_SIZE, max_workers=MAX_WORKERS, progress=None):
+    """
+    Add imported words to a user's vocabulary and set their fluency levels.
+
+    Entries are consumed `chunk_size` at a time: each chunk is upserted with
+    `vocabulary.upsert_new_words`, then words with a level above '1-new' get it
+    with `vocabulary.change_fluency`, both in concurrent batches of at most 500
+    writes. A level of '1-new' (or none) never downgrades a word already known.
+
+    :param db: A Firestore client instance.
+    :param user_id: The ID of the user whose vocabulary is being updated.
+    :param lang_pair: String representing the language pair, e.g., "en-fr".
+    :param entries: An iterable of (word, fluency or None) tuples, e.g. from `read_entries`.
+    :param chunk_size: Maximum number of entries held and written per round.
+    :param max_workers: Maximum number of concurrent reads or commits.
+    :param progress: Called with the `ImportResult` so far after every round.
+    :return: An `ImportResult`; `errors` maps up to `MAX_ERRORS` failed words to their error.
+    """
+    read = new = existing = updated = failed = 0
+    errors = {}
+    for chunk in chunked(entries, chunk_size):
+        read += len(chunk)
+        levels = {}
+        for word, fluency in chunk:
+            word = normalize(word)
+            if word:
+                levels[word] = fluency if fluency and fluency != "1-new" else levels.get(word)
+
+        try:
+            with span('import.upsert', words=len(levels)):
+                result = with_retry(lambda: upsert_new_words(levels, user_id, db, lang_pair, MAX_BATCH_WRITES, max_workers))
+        except Exception as e:
+            failed += len(levels)
+            errors.update(itertools.islice(((word, str(e)) for word in levels), MAX_ERRORS - len(errors)))
+        else:
+            new, existing = new + result.new, existing + result.existing
+            changes = {word: fluency for word, fluency in levels.items() if fluency}
+            if changes:
+                with span('import.fluency', words=len(changes)):
+                    result = change_fluency(db, user_id, lang_pair, changes, max_workers=max_workers)
+                updated += len(result.applied)
+                failed += len(result.failed)
+                errors.update(itertools.islice(result.failed.items(), max(MAX_ERRORS - len(errors), 0)))
+
+        if progress is not None:
+            progress(ImportResult(read, new, existing, updated, failed, errors))
+    return ImportResult(read, new, existing, updated, failed, errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('export', help='Write a vocabulary to CSV or JSON lines')
+    import_parser = commands.add_parser('import', help='Add the words of a file to a vocabulary')
+    for command in (export_parser, import_parser):
+        command.add_argument('user', help='User ID')
+        command.add_argument('lang_pair', help='Language pair, e.g. en-fr')
+    export_parser.add_argument('-o', '--output', help='Output file (default: standard output)')
+    export_parser.add_argument('--format', choices=['csv', 'jsonl'], help='Output format (default: from the file name, or csv)')
+    import_parser.add_argument('path', help='A .csv, .jsonl, .txt (Anki plain text) or .apkg/.colpkg (Anki deck) file')
+    import_parser.add_argument('--format', choices=sorted(set(FORMATS.values())), help='Input format (default: from the file name)')
+    args = parser.parse_args()
+
+    from resources import get_db
+    db = get_db()
+
+    if args.command == 'export':
+        fmt = args.format or (args.output and format_of(args.output)) or 'csv'
+        if fmt not in ('csv', 'jsonl'):
+            parser.error(f"Cannot export to '{args.output}'; use --format csv or jsonl")
+        out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+        try:
+            count = export_vocabulary(db, args.user, args.lang_pair, out, fmt,
+                                      progress=lambda count: print(f"{count} words read", end='\r', file=sys.stderr))
+        finally:
+            if args.output:
+                out.close()
+        print(f"Exported {count} words", file=sys.stderr)
+    else:
+        fmt = args.format or format_of(args.path)
+        if fmt is None:
+            parser.error(f"Unknown format of '{args.path}'; use --format")
+
+        def report(result):
+            print(f"{result.read} read, {result.new} new, {result.updated} levels set, {result.failed} failed", end='\r')
+
+        with open(args.path, 'rb') as file:
+            result = import_vocabulary(db, args.user, args.lang_pair, read_entries(file, fmt), progress=report)
+        print(f"Imported {result.read} entries: {result.new} new words, {result.existing} already known, "
+              f"{result.updated} fluency levels set, {result.failed} failed")
+        for word, error in result.errors.items():
+            print(f"  {word}: {error}")
+
+
+if __name__ == '__main__':
+    main()
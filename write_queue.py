@@ -0,0 +1,317 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+from disk_cache import CACHE_DIR
+from resources import get_db
+from telemetry import span
+from vocabulary import FLUENCY_LEVELS, change_fluency, upsert_new_words
+
+########################################
+#     Write-behind vocabulary queue    #
+########################################
+
+# Seconds between two flushes; writes queued meanwhile to the same word are coalesced.
+FLUSH_INTERVAL = float(os.getenv('WRITE_QUEUE_FLUSH_INTERVAL', 1))
+# Queued writes sent to Firestore per flush, in batches of at most 500 writes.
+FLUSH_BATCH_SIZE = int(os.getenv('WRITE_QUEUE_BATCH_SIZE', 2000))
+# Seconds a worker process owns the writes it is flushing before another one may take them over.
+LEASE_SECONDS = 60
+# Flushes of a write before it is given up and reported as failed, with backoff in between.
+MAX_FLUSH_ATTEMPTS = 5
+RETRY_BASE_DELAY = 2
+
+INSERT = 'insert'
+FLUENCY = 'fluency'
+
+FlushStatus = namedtuple('FlushStatus', ['pending', 'failed', 'errors'])
+
+logger = logging.getLogger('languagebuddy.write_queue')
+
+
+class WriteQueue:
+    """
+    A queue of vocabulary writes, flushed to Firestore by a background thread so pages don't wait on them.
+
+    Writes are stored in SQLite before `add_words` or `set_fluency` return, so they
+    survive a worker restart and are flushed by whichever worker process runs next.
+    There is one row per (user, language pair, word, kind of write): queuing a new
+    fluency level for a word that is still waiting replaces the old one, and words
+    already waiting to be added are not queued twice. New words are flushed before
+    fluency levels, so a level set right after an import finds its word.
+
+    Writes that keep failing are retried with backoff, then kept as failed and
+    reported by `status` until the word is queued again.
+
+    :param db: A Firestore client instance, or None to use the worker's shared client.
+    :param directory: Directory holding the queue database.
+    :param flush_interval: Seconds between two flushes of the background thread.
+    :param batch_size: Maximum number of queued writes sent per flush.
+    """
+
+    def __init__(self, db=None, directory=CACHE_DIR, flush_interval=FLUSH_INTERVAL, batch_size=FLUSH_BATCH_SIZE):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'write_queue.sqlite3')
+        self.db = db
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        with self._connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS writes ('
+                'user_id TEXT NOT NULL, lang_pair TEXT NOT NULL, word TEXT NOT NULL, kind TEXT NOT NULL, '
+                'fluency TEXT, review_id TEXT, version INTEGER NOT NULL DEFAULT 0, queued REAL NOT NULL, '
+                'attempts INTEGER NOT NULL DEFAULT 0, error TEXT, not_before REAL NOT NULL DEFAULT 0, '
+                'PRIMARY KEY (user_id, lang_pair, word, kind))'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS writes_due ON writes (attempts, not_before)')
+
+    def _connection(self):
+        # sqlite3 connections can't be shared between threads, so each thread opens its own.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _client(self):
+        return self.db if self.db is not None else get_db()
+
+    def add_words(self, user_id, lang_pair, words):
+        """
+        Queue words to be added to a user's vocabulary with a fluency of '1-new', like `vocabulary.upsert_new_words`.
+
+        :param user_id: The ID of the user whose vocabulary is being updated.
+        :param lang_pair: String representing the language pair, e.g., "en-fr".
+        :param words: An iterable of words; empty and non-string ones are skipped.
+        :return: The number of words queued.
+        """
+        now = time.time()
+        rows = [(user_id, lang_pair, word, INSERT, now) for word in dict.fromkeys(words)
+                if isinstance(word, str) and word.strip()]
+        with self._connection() as conn:
+            conn.executemany(
+                'INSERT INTO writes (user_id, lang_pair, word, kind, queued) VALUES (?, ?, ?, ?, ?) '
+                # A failed insert is retried from scratch; a waiting one stays as it is.
+                'ON CONFLICT (user_id, lang_pair, word, kind) DO UPDATE SET attempts = 0, error = NULL, not_before = 0 '
+                f'WHERE attempts >= {MAX_FLUSH_ATTEMPTS}', rows)
+        self.start()
+        return len(rows)
+
+    def set_fluency(self, user_id, lang_pair, changes, review_id=None):
+        """
+        Queue new fluency levels for words, like `vocabulary.change_fluency`.
+
+        A level queued for a word that is still waiting replaces the earlier one.
+
+        :param user_id: The ID of the user whose vocabulary is being updated.
+        :param lang_pair: String representing the language pair, e.g., "en-fr".
+        :param changes: A dictionary mapping words to their new fluency level.
+        :param review_id: An ID for the flashcard session the levels come from, or None.
+        :raises ValueError: If a fluency level is not one of `FLUENCY_LEVELS`; nothing is queued then.
+        :return: The number of words queued.
+        """
+        invalid = {word: fluency for word, fluency in changes.items() if fluency not in FLUENCY_LEVELS}
+        if invalid:
+            raise ValueError('Invalid fluency levels: ' + ', '.join(f"{word} ('{fluency}')" for word, fluency in invalid.items()))
+        now = time.time()
+        rows = [(user_id, lang_pair, word, FLUENCY, fluency, review_id, now) for word, fluency in changes.items()]
+        with self._connection() as conn:
+            conn.executemany(
+                'INSERT INTO writes (user_id, lang_pair, word, kind, fluency, review_id, queued) VALUES (?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (user_id, lang_pair, word, kind) DO UPDATE SET fluency = excluded.fluency, review_id = excluded.review_id, '
+                'version = version + 1, attempts = 0, error = NULL, not_before = 0', rows)
+        self.start()
+        return len(rows)
+
+    def status(self, user_id, lang_pair=None):
+        """
+        Tell whether a user's queued writes have reached Firestore.
+
+        :param user_id: The ID of the user.
+        :param lang_pair: Only count this language pair's writes, or None for all of them.
+        :return: A `FlushStatus(pending, failed, errors)` with the number of writes still waiting, the number
+                 given up on, and a dictionary mapping the words given up on to their last error.
+        """
+        query = 'SELECT word, attempts, error FROM writes WHERE user_id = ?'
+        params = [user_id]
+        if lang_pair is not None:
+            query += ' AND lang_pair = ?'
+            params.append(lang_pair)
+        pending, errors = 0, {}
+        for word, attempts, error in self._connection().execute(query, params):
+            if attempts >= MAX_FLUSH_ATTEMPTS:
+                errors[word] = error
+            else:
+                pending += 1
+        return FlushStatus(pending, len(errors), errors)
+
+    def queued_levels(self, user_id, lang_pair):
+        """
+        Return the fluency levels queued for a user's words that have not reached Firestore yet.
+
+        Levels given up on are left out, since they will not be written.
+
+        :param user_id: The ID of the user.
+        :param lang_pair: String representing the language pair, e.g., "en-fr".
+        :return: A dictionary mapping words to their queued fluency level.
+        """
+        return dict(self._connection().execute(
+            'SELECT word, fluency FROM writes WHERE user_id = ? AND lang_pair = ? AND kind = ? AND attempts < ?',
+            (user_id, lang_pair, FLUENCY, MAX_FLUSH_ATTEMPTS)))
+
+    def is_flushed(self, user_id, lang_pair=None):
+        """
+        Return True if none of a user's writes are still waiting to be flushed.
+        """
+        return self.status(user_id, lang_pair).pending == 0
+
+    def _claim(self):
+        """Take up to `batch_size` due writes for `LEASE_SECONDS`, so other worker processes leave them alone."""
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            rows = conn.execute(
+                'SELECT user_id, lang_pair, word, kind, fluency, review_id, version FROM writes '
+                # 'insert' sorts after 'fluency', so new words go first.
+                'WHERE attempts < ? AND not_before <= ? ORDER BY kind DESC, queued LIMIT ?',
+                (MAX_FLUSH_ATTEMPTS, now, self.batch_size)).fetchall()
+            conn.executemany('UPDATE writes SET not_before = ? WHERE user_id = ? AND lang_pair = ? AND word = ? AND kind = ?',
+                             [(now + LEASE_SECONDS, *row[:4]) for row in rows])
+        return rows
+
+    def _settle(self, rows, errors):
+        """Remove the flushed writes and reschedule the failed ones, unless they were queued again meanwhile."""
+        now = time.time()
+        done, failed, changed = [], [], []
+        for user_id, lang_pair, word, kind, _, _, version in rows:
+            key = (user_id, lang_pair, word, kind)
+            error = errors.get(key)
+            if error is None:
+                done.append((*key, version))
+            else:
+                failed.append((error, now, *key, version))
+            changed.append((*key, version))
+        with self._connection() as conn:
+            conn.executemany('DELETE FROM writes WHERE user_id = ? AND lang_pair = ? AND word = ? AND kind = ? AND version = ?', done)
+            conn.executemany(
+                'UPDATE writes SET attempts = attempts + 1, error = ?, '
+                f'not_before = ? + {RETRY_BASE_DELAY} * (1 << attempts) '
+                'WHERE user_id = ? AND lang_pair = ? AND word = ? AND kind = ? AND version = ?', failed)
+            # Writes replaced while being flushed are due again at once.
+            conn.executemany('UPDATE writes SET not_before = 0 '
+                             'WHERE user_id = ? AND lang_pair = ? AND word = ? AND kind = ? AND version != ?', changed)
+
+    def flush(self):
+        """
+        Send one batch of due writes to Firestore.
+
+        :return: The number of writes sent, successfully or not.
+        """
+        # Fails before any write is claimed, so none is left leased without an outcome.
+        db = self._client()
+        rows = self._claim()
+        if not rows:
+            return 0
+        errors = {}
+        try:
+            inserts, levels = defaultdict(list), defaultdict(dict)
+            for user_id, lang_pair, word, kind, fluency, review_id, _ in rows:
+                if kind == INSERT:
+                    inserts[user_id, lang_pair].append(word)
+                else:
+                    levels[user_id, lang_pair, review_id][word] = fluency
+
+            with span('write_queue.flush', writes=len(rows)):
+                for (user_id, lang_pair), words in inserts.items():
+                    try:
+                        upsert_new_words(words, user_id, db, lang_pair)
+                    except Exception as e:
+                        errors.update(((user_id, lang_pair, word, INSERT), str(e)) for word in words)
+                for (user_id, lang_pair, review_id), changes in levels.items():
+                    try:
+                        result = change_fluency(db, user_id, lang_pair, changes, review_id=review_id)
+                    except Exception as e:
+                        errors.update(((user_id, lang_pair, word, FLUENCY), str(e)) for word in changes)
+                    else:
+                        errors.update(((user_id, lang_pair, word, FLUENCY), error) for word, error in result.failed.items())
+        except Exception as e:
+            # Every claimed write still gets an outcome; the writes are idempotent, so retrying the sent ones is safe.
+            for row in rows:
+                errors.setdefault(tuple(row[:4]), str(e))
+            raise
+        finally:
+            self._settle(rows, errors)
+        return len(rows)
+
+    def drain(self, timeout=None):
+        """
+        Flush until no write is due, e.g. before a command-line tool exits.
+
+        Writes waiting for a retry after a failure are left queued.
+
+        :param timeout: Seconds after which to stop, or None to wait as long as it takes.
+        :return: The number of writes sent.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        sent = 0
+        while deadline is None or time.monotonic() < deadline:
+            flushed = self.flush()
+            if not flushed:
+                break
+            sent += flushed
+        return sent
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                # Keep going while full batches come back, so a large import doesn't wait a second per batch.
+                while self.flush() >= self.batch_size:
+                    pass
+            except Exception:
+                # The writes stay queued with the error; the next flush tries again.
+                logger.exception('Flushing the vocabulary write queue failed')
+
+    def start(self):
+        """
+        Start the background flushing thread, if it isn't running yet.
+        """
+        if self._thread is None:
+            with self._thread_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='write-queue', daemon=True)
+                    self._thread.start()
+
+    def wake(self):
+        """
+        Flush now rather than at the next interval.
+        """
+        self._wake.set()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_write_queue():
+    """
+    Return the write queue shared by every session in this worker process, flushing writes left by earlier runs.
+    """
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = WriteQueue()
+                _queue.start()
+    return _queue